@@ -0,0 +1,195 @@
+"""
+Benchmark de la tabla materializada articulo_categoria en fetch_articles.
+
+Crea una base de datos con create_tables y artículos sintéticos (por defecto 1M artículos en un año,
+3 palabras clave por artículo, 500 palabras clave repartidas en 20 categorías) y compara el tiempo de
+fetch_articles con filtro de categoría frente a la consulta anterior (EXISTS correlacionado sobre
+palabras_clave_categoria, categoria y palabra_clave_articulos por cada artículo candidato),
+comprobando que ambas devuelven los mismos artículos.
+
+También mide el coste de escritura: lotes de 10 artículos como SQLitePipeline, con y sin el llenado
+de articulo_categoria en bulk_insert_palabra_clave_articulos.
+
+Uso:
+    python -m benchmarks.bench_article_categories [--articulos 1000000]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.bench_url_ids import timed
+from news_database.core_db import URL_COMPLETADA, analyze
+from news_database.interface_db import NewsInterfaceDatabase
+from news_database.news_db import NewsDatabase
+from news_database.utils import url_hash, to_epoch
+
+LOTE = 100000
+LOTE_PIPELINE = 10
+FUENTES = [f'www.periodico{i}.es' for i in range(40)]
+TOTAL_PALABRAS = 500
+TOTAL_CATEGORIAS = 20
+INICIO = datetime(2024, 1, 1)
+
+# fetch_articles antes de articulo_categoria (mismos parámetros que articles_query)
+FETCH_ARTICLES_ANTERIOR = """
+    SELECT a.titulo, u.url, f.nombre, a.fecha_publicacion
+    FROM articulos a
+    JOIN urls_exploradas u ON u.url_id = a.url_id
+    JOIN fuentes f ON a.fuente = f.fuente_id
+    WHERE EXISTS (
+        SELECT 1 FROM palabras_clave_categoria pcc
+        JOIN categoria c ON pcc.categoria_id = c.categoria_id
+        WHERE c.nombre IN ({})
+        AND pcc.palabra_id IN (
+            SELECT palabra_id FROM palabra_clave_articulos pca
+            WHERE pca.url_id = a.url_id
+        )
+    )
+    {}
+    ORDER BY a.fecha_publicacion DESC
+"""
+
+
+def old_query(categories, keywords=None, start_date=None, end_date=None):
+    condiciones, params = [], list(categories)
+    if keywords:
+        condiciones.append("""
+            AND EXISTS (
+                SELECT 1 FROM palabra_clave_articulos pca
+                JOIN palabras_clave pc ON pca.palabra_id = pc.palabra_id
+                WHERE pc.palabra IN ({})
+                AND pca.url_id = a.url_id
+            )
+        """.format(','.join(['?'] * len(keywords))))
+        params.extend(keywords)
+    if start_date:
+        condiciones.append('AND a.fecha_publicacion >= ?')
+        params.append(to_epoch(start_date))
+    if end_date:
+        condiciones.append('AND a.fecha_publicacion < ?')
+        params.append(to_epoch(end_date))
+    return FETCH_ARTICLES_ANTERIOR.format(','.join(['?'] * len(categories)), '\n'.join(condiciones)), params
+
+
+def generate(rng, inicio, total, recientes=False):
+    """
+    (url, fuente, titulo, fecha, palabras_id) de los artículos inicio..inicio+total, con fechas al azar
+    en el año o, si recientes, posteriores y crecientes (como los que encuentra el crawler)
+    """
+    minutos = 365 * 24 * 60
+    for i in range(inicio, inicio + total):
+        fecha = INICIO + timedelta(minutes=minutos + i if recientes else rng.randrange(minutos))
+        fuente = FUENTES[i % len(FUENTES)]
+        yield (f'https://{fuente}/noticia-{i}.html', fuente, f'Noticia {i}', fecha.isoformat(sep=' '),
+               rng.sample(range(1, TOTAL_PALABRAS + 1), 3))
+
+
+def build(path, total, rng):
+    db = NewsDatabase(path)
+    db.create_tables()
+    conn = db.conn
+    conn.executemany('INSERT INTO fuentes VALUES (?, ?, ?)', [(f, f, f'https://{f}/') for f in FUENTES])
+    conn.executemany('INSERT INTO palabras_clave (palabra, stem) VALUES (?, ?)',
+                     [(f'palabra{i}', f'palabr{i}') for i in range(1, TOTAL_PALABRAS + 1)])
+    conn.executemany('INSERT INTO categoria (nombre) VALUES (?)',
+                     [(f'categoria{i}',) for i in range(1, TOTAL_CATEGORIAS + 1)])
+    # Cada palabra clave en una categoría y una de cada cinco también en otra
+    pares = {(p, p % TOTAL_CATEGORIAS + 1) for p in range(1, TOTAL_PALABRAS + 1)}
+    pares |= {(p, (p * 7) % TOTAL_CATEGORIAS + 1) for p in range(1, TOTAL_PALABRAS + 1, 5)}
+    conn.executemany('INSERT INTO palabras_clave_categoria VALUES (?, ?)', sorted(pares))
+
+    for inicio in range(0, total, LOTE):
+        articulos = list(generate(rng, inicio, min(LOTE, total - inicio)))
+        # Inserción directa con url_id consecutivos (equivalente a bulk_insert_crawled_urls y bulk_insert_articles)
+        conn.executemany('INSERT INTO urls_exploradas VALUES (?, ?, ?, ?, ?)',
+                         [(inicio + n + 1, url_hash(url), url, '2025-01-01 00:00:00', URL_COMPLETADA)
+                          for n, (url, _, _, _, _) in enumerate(articulos)])
+        conn.executemany('INSERT INTO articulos VALUES (?, ?, ?, ?)',
+                         [(inicio + n + 1, fuente, titulo, to_epoch(fecha))
+                          for n, (_, fuente, titulo, fecha, _) in enumerate(articulos)])
+        conn.executemany('INSERT INTO palabra_clave_articulos VALUES (?, ?)',
+                         [(inicio + n + 1, p) for n, (_, _, _, _, palabras) in enumerate(articulos) for p in palabras])
+        db._insert_articulo_categoria(conn.cursor(), range(inicio + 1, inicio + len(articulos) + 1))
+        conn.commit()
+    analyze(conn.cursor())
+    conn.commit()
+    return db
+
+
+def pipeline_writes(db, rng, inicio, total):
+    """ Segundos de escritura de total artículos en lotes como SQLitePipeline """
+    articulos = list(generate(rng, inicio, total, recientes=True))
+    start = time.perf_counter()
+    for i in range(0, total, LOTE_PIPELINE):
+        lote = articulos[i:i + LOTE_PIPELINE]
+        db.bulk_insert_crawled_urls([url for url, _, _, _, _ in lote], estado=URL_COMPLETADA)
+        db.bulk_insert_articles([{'url': url, 'fuente': fuente, 'titulo': titulo, 'fecha_publicacion': fecha}
+                                 for url, fuente, titulo, fecha, _ in lote])
+        db.bulk_insert_palabra_clave_articulos([(url, p) for url, _, _, _, palabras in lote for p in palabras])
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--articulos', type=int, default=1000000)
+    parser.add_argument('--escrituras', type=int, default=5000, help='Artículos insertados en lotes de 10')
+    parser.add_argument('--semilla', type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(args.semilla)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'categorias.db')
+        start = time.perf_counter()
+        build(path, args.articulos, rng).close_db()
+        print(f"{args.articulos:,} artículos, {TOTAL_PALABRAS} palabras clave, {TOTAL_CATEGORIAS} categorías "
+              f"(construcción {time.perf_counter() - start:.0f}s)")
+
+        db = NewsInterfaceDatabase(path)
+        filas = db.conn.execute('SELECT COUNT(*) FROM articulo_categoria').fetchone()[0]
+        print(f"articulo_categoria: {filas:,} filas")
+        casos = [
+            ('1 categoría, 1 semana', ['categoria3'], None, '2024-06-01', '2024-06-08'),
+            ('1 categoría, 1 mes', ['categoria3'], None, '2024-06-01', '2024-07-01'),
+            ('1 categoría, todo', ['categoria3'], None, None, None),
+            ('3 categorías, 1 semana', ['categoria3', 'categoria8', 'categoria15'], None, '2024-06-01', '2024-06-08'),
+            ('3 categorías, 1 mes', ['categoria3', 'categoria8', 'categoria15'], None, '2024-06-01', '2024-07-01'),
+            ('1 categoría y 2 palabras clave, 3 meses', ['categoria3'], ['palabra3', 'palabra23'],
+             '2024-04-01', '2024-07-01'),
+        ]
+        for nombre, categories, keywords, start_date, end_date in casos:
+            query, params = old_query(categories, keywords, start_date, end_date)
+            old_time, old_result = timed(lambda: db.conn.execute(query, params).fetchall())
+            new_time, new_result = timed(lambda: db.fetch_articles(categories, keywords, start_date, end_date))
+            iguales = (sorted(old_result) == sorted(new_result)
+                       and [r[3] for r in old_result] == [r[3] for r in new_result])
+            print(f"{nombre:42s} {len(new_result):7,} artículos: anterior {old_time * 1000:9.1f} ms, "
+                  f"actual {new_time * 1000:7.1f} ms (x{old_time / new_time:.0f})"
+                  f"{'' if iguales else '  RESULTADOS DISTINTOS'}")
+        db.close_db()
+
+        # Alternando ambas variantes para que la caché y el crecimiento del fichero no favorezcan a ninguna
+        writer = NewsDatabase(path)
+        # Mismo modo que la conexión del hilo escritor (news_database.db_writer)
+        writer.conn.execute('PRAGMA journal_mode=WAL')
+        writer.conn.execute('PRAGMA synchronous=NORMAL')
+        llenar = writer._insert_articulo_categoria
+        sin_llenar = lambda cursor, url_ids: None
+        tiempos = {llenar: 0.0, sin_llenar: 0.0}
+        inicio = args.articulos
+        for i in range(0, args.escrituras, args.escrituras // 10):
+            for variante in (llenar, sin_llenar):
+                writer._insert_articulo_categoria = variante
+                tiempos[variante] += pipeline_writes(writer, rng, inicio, args.escrituras // 10)
+                inicio += args.escrituras // 10
+        writer.close_db()
+        con_tabla, sin_tabla = tiempos[llenar], tiempos[sin_llenar]
+        lotes = args.escrituras / LOTE_PIPELINE
+        print(f"Escritura de lotes de {LOTE_PIPELINE} artículos: {sin_tabla / lotes * 1000:.2f} ms por lote sin "
+              f"articulo_categoria, {con_tabla / lotes * 1000:.2f} ms con articulo_categoria")
+
+
+if __name__ == "__main__":
+    main()
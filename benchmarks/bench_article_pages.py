@@ -0,0 +1,73 @@
+"""
+Benchmark de la paginación por clave de fetch_articles (fetch_articles_page y count_articles).
+
+Con la misma base de datos sintética que bench_article_categories (por defecto 1M artículos en un año),
+compara para cada filtro de la interfaz:
+- fetch_articles: todos los artículos del filtro de una vez (lo que hacía la interfaz),
+- primera página + total estimado (lo que se muestra ahora antes de cargar más),
+- una página siguiente a mitad del resultado (desde su cursor),
+y comprueba que recorrer todas las páginas devuelve lo mismo que fetch_articles.
+
+Uso:
+    python -m benchmarks.bench_article_pages [--articulos 1000000]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.bench_article_categories import build
+from benchmarks.bench_url_ids import timed
+from news_database.interface_db import NewsInterfaceDatabase, ARTICLES_PAGE_SIZE
+
+CASOS = [
+    ('1 mes', {'start_date': '2024-06-01', 'end_date': '2024-07-01'}),
+    ('1 categoría, 1 mes', {'categories': ['categoria3'], 'start_date': '2024-06-01', 'end_date': '2024-07-01'}),
+    ('3 categorías, 1 mes', {'categories': ['categoria3', 'categoria8', 'categoria15'],
+                             'start_date': '2024-06-01', 'end_date': '2024-07-01'}),
+    ('2 palabras clave, 3 meses', {'keywords': ['palabra3', 'palabra23'],
+                                   'start_date': '2024-04-01', 'end_date': '2024-07-01'}),
+]
+
+
+def all_pages(db, filtros):
+    """ Todas las páginas en orden y el cursor de la página de la mitad """
+    articulos, cursores = [], []
+    pagina, cursor = db.fetch_articles_page(**filtros)
+    articulos.extend(pagina)
+    while cursor:
+        cursores.append(cursor)
+        pagina, cursor = db.fetch_articles_page(**filtros, after=cursor)
+        articulos.extend(pagina)
+    return articulos, cursores[len(cursores) // 2] if cursores else None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--articulos', type=int, default=1000000)
+    parser.add_argument('--semilla', type=int, default=21)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'paginas.db')
+        start = time.perf_counter()
+        build(path, args.articulos, random.Random(args.semilla)).close_db()
+        print(f"{args.articulos:,} artículos (construcción {time.perf_counter() - start:.0f}s), "
+              f"páginas de {ARTICLES_PAGE_SIZE}")
+
+        db = NewsInterfaceDatabase(path)
+        for nombre, filtros in CASOS:
+            todos_time, todos = timed(lambda: db.fetch_articles(**filtros))
+            primera_time, _ = timed(lambda: (db.fetch_articles_page(**filtros), db.count_articles(**filtros)))
+            paginas, cursor = all_pages(db, filtros)
+            siguiente_time, _ = timed(lambda: db.fetch_articles_page(**filtros, after=cursor))
+            print(f"{nombre:28s} {len(todos):7,} artículos: todos {todos_time * 1000:8.1f} ms, "
+                  f"primera página y total {primera_time * 1000:6.1f} ms, "
+                  f"página intermedia {siguiente_time * 1000:5.1f} ms"
+                  f"{'' if paginas == todos else '  PÁGINAS DISTINTAS'}")
+        db.close_db()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Benchmark de la concurrencia del crawl (CONCURRENT_REQUESTS / CONCURRENT_REQUESTS_PER_DOMAIN)
+y de AdaptiveThrottleMiddleware.
+
+Un servidor HTTP local con latencia simulada hace de fuentes: cada fuente es una dirección
+127.0.0.x distinta (un slot de descarga por fuente, como un dominio). Una araña mínima descarga
+el mismo conjunto de páginas repartidas entre las fuentes con cada configuración:
+- anterior: valores por defecto de Scrapy (16 globales, 8 por dominio), sin throttle adaptativo,
+- 64 / 8: la concurrencia actual de settings.py, sin throttle adaptativo,
+- 64 / 8 + adaptativo: la configuración actual completa,
+y compara páginas por segundo. Con --fallos, la primera fuente responde 503 a sus primeras
+peticiones: la fuente entra en espera y sus peticiones deben aplazarse, no perderse.
+
+Uso:
+    python -m benchmarks.bench_concurrency [--fuentes 20] [--paginas 2000] [--latencia 0.2] [--fallos 0]
+"""
+import argparse
+import time
+
+import scrapy
+from scrapy.crawler import CrawlerProcess
+from scrapy.utils.reactor import install_reactor
+
+# Reactor por defecto de Scrapy (el del crawl), instalado antes que el servidor de prueba
+REACTOR = 'twisted.internet.asyncioreactor.AsyncioSelectorReactor'
+
+# Mismos valores que settings.py, salvo el retraso máximo (30s) y la espera tras fallos (60s a 900s),
+# acortados para que el benchmark dure segundos
+ADAPTIVE_SETTINGS = {
+    'DOWNLOADER_MIDDLEWARES': {'news_scraper.middlewares.AdaptiveThrottleMiddleware': 580},
+    'RETRY_HTTP_CODES': [429, 500, 502, 503, 504],
+    'ADAPTIVE_THROTTLE_START_CONCURRENCY': 2,
+    'ADAPTIVE_THROTTLE_TARGET_LATENCY': 2.0,
+    'ADAPTIVE_THROTTLE_FAILURE_THRESHOLD': 5,
+    'ADAPTIVE_THROTTLE_MAX_DELAY': 1.0,
+    'ADAPTIVE_THROTTLE_BACKOFF': 1.0,
+    'ADAPTIVE_THROTTLE_MAX_BACKOFF': 4.0,
+}
+CONFIGURACIONES = {
+    'anterior (16 / 8)': {'CONCURRENT_REQUESTS': 16, 'CONCURRENT_REQUESTS_PER_DOMAIN': 8,
+                          'ADAPTIVE_THROTTLE_ENABLED': False},
+    '64 / 8': {'CONCURRENT_REQUESTS': 64, 'CONCURRENT_REQUESTS_PER_DOMAIN': 8,
+               'ADAPTIVE_THROTTLE_ENABLED': False},
+    '64 / 8 + adaptativo': {'CONCURRENT_REQUESTS': 64, 'CONCURRENT_REQUESTS_PER_DOMAIN': 8,
+                            **ADAPTIVE_SETTINGS},
+}
+
+
+def start_server(latencia, fallos):
+    """ Servidor HTTP en todas las direcciones 127.0.0.x; devuelve (puerto, respuestas 503 ya enviadas por fuente) """
+    from twisted.internet import reactor
+    from twisted.web import resource, server
+
+    class Pagina(resource.Resource):
+        isLeaf = True
+        errores = {}
+
+        def render_GET(self, request):
+            host = request.getHost().host
+            if host == '127.0.0.2' and self.errores.get(host, 0) < fallos:
+                self.errores[host] = self.errores.get(host, 0) + 1
+                request.setResponseCode(503)
+                return b'no disponible'
+
+            def responder():
+                if not request._disconnected:
+                    request.write(b'<html><body>' + b'noticia ' * 500 + b'</body></html>')
+                    request.finish()
+            reactor.callLater(latencia, responder)
+            return server.NOT_DONE_YET
+
+    return reactor.listenTCP(0, server.Site(Pagina()), interface='0.0.0.0').getHost().port, Pagina.errores
+
+
+class BenchSpider(scrapy.Spider):
+    name = 'bench_concurrency'
+
+    def __init__(self, urls, **kwargs):
+        super().__init__(**kwargs)
+        self.urls = urls
+        self.descargadas = 0
+
+    async def start(self):
+        for url in self.urls:
+            yield scrapy.Request(url, callback=self.parse)
+
+    def parse(self, response):
+        self.descargadas += 1
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--fuentes', type=int, default=20)
+    parser.add_argument('--paginas', type=int, default=2000)
+    parser.add_argument('--latencia', type=float, default=0.2, help='Segundos por respuesta')
+    parser.add_argument('--fallos', type=int, default=0, help='Respuestas 503 de la primera fuente')
+    args = parser.parse_args()
+
+    install_reactor(REACTOR)
+    process = CrawlerProcess(settings={'TWISTED_REACTOR': REACTOR, 'LOG_LEVEL': 'ERROR', 'ROBOTSTXT_OBEY': False,
+                                       'TELNETCONSOLE_ENABLED': False, 'RETRY_TIMES': 3})
+    from twisted.internet import defer, reactor
+    port, errores = start_server(args.latencia, args.fallos)
+    urls = [f'http://127.0.0.{2 + i % args.fuentes}:{port}/noticia-{i}.html' for i in range(args.paginas)]
+    print(f"{args.paginas} páginas en {args.fuentes} fuentes, latencia {args.latencia * 1000:.0f} ms, "
+          f"{args.fallos} respuestas 503 de la primera fuente")
+
+    @defer.inlineCallbacks
+    def run():
+        for nombre, settings in CONFIGURACIONES.items():
+            spider_cls = type('BenchSpider', (BenchSpider,), {'custom_settings': settings})
+            crawler = process.create_crawler(spider_cls)
+            errores.clear()
+            start = time.perf_counter()
+            yield process.crawl(crawler, urls=urls)
+            segundos = time.perf_counter() - start
+            stats = crawler.stats
+            print(f"{nombre:20s} {crawler.spider.descargadas:6d}/{len(urls)} páginas, "
+                  f"{crawler.spider.descargadas / segundos:7.1f} páginas/s, "
+                  f"aplazadas {stats.get_value('adaptive_throttle/delayed', 0)}, "
+                  f"esperas {stats.get_value('adaptive_throttle/backoffs', 0)}")
+
+    def stop(failure):
+        failure.printTraceback()
+
+    reactor.callWhenRunning(lambda: run().addErrback(stop).addBoth(lambda _: reactor.stop()))
+    process.start(stop_after_crawl=False)
+
+
+if __name__ == "__main__":
+    main()
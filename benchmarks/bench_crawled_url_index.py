@@ -0,0 +1,91 @@
+"""
+Benchmark: comprobación de urls exploradas en un sitemap de 50k urls.
+
+Compara el camino anterior (un SELECT por <loc> e inserciones cada 6 urls)
+con el índice en memoria cargado una sola vez (filter_crawled_urls).
+
+Uso:
+    python -m benchmarks.bench_crawled_url_index [--sitemap-urls 50000] [--historic-urls 500000]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from news_database.core_db import URL_COMPLETADA
+from news_database.news_db import NewsDatabase
+
+
+def build_database(db_path, historic_urls):
+    news_db = NewsDatabase(db_path)
+    news_db.create_tables()
+    news_db.bulk_insert_crawled_urls(
+        (f"https://www.ejemplo.es/noticias/{i}/articulo-de-prueba-con-un-titulo-largo-{i}.html"
+         for i in range(historic_urls)),
+        estado=URL_COMPLETADA,
+    )
+    return news_db
+
+
+def sitemap_locs(sitemap_urls, historic_urls):
+    # 90% de las urls del sitemap ya fueron exploradas en ejecuciones anteriores
+    start = historic_urls - int(sitemap_urls * 0.9)
+    return [
+        f"https://www.ejemplo.es/noticias/{i}/articulo-de-prueba-con-un-titulo-largo-{i}.html"
+        for i in range(start, start + sitemap_urls)
+    ]
+
+
+def run_before(news_db, locs):
+    """Camino anterior: un SELECT por url e inserción cada 6 urls nuevas"""
+    crawled_urls = []
+    for loc in locs:
+        if news_db.is_crawled_url(loc):
+            continue
+        crawled_urls.append(loc)
+        if len(crawled_urls) > 5:
+            news_db.bulk_insert_crawled_urls(crawled_urls)
+            crawled_urls.clear()
+    if crawled_urls:
+        news_db.bulk_insert_crawled_urls(crawled_urls)
+
+
+def run_after(news_db, locs):
+    """Camino nuevo: comprobación por lotes contra el índice en memoria"""
+    crawled_urls = news_db.filter_crawled_urls(locs)
+    if crawled_urls:
+        news_db.bulk_insert_crawled_urls(crawled_urls)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sitemap-urls', type=int, default=50000)
+    parser.add_argument('--historic-urls', type=int, default=500000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        locs = sitemap_locs(args.sitemap_urls, args.historic_urls)
+
+        news_db = build_database(os.path.join(tmp_dir, 'before.db'), args.historic_urls)
+        start = time.perf_counter()
+        run_before(news_db, locs)
+        before = time.perf_counter() - start
+        news_db.close_db()
+
+        news_db = build_database(os.path.join(tmp_dir, 'after.db'), args.historic_urls)
+        start = time.perf_counter()
+        total = news_db.load_crawled_url_index()
+        load_time = time.perf_counter() - start
+        start = time.perf_counter()
+        run_after(news_db, locs)
+        after = time.perf_counter() - start
+        news_db.close_db()
+
+    print(f"Sitemap de {len(locs)} urls, {args.historic_urls} urls exploradas previamente")
+    print(f"Antes (SELECT por url):      {before:.3f}s por sitemap")
+    print(f"Después (índice en memoria): {after:.3f}s por sitemap")
+    print(f"Carga del índice ({total} urls, una vez por ejecución): {load_time:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
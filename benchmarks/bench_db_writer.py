@@ -0,0 +1,181 @@
+"""
+Benchmark del hilo escritor con confirmación agrupada (news_database.db_writer).
+
+Simula las escrituras de un crawl: por cada sitemap, las urls descubiertas, su estado y los
+validadores HTTP; por cada artículo, su descarte (marcado en lotes como SQLitePipeline) o su
+inserción en lotes de 10 (artículos, palabras clave, textos comprimidos y estado de la url).
+Compara:
+- cada método de NewsDatabase confirmando por su cuenta en el hilo del reactor (journal DELETE),
+- las mismas llamadas encoladas en DatabaseWriter (WAL, una transacción por ventana),
+midiendo transacciones confirmadas, tiempo bloqueado en el hilo que llama y tiempo total,
+y verificando que ambas bases de datos terminan con el mismo contenido.
+
+Uso:
+    python -m benchmarks.bench_db_writer [--articulos 5000] [--aceptados 0.3]
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.bench_normalization import build_vocabulary
+from benchmarks.bench_text_store import build_articles, FUENTES
+from news_database.db_writer import DatabaseWriter
+from news_database.news_db import NewsDatabase
+
+URLS_POR_SITEMAP = 50
+LOTE = 10
+TABLAS = ['urls_exploradas', 'articulos', 'palabra_clave_articulos', 'textos_articulos',
+          'sitemap_state', 'cache_http']
+
+
+class CountingConnection:
+    """ Cuenta los commit() de la conexión de NewsDatabase """
+
+    def __init__(self, conn):
+        self._conn = conn
+        self.commits = 0
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def commit(self):
+        self.commits += 1
+        self._conn.commit()
+
+
+def build_workload(rng, articles, aceptados):
+    """ Lista de llamadas (método, args) en el orden en que las haría el crawl """
+    calls = []
+    lote, descartados = [], []
+    for inicio in range(0, len(articles), URLS_POR_SITEMAP):
+        fuente = FUENTES[(inicio // URLS_POR_SITEMAP) % len(FUENTES)]
+        sitemap = f'https://{fuente}/sitemap-{inicio}.xml'
+        items = [{
+            'url': f'https://{fuente}/noticia-{i}.html',
+            'fuente': fuente,
+            'titulo': f'Noticia {i}',
+            'fecha_publicacion': f'2025-01-01 {i % 24:02d}:00:00',
+            'texto': articles[i],
+            'keyword-ids': [1 + i % 3],
+        } for i in range(inicio, min(inicio + URLS_POR_SITEMAP, len(articles)))]
+        calls.append(('save_http_validators', (sitemap, f'"{inicio}"', None)))
+        calls.append(('bulk_insert_crawled_urls', ([item['url'] for item in items],)))
+        calls.append(('save_sitemap_state', (sitemap, None, f'{inicio:032x}', None, 0)))
+        for item in items:
+            if rng.random() < aceptados:
+                lote.append(item)
+                if len(lote) >= LOTE:
+                    calls.append(('articulos', (lote,)))
+                    lote = []
+            else:
+                descartados.append(item['url'])
+                if len(descartados) >= LOTE:
+                    calls.append(('mark_crawled_urls_completed', (descartados,)))
+                    descartados = []
+    if lote:
+        calls.append(('articulos', (lote,)))
+    if descartados:
+        calls.append(('mark_crawled_urls_completed', (descartados,)))
+    return calls
+
+
+def write_batch(db, lote):
+    """ Escrituras de SQLitePipeline para un lote de artículos aceptados """
+    db.bulk_insert_articles(lote)
+    db.bulk_insert_palabra_clave_articulos([(item['url'], kid) for item in lote for kid in item['keyword-ids']])
+    db.bulk_insert_article_texts(lote)
+    db.mark_crawled_urls_completed([item['url'] for item in lote])
+
+
+def prepare(path):
+    db = NewsDatabase(path)
+    db.create_tables()
+    db.bulk_insert_fuentes([(fuente, fuente, f'https://{fuente}/') for fuente in FUENTES])
+    for palabra in ['universidad', 'oviedo', 'asturias']:
+        db.conn.execute('INSERT INTO palabras_clave (palabra, stem) VALUES (?, ?)', (palabra, palabra))
+    db.conn.commit()
+    return db
+
+
+def run_direct(path, calls):
+    db = prepare(path)
+    conn = CountingConnection(db.conn)
+    db.conn = conn
+    start = time.perf_counter()
+    for method, args in calls:
+        if method == 'articulos':
+            write_batch(db, *args)
+        else:
+            getattr(db, method)(*args)
+    elapsed = time.perf_counter() - start
+    db.conn = conn._conn
+    return db, conn.commits, elapsed, elapsed
+
+
+def run_writer(path, calls, commit_interval):
+    prepare(path).close_db()
+    writer = DatabaseWriter(path, commit_interval=commit_interval)
+    writer.start()
+    blocked = 0.0
+    start = time.perf_counter()
+    for method, args in calls:
+        t = time.perf_counter()
+        if method == 'articulos':
+            writer.enqueue_call(write_batch, *args)
+        else:
+            writer.enqueue(method, *args)
+        blocked += time.perf_counter() - t
+    writer.flush().result()
+    elapsed = time.perf_counter() - start
+    writer.close()
+    return NewsDatabase(path), writer.commits, blocked, elapsed
+
+
+def table_contents(db):
+    contents = {}
+    for tabla in TABLAS:
+        cursor = db.conn.execute(f'SELECT * FROM {tabla}')
+        columnas = [c[0] for c in cursor.description]
+        # Las fechas de registro dependen del momento de la ejecución
+        ignorar = {i for i, c in enumerate(columnas) if c in ('crawled_at', 'actualizado_en', 'processed_at')}
+        contents[tabla] = sorted(tuple(v for i, v in enumerate(row) if i not in ignorar) for row in cursor)
+    return contents
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--articulos', type=int, default=5000)
+    parser.add_argument('--aceptados', type=float, default=0.3, help='Fracción de artículos que pasan el filtro')
+    parser.add_argument('--frases', type=int, default=10)
+    parser.add_argument('--intervalo', type=float, default=1.0, help='COMMIT_INTERVAL del escritor')
+    parser.add_argument('--semilla', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(args.semilla)
+    articles = build_articles(rng, build_vocabulary(rng, 20000), args.articulos, args.frases)
+    calls = build_workload(rng, articles, args.aceptados)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with contextlib.redirect_stdout(io.StringIO()):
+            direct_db, direct_commits, direct_blocked, direct_time = run_direct(os.path.join(tmp, 'directo.db'), calls)
+            writer_db, writer_commits, writer_blocked, writer_time = run_writer(
+                os.path.join(tmp, 'escritor.db'), calls, args.intervalo)
+
+        print(f"{args.articulos} artículos, {len(calls)} operaciones de escritura")
+        print(f"Commit por método:   {direct_commits:6d} transacciones, {direct_blocked:7.2f}s bloqueando el reactor, "
+              f"{direct_time:7.2f}s en total")
+        print(f"Hilo escritor (WAL): {writer_commits:6d} transacciones, {writer_blocked:7.2f}s bloqueando el reactor, "
+              f"{writer_time:7.2f}s en total")
+        diferentes = [tabla for tabla, filas in table_contents(direct_db).items()
+                      if filas != table_contents(writer_db)[tabla]]
+        print(f"Tablas con contenido distinto: {diferentes or 'ninguna'}")
+        direct_db.close_db()
+        writer_db.close_db()
+
+
+if __name__ == "__main__":
+    main()
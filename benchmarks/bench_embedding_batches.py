@@ -0,0 +1,92 @@
+"""
+Benchmark de la codificación por lotes de EmbeddingPipeline frente a un encode por artículo.
+
+Con artículos sintéticos (palabras de un vocabulario con frecuencias de Zipf, como bench_fulltext) y el
+modelo y los fragmentos de EmbeddingPipeline, guarda los embeddings en un índice de Chroma temporal:
+- por artículo: SearchManager.ingest_article (un encode y una escritura en Chroma por artículo),
+- por lotes: fragmentos de varios artículos hasta el presupuesto de tokens, como el pipeline,
+y compara los fragmentos por segundo.
+
+Uso:
+    python -m benchmarks.bench_embedding_batches [--articulos 300] [--tokens 8192]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.bench_fulltext import vocabulary
+from news_search.chroma_engine import ChromaVectorEngine
+from news_search.embedding_generator import EmbeddingGenerator
+from news_search.search_manager import SearchManager
+
+# Mismo modelo y fragmentos que EmbeddingPipeline
+MODEL_NAME = 'intfloat/multilingual-e5-small'
+PALABRAS_ARTICULO = 600
+
+
+def articles(rng, total):
+    palabras, pesos = vocabulary(rng)
+    return [(f'Noticia {i}\n\n' + ' '.join(rng.choices(palabras, cum_weights=pesos, k=PALABRAS_ARTICULO)),
+             {'titulo': f'Noticia {i}', 'url': f'https://www.periodico.es/noticia-{i}.html',
+              'fuente': 'www.periodico.es', 'fecha_publicacion': '2025-01-01'}) for i in range(total)]
+
+
+def search_manager(embedding_model, directory):
+    vector_db = ChromaVectorEngine(embedding=embedding_model, persist_directory=directory)
+    return SearchManager(embedding_model=embedding_model, vector_engine=vector_db, chunk_size=500, chunk_overlap=100)
+
+
+def per_article(manager, articulos):
+    """ (fragmentos, segundos) con un ingest_article por artículo """
+    fragmentos = sum(len(manager.split_article(content, metadata)) for content, metadata in articulos)
+    start = time.perf_counter()
+    for content, metadata in articulos:
+        manager.ingest_article(content, metadata)
+    return fragmentos, time.perf_counter() - start
+
+
+def batched(manager, embedding_model, articulos, token_budget):
+    """ (fragmentos, segundos, lotes) acumulando fragmentos hasta token_budget como EmbeddingPipeline """
+    fragmentos = lotes = 0
+    start = time.perf_counter()
+    pendientes, tokens = [], 0
+    for content, metadata in articulos:
+        # Artículos completos en cada lote, como EmbeddingPipeline
+        chunks = manager.split_article(content, metadata)
+        n = sum(embedding_model.count_tokens(chunk['chunk_text']) for chunk in chunks)
+        if pendientes and tokens + n > token_budget:
+            manager.ingest_chunks(pendientes)
+            fragmentos, lotes = fragmentos + len(pendientes), lotes + 1
+            pendientes, tokens = [], 0
+        pendientes.extend(chunks)
+        tokens += n
+    manager.ingest_chunks(pendientes)
+    fragmentos, lotes = fragmentos + len(pendientes), lotes + 1
+    return fragmentos, time.perf_counter() - start, lotes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--articulos', type=int, default=300)
+    parser.add_argument('--tokens', type=int, default=8192, help='EMBEDDING_TOKEN_BUDGET')
+    parser.add_argument('--semilla', type=int, default=25)
+    args = parser.parse_args()
+
+    embedding_model = EmbeddingGenerator(model_name=MODEL_NAME)
+    articulos = articles(random.Random(args.semilla), args.articulos)
+    with tempfile.TemporaryDirectory() as tmp:
+        # Carga del modelo y de Chroma fuera de la medida
+        per_article(search_manager(embedding_model, os.path.join(tmp, 'calentamiento')), articulos[:5])
+
+        fragmentos, segundos = per_article(search_manager(embedding_model, os.path.join(tmp, 'articulo')), articulos)
+        print(f"{args.articulos} artículos, {fragmentos} fragmentos")
+        print(f"Un encode por artículo:  {fragmentos / segundos:7.1f} fragmentos/s")
+        fragmentos, segundos, lotes = batched(search_manager(embedding_model, os.path.join(tmp, 'lotes')),
+                                              embedding_model, articulos, args.tokens)
+        print(f"Lotes de {args.tokens} tokens: {fragmentos / segundos:7.1f} fragmentos/s ({lotes} lotes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Benchmark del índice de texto completo (busqueda_articulos, FTS5) y de search_fulltext.
+
+Con la misma base de datos sintética que bench_article_categories (por defecto 1M artículos en un año),
+indexa un texto por artículo (palabras de un vocabulario con frecuencias de Zipf, como en el texto real,
+y una frase conocida en uno de cada FRASE_CADA artículos) y mide:
+- el tamaño del índice y la velocidad de indexación,
+- el tiempo de search_fulltext con términos raros, frecuentes, frases, prefijos y rangos de fechas,
+  comprobando el número de artículos de la frase conocida,
+- consultas en lenguaje natural (any_term, como FulltextEngine en la búsqueda híbrida) con y sin límite
+  de candidatos: latencia p50/p95 y recall@10 frente al orden BM25 de todos los artículos encontrados,
+- el coste de escritura: lotes de 10 textos como SQLitePipeline, con y sin la actualización del índice
+  en bulk_insert_article_texts.
+
+Uso:
+    python -m benchmarks.bench_fulltext [--articulos 1000000]
+"""
+import argparse
+import itertools
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from benchmarks.bench_article_categories import build, FUENTES, LOTE_PIPELINE
+from benchmarks.bench_url_ids import object_sizes, timed
+from news_database.core_db import URL_COMPLETADA
+from news_database.interface_db import NewsInterfaceDatabase, FULLTEXT_CANDIDATES
+from news_database.news_db import NewsDatabase
+from news_database.utils import fulltext_query
+
+VOCABULARIO = 50000
+PALABRAS_TEXTO = 120
+# Consultas en lenguaje natural: palabras por consulta, resultados comparados y límites de candidatos
+PALABRAS_CONSULTA = (2, 6)
+RECALL_K = 10
+LIMITES_CANDIDATOS = (FULLTEXT_CANDIDATES, 50000, None)
+FRASE = 'Universidad de Oviedo'
+FRASE_CADA = 200
+SILABAS = ['ba', 'ce', 'di', 'fo', 'gu', 'la', 'me', 'ni', 'po', 'ru', 'sa', 'te', 'vi', 'zo', 'ción', 'mía', 'tré']
+
+
+def vocabulary(rng):
+    """ Palabras distintas (algunas con tilde) y sus pesos acumulados de Zipf """
+    palabras = set()
+    while len(palabras) < VOCABULARIO:
+        palabras.add(''.join(rng.choices(SILABAS, k=rng.randint(2, 4))))
+    palabras = sorted(palabras)
+    rng.shuffle(palabras)
+    return palabras, list(itertools.accumulate(1 / rango for rango in range(1, VOCABULARIO + 1)))
+
+
+def text(rng, palabras, pesos, i):
+    texto = ' '.join(rng.choices(palabras, cum_weights=pesos, k=PALABRAS_TEXTO))
+    if i % FRASE_CADA == 0:
+        texto += f'. Según la {FRASE}, {texto[:40]}'
+    return texto
+
+
+def fill_index(db, rng, palabras, pesos, total):
+    """ Indexa un texto por artículo (url_id 1..total) con su título. Retorna los segundos empleados """
+    start = time.perf_counter()
+    for inicio in range(1, total + 1, 10000):
+        url_ids = range(inicio, min(inicio + 10000, total + 1))
+        db.conn.executemany('INSERT INTO busqueda_articulos (rowid, titulo, texto) VALUES (?, ?, ?)',
+                            [(url_id, f'Noticia {url_id - 1}', text(rng, palabras, pesos, url_id - 1))
+                             for url_id in url_ids])
+        db.conn.commit()
+    return time.perf_counter() - start
+
+
+def natural_language_queries(interfaz, rng, palabras, pesos, total):
+    """
+    {límite de candidatos: (recall@RECALL_K medio, latencia p50, latencia p95)} de total consultas any_term
+    de PALABRAS_CONSULTA palabras con la frecuencia del texto. El orden de referencia es el de BM25 sobre
+    todos los artículos encontrados (candidates=None)
+    """
+    consultas = [' '.join(rng.choices(palabras, cum_weights=pesos, k=rng.randint(*PALABRAS_CONSULTA)))
+                 for _ in range(total)]
+    resultados = {}
+    for candidatos in LIMITES_CANDIDATOS:
+        latencias, encontrados = [], []
+        for consulta in consultas:
+            duracion, resultado = timed(lambda: interfaz.search_fulltext(consulta, limit=RECALL_K, any_term=True,
+                                                                         candidates=candidatos), repeticiones=1)
+            latencias.append(duracion)
+            encontrados.append({url for _, url, _, _ in resultado})
+        resultados[candidatos] = (encontrados, latencias)
+    referencia = resultados[None][0]
+    metricas = {}
+    for candidatos, (encontrados, latencias) in resultados.items():
+        recall = statistics.mean(len(e & r) / len(r) if r else 1.0 for e, r in zip(encontrados, referencia))
+        percentiles = statistics.quantiles(latencias, n=20, method='inclusive')
+        metricas[candidatos] = (recall, statistics.median(latencias), percentiles[18])
+    return metricas
+
+
+def pipeline_texts(db, rng, palabras, pesos, inicio, total):
+    """ Segundos de escritura de los textos de total artículos en lotes como SQLitePipeline """
+    lotes = []
+    for i in range(inicio, inicio + total, LOTE_PIPELINE):
+        lote = [{'url': f'https://{FUENTES[n % len(FUENTES)]}/texto-{n}.html', 'fuente': FUENTES[n % len(FUENTES)],
+                 'titulo': f'Noticia {n}', 'fecha_publicacion': '2025-01-01 10:00:00',
+                 'texto': text(rng, palabras, pesos, n)} for n in range(i, i + LOTE_PIPELINE)]
+        db.bulk_insert_crawled_urls([a['url'] for a in lote], estado=URL_COMPLETADA)
+        db.bulk_insert_articles(lote)
+        lotes.append(lote)
+    start = time.perf_counter()
+    for lote in lotes:
+        db.bulk_insert_article_texts(lote)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--articulos', type=int, default=1000000)
+    parser.add_argument('--escrituras', type=int, default=5000,
+                        help='Artículos con texto insertados en lotes de 10 por variante')
+    parser.add_argument('--consultas', type=int, default=100, help='Consultas en lenguaje natural (any_term)')
+    parser.add_argument('--semilla', type=int, default=23)
+    args = parser.parse_args()
+
+    rng = random.Random(args.semilla)
+    palabras, pesos = vocabulary(rng)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'texto_completo.db')
+        start = time.perf_counter()
+        db = build(path, args.articulos, rng)
+        construccion = time.perf_counter() - start
+        indexacion = fill_index(db, rng, palabras, pesos, args.articulos)
+        db.conn.execute("INSERT INTO busqueda_articulos (busqueda_articulos) VALUES ('optimize')")
+        db.conn.commit()
+        indice = sum(tamano for nombre, tamano in object_sizes(db.conn).items() if nombre.startswith('busqueda_articulos'))
+        print(f"{args.articulos:,} artículos de {PALABRAS_TEXTO} palabras, vocabulario de {VOCABULARIO:,} "
+              f"(construcción {construccion:.0f}s)")
+        print(f"Indexación: {args.articulos / indexacion:,.0f} artículos/s, índice de {indice / 1e6:,.0f} MB "
+              f"({indice / args.articulos:,.0f} bytes/artículo)")
+        db.close_db()
+
+        interfaz = NewsInterfaceDatabase(path)
+        casos = [
+            ('palabra rara', palabras[40000], None, None),
+            ('palabra media', palabras[2000], None, None),
+            ('palabra frecuente', palabras[10], None, None),
+            ('palabra frecuente, 1 semana', palabras[10], '2024-06-01', '2024-06-08'),
+            ('dos palabras frecuentes', f'{palabras[100]} {palabras[300]}', None, None),
+            ('frase', f'"{FRASE.lower()}"', None, None),
+            ('frase, 1 mes', f'"{FRASE}"', '2024-06-01', '2024-07-01'),
+            ('prefijo', palabras[3000][:4] + '*', None, None),
+        ]
+        for nombre, consulta, start_date, end_date in casos:
+            duracion, resultado = timed(lambda: interfaz.search_fulltext(consulta, start_date, end_date))
+            encontrados = interfaz.conn.execute('SELECT COUNT(*) FROM busqueda_articulos WHERE busqueda_articulos MATCH ?',
+                                                (fulltext_query(consulta),)).fetchone()[0]
+            print(f"{nombre:30s} {encontrados:9,} coincidencias: {duracion * 1000:7.1f} ms "
+                  f"({len(resultado)} resultados)")
+        esperados = len(range(0, args.articulos, FRASE_CADA))
+        encontrados = interfaz.conn.execute('SELECT COUNT(*) FROM busqueda_articulos WHERE busqueda_articulos MATCH ?',
+                                            (fulltext_query(f'"{FRASE}"'),)).fetchone()[0]
+        print(f"Artículos con la frase: {encontrados:,} de {esperados:,}"
+              f"{'' if encontrados == esperados else '  RESULTADOS DISTINTOS'}")
+        metricas = natural_language_queries(interfaz, rng, palabras, pesos, args.consultas)
+        for candidatos, (recall, p50, p95) in metricas.items():
+            limite = f"{candidatos:,} candidatos" if candidatos is not None else "sin límite"
+            print(f"{args.consultas} consultas any_term, {limite:18s} recall@{RECALL_K} {recall:.3f}, "
+                  f"latencia p50 {p50 * 1000:7.1f} ms, p95 {p95 * 1000:7.1f} ms")
+        interfaz.close_db()
+
+        # Alternando ambas variantes para que la caché y el crecimiento del fichero no favorezcan a ninguna
+        writer = NewsDatabase(path)
+        # Mismo modo que la conexión del hilo escritor (news_database.db_writer)
+        writer.conn.execute('PRAGMA journal_mode=WAL')
+        writer.conn.execute('PRAGMA synchronous=NORMAL')
+        indexar = (writer._index_fulltext, writer._unindex_fulltext)
+        sin_indexar = (lambda cursor, textos: None, lambda cursor, url_ids: None)
+        tiempos = {indexar: 0.0, sin_indexar: 0.0}
+        inicio = args.articulos
+        for i in range(0, args.escrituras, args.escrituras // 10):
+            for variante in (indexar, sin_indexar):
+                writer._index_fulltext, writer._unindex_fulltext = variante
+                tiempos[variante] += pipeline_texts(writer, rng, palabras, pesos, inicio, args.escrituras // 10)
+                inicio += args.escrituras // 10
+        writer.close_db()
+        con_indice, sin_indice = tiempos[indexar], tiempos[sin_indexar]
+        lotes = args.escrituras / LOTE_PIPELINE
+        print(f"Textos en lotes de {LOTE_PIPELINE} artículos: {sin_indice / lotes * 1000:.2f} ms por lote sin "
+              f"busqueda_articulos, {con_indice / lotes * 1000:.2f} ms con busqueda_articulos")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark de la búsqueda semántica híbrida (SearchManager en modo SEARCH_MODE_HYBRID).
+
+Con la base de datos de noticias, el índice vectorial de Chroma y un conjunto de consultas etiquetadas,
+compara la búsqueda vectorial (la anterior), la léxica (BM25 de busqueda_articulos) y la híbrida
+(ambas en paralelo fusionadas con reciprocal rank fusion):
+- recall@k: fracción de los artículos relevantes de cada consulta entre los k primeros resultados (media),
+- latencia p50 y p95 de retrieve_related_news.
+
+Las consultas etiquetadas son un fichero JSON Lines con una consulta por línea:
+    {"consulta": "acuerdo PSOE PP", "relevantes": ["https://...", ...], "desde": "2025-01-01", "hasta": "2025-01-31"}
+(desde y hasta opcionales, fechas incluidas como en la interfaz).
+
+Uso:
+    python -m benchmarks.bench_hybrid_search consultas.jsonl [--db news_database/news.db]
+                                             [--chroma news_search/chroma_db] [-k 10]
+"""
+import argparse
+import json
+import statistics
+import time
+from datetime import date
+
+from news_search.chroma_engine import ChromaVectorEngine
+from news_search.embedding_generator import EmbeddingGenerator
+from news_search.fulltext_engine import FulltextEngine
+from news_search.search_manager import SearchManager, SEARCH_MODE_VECTOR, SEARCH_MODE_HYBRID
+
+# Mismo modelo que main.initialize_search_manager y EmbeddingPipeline
+MODEL_NAME = 'intfloat/multilingual-e5-small'
+
+
+def load_queries(path):
+    consultas = []
+    with open(path, encoding='utf-8') as f:
+        for linea in f:
+            if linea.strip():
+                consulta = json.loads(linea)
+                for campo in ('desde', 'hasta'):
+                    consulta[campo] = date.fromisoformat(consulta[campo]) if consulta.get(campo) else None
+                consultas.append(consulta)
+    return consultas
+
+
+def evaluate(buscar, consultas, k, repeticiones):
+    """ (recall@k medio, latencia p50, latencia p95) de buscar(consulta) -> metadatos de los artículos """
+    recalls, latencias = [], []
+    for consulta in consultas:
+        relevantes = set(consulta['relevantes'])
+        for _ in range(repeticiones):
+            start = time.perf_counter()
+            articulos = buscar(consulta)
+            latencias.append(time.perf_counter() - start)
+        encontrados = {a['url'] for a in articulos[:k]}
+        recalls.append(len(encontrados & relevantes) / len(relevantes) if relevantes else 1.0)
+    percentiles = statistics.quantiles(latencias, n=20, method='inclusive')
+    return statistics.mean(recalls), statistics.median(latencias), percentiles[18]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('consultas', help='Consultas etiquetadas (JSON Lines)')
+    parser.add_argument('--db', default='news_database/news.db')
+    parser.add_argument('--chroma', default='news_search/chroma_db')
+    parser.add_argument('-k', type=int, default=10)
+    parser.add_argument('--repeticiones', type=int, default=3, help='Ejecuciones de cada consulta para la latencia')
+    args = parser.parse_args()
+
+    consultas = load_queries(args.consultas)
+    embedding_model = EmbeddingGenerator(model_name=MODEL_NAME)
+    vector_db = ChromaVectorEngine(embedding=embedding_model, persist_directory=args.chroma, sqlite_path=args.db)
+    lexical_db = FulltextEngine(args.db)
+    search_manager = SearchManager(embedding_model=embedding_model, vector_engine=vector_db, chunk_size=500,
+                                   chunk_overlap=100, lexical_engine=lexical_db)
+
+    modos = {
+        'vectorial': lambda c: search_manager.retrieve_related_news(
+            c['consulta'], k=args.k, date_from=c['desde'], date_to=c['hasta'], mode=SEARCH_MODE_VECTOR),
+        'léxica (BM25)': lambda c: lexical_db.retrieve_related_documents(
+            c['consulta'], k=args.k, date_from=c['desde'], date_to=c['hasta']),
+        'híbrida (RRF)': lambda c: search_manager.retrieve_related_news(
+            c['consulta'], k=args.k, date_from=c['desde'], date_to=c['hasta'], mode=SEARCH_MODE_HYBRID),
+    }
+    print(f"{len(consultas)} consultas etiquetadas, k={args.k}, "
+          f"presupuesto de la híbrida {search_manager.latency_budget * 1000:.0f} ms")
+    for nombre, buscar in modos.items():
+        # Primera consulta fuera de la medida (carga del modelo y de las páginas del índice)
+        buscar(consultas[0])
+        recall, p50, p95 = evaluate(buscar, consultas, args.k, args.repeticiones)
+        print(f"{nombre:15s} recall@{args.k} {recall:.3f}, latencia p50 {p50 * 1000:7.1f} ms, "
+              f"p95 {p95 * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark de normalización de texto (news_database.normalization).
+
+Simula un día de artículos: textos con vocabulario español sintético distribuido
+según la ley de Zipf (raíces + sufijos habituales, con acentos y puntuación).
+Compara _preprocesar_texto anterior (SnowballStemmer sin caché) con normalize_text
+(caché LRU de stems) y verifica que ambos devuelvan el mismo texto.
+
+Uso:
+    python -m benchmarks.bench_normalization [--articulos 1500] [--palabras 500]
+"""
+import argparse
+import random
+import re
+import time
+import unicodedata
+
+from nltk.stem.snowball import SnowballStemmer
+
+from news_database.normalization import normalize_text, get_spanish_stopwords, stem
+
+RAICES = ['universidad', 'oviedo', 'investig', 'estudi', 'rector', 'campus', 'asturi', 'cienci',
+          'docent', 'alumn', 'profesor', 'proyect', 'educ', 'tecnolog', 'salud', 'polít', 'econom',
+          'cultur', 'deport', 'gobiern', 'ayuntamient', 'hospital', 'empres', 'trabaj', 'format']
+SUFIJOS = ['', 'a', 'o', 'as', 'os', 'es', 'ción', 'ciones', 'ado', 'ada', 'ando', 'iendo', 'mente',
+           'idad', 'idades', 'ería', 'ista', 'istas', 'ó', 'aron', 'ía', 'ían', 'ar', 'er', 'ir']
+PUNTUACION = ['', '', '', ',', '.', ':', ';', '"', '(', ')', '¿', '?']
+
+
+def build_vocabulary(rng, size):
+    vocabulary = set()
+    while len(vocabulary) < size:
+        raiz = rng.choice(RAICES) if rng.random() < 0.3 else \
+            ''.join(rng.choice('bcdfglmnprstv') + rng.choice('aeiouáéíó') for _ in range(rng.randint(2, 4)))
+        vocabulary.add(raiz + rng.choice(SUFIJOS))
+    return list(vocabulary)
+
+
+def build_articles(rng, vocabulary, total_articles, words_per_article, zipf_s=1.1):
+    weights = [1 / (rank ** zipf_s) for rank in range(1, len(vocabulary) + 1)]
+    articles = []
+    for _ in range(total_articles):
+        words = rng.choices(vocabulary, weights=weights, k=words_per_article)
+        articles.append(' '.join(w.capitalize() if rng.random() < 0.1 else w + rng.choice(PUNTUACION)
+                                 for w in words))
+    return articles
+
+
+PUNCTUATION_RE = re.compile(r'[^\w\s]')
+
+
+def preprocesar_texto_legacy(texto, stopwords, stemmer):
+    """Copia de FiltradoNoticiasPipeline._preprocesar_texto anterior"""
+    texto = texto.lower()
+    texto = unicodedata.normalize('NFKD', texto).encode('ASCII', 'ignore').decode('utf-8')
+    texto = PUNCTUATION_RE.sub(' ', texto)
+    texto = re.sub(r'\s+', ' ', texto).strip()
+    palabras = texto.split()
+    palabras_limpias = [p for p in palabras if p not in stopwords]
+    return ' '.join([stemmer.stem(palabra) for palabra in palabras_limpias])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--articulos', type=int, default=1500)
+    parser.add_argument('--palabras', type=int, default=500)
+    parser.add_argument('--vocabulario', type=int, default=60000)
+    parser.add_argument('--semilla', type=int, default=3)
+    args = parser.parse_args()
+
+    try:
+        stopwords = get_spanish_stopwords()
+    except LookupError:
+        print("Stopwords de NLTK no disponibles: se usa un conjunto vacío")
+        stopwords = frozenset()
+
+    rng = random.Random(args.semilla)
+    vocabulary = build_vocabulary(rng, args.vocabulario)
+    articles = build_articles(rng, vocabulary, args.articulos, args.palabras)
+    total_words = args.articulos * args.palabras
+
+    stemmer = SnowballStemmer('spanish')
+    start = time.perf_counter()
+    legacy = [preprocesar_texto_legacy(texto, stopwords, stemmer) for texto in articles]
+    legacy_time = time.perf_counter() - start
+
+    stem.cache_clear()
+    start = time.perf_counter()
+    nuevo = [normalize_text(texto, stopwords) for texto in articles]
+    new_time = time.perf_counter() - start
+    info = stem.cache_info()
+
+    diferencias = sum(1 for a, b in zip(legacy, nuevo) if a != b)
+    print(f"{args.articulos} artículos x {args.palabras} palabras ({total_words} tokens)")
+    print(f"Anterior (sin caché): {total_words / legacy_time:12,.0f} palabras/s ({legacy_time:.2f}s)")
+    print(f"normalize_text:       {total_words / new_time:12,.0f} palabras/s ({new_time:.2f}s)")
+    print(f"Aciertos de caché: {info.hits / (info.hits + info.misses):.1%} ({info.currsize} stems distintos)")
+    print(f"Artículos con resultados distintos: {diferencias}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Micro-benchmark de normalize_date.
+
+El corpus reproduce los formatos que devuelven los selectores de
+SitemapParser._extract_publication_date (meta article:published_time,
+time@datetime, p.firma, span.fecha-noticia, ...) y los lastmod /
+news:publication_date de los sitemaps. Se compara con la implementación
+anterior (sin expresiones precompiladas, sin vía rápida ISO y sin caché)
+y se verifica que ambas devuelvan el mismo resultado.
+
+Uso:
+    python -m benchmarks.bench_normalize_date [--repeticiones 200]
+"""
+import argparse
+import re
+import time
+
+import dateutil
+from dateutil import parser as date_parser
+
+from news_scraper.utils.utils import MADRID_TZ, normalize_date, _normalize_date_cached
+
+DATE_CORPUS = [
+    # lastmod / news:publication_date de sitemaps
+    '2025-05-12T09:41:23+02:00',
+    '2025-05-12T07:41:23Z',
+    '2025-05-12T09:41:23.000+02:00',
+    '2025-05-12 09:41:23',
+    '2025-05-12',
+    # meta[property="article:published_time"] y time::attr(datetime)
+    '2025-05-12T09:41:23+0200',
+    '2025-05-12T09:41:00.123456+02:00',
+    # p.firma / //p[@class="firma"]/text()[2]
+    '12/05/2025 09:41',
+    '12/05/2025 - 09:41 h.',
+    # span.fecha-noticia, span.date, div.fecha
+    '12 de mayo de 2025',
+    'lunes, 12 de mayo de 2025',
+    '12 mayo, 2025',
+    '12 de mayo de 2025 a las 09:41 h',
+    # .entry-meta-date a, .item-metadata.posts-date a
+    'mayo 12, 2025',
+    '12 may 2025',
+    # h2.date-header span, ul.post-tags li:first-child
+    'martes, 13 de mayo de 2025',
+    '13/05/2025',
+    # span.fw-bold y formatos con zona horaria
+    '13 de mayo de 2025 09:41 CEST',
+    '13 dic 2025 09:41 cet',
+]
+
+
+def normalize_date_legacy(date_string, formato_entrada=None, dayfirst=None):
+    """Implementación anterior de normalize_date (referencia)"""
+    processed_str = date_string.lower()
+    processed_str = re.sub(r'\ba las\b', ' ', processed_str)
+    tz_match = re.search(r'(cet|cest)', processed_str)
+    tz_abbr = tz_match.group(0) if tz_match else None
+    if tz_abbr:
+        processed_str = processed_str.replace(tz_abbr, 'T')
+    processed_str = re.sub(r'^(lunes|martes|miércoles|jueves|viernes|sábado|domingo),\s*', '', processed_str)
+    processed_str = re.sub(r'\sdel?\s', ' ', processed_str)
+    if 't' not in processed_str:
+        processed_str = re.sub(r'(\d{1,2}:\d{2})(?:\s*h\.?|hrs?)', r'\1', processed_str)
+    processed_str = re.sub(r'(\d{1,2}:\d{2})\s*-\s*', r'\1 ', processed_str)
+    month_translations = {
+        'enero': 'january', 'ene': 'jan',
+        'febrero': 'february', 'feb': 'feb',
+        'marzo': 'march', 'mar': 'mar',
+        'abril': 'april', 'abr': 'apr',
+        'mayo': 'may', 'may': 'may',
+        'junio': 'june', 'jun': 'jun',
+        'julio': 'july', 'jul': 'jul',
+        'agosto': 'august', 'ago': 'aug',
+        'septiembre': 'september', 'setiembre': 'september', 'sep': 'sep', 'set': 'sep',
+        'octubre': 'october', 'oct': 'oct',
+        'noviembre': 'november', 'nov': 'nov',
+        'diciembre': 'december', 'dic': 'dec',
+    }
+    for spanish, english in month_translations.items():
+        processed_str = processed_str.replace(spanish, english)
+    try:
+        if re.match(r'^\d{1,2}/\d{1,2}/\d{2,4}', processed_str):
+            parsed_date = dateutil.parser.parse(processed_str, dayfirst=True if dayfirst is None else dayfirst)
+        else:
+            parsed_date = dateutil.parser.parse(processed_str)
+        return parsed_date.replace(tzinfo=MADRID_TZ)
+    except (ValueError, TypeError):
+        return None
+
+
+def bench(func, corpus, repeticiones):
+    start = time.perf_counter()
+    for _ in range(repeticiones):
+        for date_string in corpus:
+            func(date_string)
+    elapsed = time.perf_counter() - start
+    return elapsed / (repeticiones * len(corpus)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeticiones', type=int, default=200)
+    args = parser.parse_args()
+
+    diferencias = []
+    for date_string in DATE_CORPUS:
+        legacy = normalize_date_legacy(date_string)
+        nuevo = normalize_date(date_string)
+        if legacy != nuevo:
+            diferencias.append((date_string, legacy, nuevo))
+
+    legacy_us = bench(normalize_date_legacy, DATE_CORPUS, args.repeticiones)
+
+    _normalize_date_cached.cache_clear()
+    sin_cache_us = bench(lambda d: (_normalize_date_cached.cache_clear(), normalize_date(d)), DATE_CORPUS, args.repeticiones)
+
+    _normalize_date_cached.cache_clear()
+    con_cache_us = bench(normalize_date, DATE_CORPUS, args.repeticiones)
+    cache_info = _normalize_date_cached.cache_info()
+
+    print(f"Corpus: {len(DATE_CORPUS)} cadenas x {args.repeticiones} repeticiones")
+    print(f"Anterior:                  {legacy_us:8.2f} us/fecha")
+    print(f"Por niveles, sin caché:    {sin_cache_us:8.2f} us/fecha")
+    print(f"Por niveles, con caché:    {con_cache_us:8.2f} us/fecha ({cache_info.hits} aciertos, {cache_info.misses} fallos)")
+    for date_string, legacy, nuevo in diferencias:
+        print(f"Diferencia en '{date_string}': anterior={legacy} nuevo={nuevo}")
+
+
+if __name__ == "__main__":
+    main()
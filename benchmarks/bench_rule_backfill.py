@@ -0,0 +1,138 @@
+"""
+Benchmark de la aplicación retroactiva de reglas (news_scraper.utils.rule_backfill).
+
+Crea una base de datos temporal con un año de artículos sintéticos (textos comprimidos como
+los guarda SQLitePipeline) y un conjunto de reglas, y mide:
+- la construcción inicial del índice stem -> artículo,
+- añadir una regla nueva y aplicarla con el índice (solo candidatos),
+- la alternativa sin índice: normalizar y evaluar todos los textos guardados,
+verificando que ambas producen las mismas asociaciones palabra clave - artículo.
+
+Uso:
+    python -m benchmarks.bench_rule_backfill [--articulos 15000] [--reglas 300]
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.bench_normalization import build_vocabulary
+from benchmarks.bench_text_store import build_articles, fill_database
+from news_database.normalization import normalize_text, get_spanish_stopwords
+from news_database.news_db import NewsDatabase
+from news_scraper.utils.rule_backfill import RuleBackfill
+from news_scraper.utils.rule_matcher import RuleMatcher, build_rules
+
+
+def insert_rule(db, palabras, operador):
+    cursor = db.conn.cursor()
+    for palabra in palabras:
+        cursor.execute('INSERT OR IGNORE INTO palabras_clave (palabra, stem) VALUES (?, ?)',
+                       (palabra, db.get_stem(palabra)))
+    descripcion = f' {operador} '.join(palabras) if operador != '-' else palabras[0]
+    cursor.execute('INSERT OR IGNORE INTO reglas (descripcion) VALUES (?)', (descripcion,))
+    if cursor.rowcount == 0:
+        # Regla repetida
+        return False
+    regla_id = cursor.lastrowid
+    for posicion, palabra in enumerate(palabras, 1):
+        cursor.execute('''
+            INSERT INTO regla_palabras_clave (regla_id, palabra_id, posicion, operador)
+            SELECT ?, palabra_id, ?, ? FROM palabras_clave WHERE palabra = ?
+        ''', (regla_id, posicion, operador, palabra))
+    db.conn.commit()
+    return True
+
+
+def random_rule(rng, vocabulary):
+    operador = rng.choices(['-', '+', 'o'], weights=[6, 2, 2])[0]
+    size = 1 if operador == '-' else rng.randint(2, 3)
+    # Palabras poco frecuentes (las más frecuentes aparecen en casi todos los artículos)
+    return rng.sample(vocabulary[200:5000], size), operador
+
+
+def full_rescan(db, stopwords):
+    """ Alternativa sin índice: evaluar todos los textos con todas las reglas """
+    normalizar = lambda texto: normalize_text(texto, stopwords)
+    matcher = RuleMatcher(build_rules(db.obtener_reglas_con_palabras_clave(), normalizar))
+    keyword_ids = {palabra: palabra_id for palabra_id, palabra in db.get_all_keywords(id=True)}
+    enlaces = set()
+    for articulo in db.iter_article_texts():
+        cumple, palabras_clave = matcher.filtrar_texto(normalizar(articulo['texto']))
+        if cumple:
+            enlaces.update((articulo['url'], keyword_ids[palabra]) for palabra in palabras_clave)
+    return enlaces
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--articulos', type=int, default=15000, help='Artículos guardados en un año')
+    parser.add_argument('--frases', type=int, default=25)
+    parser.add_argument('--reglas', type=int, default=300)
+    parser.add_argument('--vocabulario', type=int, default=30000)
+    parser.add_argument('--semilla', type=int, default=11)
+    args = parser.parse_args()
+
+    try:
+        stopwords = get_spanish_stopwords()
+    except LookupError:
+        print("Stopwords de NLTK no disponibles: se usa un conjunto vacío")
+        stopwords = frozenset()
+
+    rng = random.Random(args.semilla)
+    vocabulary = build_vocabulary(rng, args.vocabulario)
+    articles = build_articles(rng, vocabulary, args.articulos, args.frases)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = NewsDatabase(os.path.join(tmp, 'bench.db'))
+        db.create_tables()
+        items = fill_database(db, articles)
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(0, len(items), 500):
+                db.bulk_insert_article_texts(items[i:i + 500])
+            reglas = 0
+            while reglas < args.reglas:
+                reglas += insert_rule(db, *random_rule(rng, vocabulary))
+
+        backfill = RuleBackfill(db, stopwords=stopwords)
+        start = time.perf_counter()
+        indexados = backfill.index_pending_articles()
+        index_time = time.perf_counter() - start
+
+        # Primera ejecución: todas las reglas son nuevas
+        with contextlib.redirect_stdout(io.StringIO()):
+            inicial = backfill.run()
+
+        # Una regla nueva, como al agregarla desde manage_keywords
+        while not insert_rule(db, *random_rule(rng, vocabulary)):
+            pass
+        with contextlib.redirect_stdout(io.StringIO()):
+            resumen = backfill.run()
+
+            start = time.perf_counter()
+            esperados = full_rescan(db, stopwords)
+            rescan_time = time.perf_counter() - start
+
+        cursor = db.conn.cursor()
+        cursor.execute('''
+            SELECT u.url, p.palabra_id FROM palabra_clave_articulos p
+            JOIN urls_exploradas u ON u.url_id = p.url_id
+        ''')
+        obtenidos = set(cursor.fetchall())
+
+        print(f"{len(items)} artículos, {args.reglas} reglas")
+        print(f"Índice inicial: {indexados} artículos en {index_time:.1f}s")
+        print(f"Primera aplicación de {inicial['reglas']} reglas: {inicial['candidatos']} candidatos, "
+              f"{inicial['enlaces']} asociaciones en {inicial['segundos']:.2f}s")
+        print(f"Regla nueva con índice: {resumen['candidatos']} candidatos, "
+              f"{resumen['enlaces']} asociaciones en {resumen['segundos']:.2f}s")
+        print(f"Sin índice (todos los textos): {rescan_time:.2f}s")
+        print(f"Asociaciones distintas entre ambos métodos: {len(obtenidos ^ esperados)}")
+        db.close_db()
+
+
+if __name__ == "__main__":
+    main()
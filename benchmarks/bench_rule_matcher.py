@@ -0,0 +1,132 @@
+"""
+Benchmark del filtrado de artículos por reglas de palabras clave.
+
+Compara la evaluación anterior de FiltradoNoticiasPipeline (todas las reglas,
+un r'\\bstem\\b' por palabra clave sobre todo el texto) con RuleMatcher
+(una pasada por el texto + índice invertido stem -> reglas) y verifica que
+ambas devuelvan las mismas palabras clave para cada artículo.
+
+Las reglas y los textos son sintéticos y ya están preprocesados (stems separados
+por espacios), igual que la salida de _preprocesar_palabra_clave/_preprocesar_texto.
+
+Uso:
+    python -m benchmarks.bench_rule_matcher [--reglas 5000] [--articulos 200] [--tokens 600]
+"""
+import argparse
+import random
+import re
+import string
+import time
+
+from news_scraper.utils.rule_matcher import RuleMatcher
+
+
+def random_stem(rng):
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9)))
+
+
+def build_rules(rng, vocabulary, total_rules):
+    rules = []
+    for rule_id in range(total_rules):
+        rule_type = rng.choices(['SINGLE', 'AND', 'OR'], weights=[6, 2, 2])[0]
+        size = 1 if rule_type == 'SINGLE' else rng.randint(2, 4)
+        stems = []
+        for _ in range(size):
+            # 20% de palabras clave compuestas de varios tokens (p. ej. "univers ovied")
+            tokens = rng.randint(2, 3) if rng.random() < 0.2 else 1
+            stems.append(' '.join(rng.choice(vocabulary) for _ in range(tokens)))
+        # Palabra clave formada solo por stopwords: stem vacío
+        if rule_id % 997 == 0:
+            stems[0] = ''
+        rules.append({
+            'type': rule_type,
+            'stems': stems,
+            'keywords': [f'palabra {rule_id}-{i}' for i in range(size)],
+            'patterns': [re.compile(rf'\b{re.escape(stem)}\b', re.IGNORECASE) for stem in stems],
+        })
+    return rules
+
+
+def build_texts(rng, vocabulary, total_texts, total_tokens):
+    texts = [' '.join(rng.choice(vocabulary) for _ in range(total_tokens)) for _ in range(total_texts)]
+    texts.append('')
+    return texts
+
+
+def cumple_regla_legacy(texto, parsed_rule):
+    """Copia del antiguo FiltradoNoticiasPipeline.cumple_regla (sustituido por RuleMatcher)"""
+    if parsed_rule['type'] == 'AND':
+        return all(p.search(texto) for p in parsed_rule['patterns']), parsed_rule['patterns']
+    elif parsed_rule['type'] == 'OR':
+        presentes = []
+        for p, kw in zip(parsed_rule['patterns'], parsed_rule['keywords']):
+            if p.search(texto):
+                presentes.append(kw)
+        return len(presentes) > 0, presentes
+    else:
+        return parsed_rule['patterns'][0].search(texto) is not None, parsed_rule['patterns']
+
+
+def combine(matches):
+    """Combinación de palabras clave de filtrar_texto a partir de (tipo, keywords, encontradas)"""
+    single, and_kw, or_kw, and_secondary = set(), set(), set(), set()
+    for rule_type, keywords, encontradas in matches:
+        if rule_type == 'AND':
+            and_kw.add(keywords[0])
+            and_secondary.update(keywords[1:])
+        elif rule_type == 'OR':
+            or_kw.update(encontradas)
+        else:
+            single.update(keywords)
+    return and_kw | or_kw | (single - and_secondary)
+
+
+def filtrar_texto_legacy(texto, parsed_rules):
+    matches = []
+    for parsed_rule in parsed_rules:
+        cumple, encontradas = cumple_regla_legacy(texto, parsed_rule)
+        if cumple:
+            matches.append((parsed_rule['type'], parsed_rule['keywords'], encontradas))
+    return combine(matches)
+
+
+def filtrar_texto_matcher(texto, matcher):
+    return combine((rule.type, rule.keywords, encontradas) for rule, encontradas in matcher.match(texto))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--reglas', type=int, default=5000)
+    parser.add_argument('--articulos', type=int, default=200)
+    parser.add_argument('--tokens', type=int, default=600)
+    parser.add_argument('--vocabulario', type=int, default=20000)
+    parser.add_argument('--semilla', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.semilla)
+    vocabulary = list({random_stem(rng) for _ in range(args.vocabulario)})
+    rules = build_rules(rng, vocabulary, args.reglas)
+    texts = build_texts(rng, vocabulary, args.articulos, args.tokens)
+
+    start = time.perf_counter()
+    matcher = RuleMatcher(rules)
+    compile_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    legacy_results = [filtrar_texto_legacy(texto, rules) for texto in texts]
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matcher_results = [filtrar_texto_matcher(texto, matcher) for texto in texts]
+    matcher_time = time.perf_counter() - start
+
+    diferencias = sum(1 for a, b in zip(legacy_results, matcher_results) if a != b)
+    print(f"{args.reglas} reglas, {len(texts)} artículos de {args.tokens} tokens")
+    print(f"Anterior (regex por regla): {legacy_time / len(texts) * 1000:8.2f} ms/artículo")
+    print(f"RuleMatcher:                {matcher_time / len(texts) * 1000:8.2f} ms/artículo")
+    print(f"Compilación de RuleMatcher: {compile_time * 1000:.1f} ms (una vez por ejecución)")
+    print(f"Artículos con resultados distintos: {diferencias}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Benchmark del almacén de textos comprimidos (news_database.text_store / textos_articulos).
+
+Genera artículos sintéticos con frases habituales de prensa y vocabulario según la ley de Zipf,
+entrena el diccionario con una parte y mide en el resto:
+- bytes por artículo sin comprimir, con zlib y con zlib + diccionario,
+- velocidad de escritura por lotes y de lectura con NewsDatabase.iter_article_texts
+  sobre una base de datos temporal, verificando que los textos leídos son idénticos.
+
+Uso:
+    python -m benchmarks.bench_text_store [--articulos 3000] [--frases 25]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from benchmarks.bench_normalization import build_vocabulary
+from news_database.core_db import URL_COMPLETADA
+from news_database.news_db import NewsDatabase
+from news_database.text_store import train_dictionary, compress_text, TEXT_DICT_SAMPLES, TEXT_DICT_MIN_SAMPLES
+
+FUENTES = ['www.lne.es', 'www.elcomercio.es', 'www.europapress.es', 'www.20minutos.es']
+
+FRASES = [
+    'Según ha informado este {dia} la {entidad}, {resto}.',
+    'La {entidad} ha anunciado que {resto}.',
+    'En declaraciones a los medios, el portavoz de la {entidad} explicó que {resto}.',
+    '"{resto}", aseguró el responsable de la {entidad} durante la presentación.',
+    'Fuentes de la {entidad} han confirmado que {resto}.',
+    'Además, {resto}, tal y como recoge el comunicado.',
+    'El acto, que tendrá lugar el próximo {dia} a las {hora} horas, {resto}.',
+    'Por su parte, la {entidad} recordó que {resto}.',
+    'Esta iniciativa se enmarca dentro del plan de la {entidad} para {resto}.',
+    'Más información en la web de la {entidad}.',
+]
+ENTIDADES = ['Universidad de Oviedo', 'Consejería de Ciencia', 'Fundación Universidad de Oviedo',
+             'Principado de Asturias', 'Agencia Estatal de Investigación', 'Comisión Europea',
+             'Consejería de Educación', 'Asociación de Estudiantes', 'Cámara de Comercio de Gijón']
+DIAS = ['lunes', 'martes', 'miércoles', 'jueves', 'viernes', 'sábado', 'domingo']
+
+
+def build_articles(rng, vocabulary, total_articles, frases_por_articulo, zipf_s=1.1):
+    cum_weights = list(accumulate(1 / (rank ** zipf_s) for rank in range(1, len(vocabulary) + 1)))
+    articles = []
+    for _ in range(total_articles):
+        frases = []
+        for _ in range(frases_por_articulo):
+            resto = ' '.join(rng.choices(vocabulary, cum_weights=cum_weights, k=rng.randint(8, 20)))
+            frases.append(rng.choice(FRASES).format(
+                dia=rng.choice(DIAS), entidad=rng.choice(ENTIDADES),
+                hora=f'{rng.randint(9, 20)}:{rng.choice(["00", "30"])}', resto=resto))
+        articles.append('\n\n'.join(' '.join(frases[i:i + 3]) for i in range(0, len(frases), 3)))
+    return articles
+
+
+def fill_database(db, articles):
+    fecha = datetime(2025, 1, 1)
+    items = [{
+        'url': f'https://{FUENTES[i % len(FUENTES)]}/noticia-{i}.html',
+        'fuente': FUENTES[i % len(FUENTES)],
+        'titulo': f'Noticia {i}',
+        'fecha_publicacion': fecha + timedelta(minutes=i),
+        'texto': texto,
+    } for i, texto in enumerate(articles)]
+    db.bulk_insert_fuentes([(fuente, fuente, f'https://{fuente}/') for fuente in FUENTES])
+    db.bulk_insert_crawled_urls([item['url'] for item in items], estado=URL_COMPLETADA)
+    db.bulk_insert_articles(items)
+    return items
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--articulos', type=int, default=3000)
+    parser.add_argument('--frases', type=int, default=25)
+    parser.add_argument('--vocabulario', type=int, default=30000)
+    parser.add_argument('--lote', type=int, default=10, help='Tamaño de lote de SQLitePipeline')
+    parser.add_argument('--semilla', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(args.semilla)
+    vocabulary = build_vocabulary(rng, args.vocabulario)
+    articles = build_articles(rng, vocabulary, args.articulos, args.frases)
+
+    # Diccionario entrenado con las primeras noticias, medido sobre las siguientes
+    muestras = min(TEXT_DICT_SAMPLES, args.articulos // 2)
+    start = time.perf_counter()
+    zdict = train_dictionary(articles[:muestras])
+    train_time = time.perf_counter() - start
+    evaluacion = articles[muestras:]
+
+    raw = sum(len(texto.encode('utf-8')) for texto in evaluacion)
+    plain = sum(len(compress_text(texto)) for texto in evaluacion)
+    with_dict = sum(len(compress_text(texto, zdict)) for texto in evaluacion)
+    n = len(evaluacion)
+    print(f"{args.articulos} artículos ({raw / n:.0f} bytes de media), diccionario de {len(zdict)} bytes "
+          f"entrenado con {muestras} en {train_time:.2f}s")
+    print(f"Sin comprimir:       {raw / n:8.0f} bytes/artículo")
+    print(f"zlib:                {plain / n:8.0f} bytes/artículo (ratio {raw / plain:.2f})")
+    print(f"zlib + diccionario:  {with_dict / n:8.0f} bytes/artículo (ratio {raw / with_dict:.2f})")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = NewsDatabase(os.path.join(tmp, 'bench.db'))
+        db.create_tables()
+        items = fill_database(db, articles)
+
+        # Escritura por lotes como SQLitePipeline. El primer diccionario se entrena aparte, como
+        # SQLitePipeline en segundo plano, en cuanto hay TEXT_DICT_MIN_SAMPLES textos (fuera de la medida)
+        write_time = 0.0
+        for i in range(0, len(items), args.lote):
+            start = time.perf_counter()
+            db.bulk_insert_article_texts(items[i:i + args.lote])
+            write_time += time.perf_counter() - start
+            if db.get_current_text_dictionary_id() is None and i + args.lote >= TEXT_DICT_MIN_SAMPLES:
+                db.train_text_dictionary()
+
+        total, raw_bytes, compressed_bytes = db.get_text_store_stats()
+        print(f"Escritura en lotes de {args.lote}: {total / write_time:10,.0f} artículos/s, "
+              f"{compressed_bytes / total:.0f} bytes/artículo en la tabla")
+
+        # Lectura en streaming (nueva conexión, sin diccionarios en memoria)
+        reader = NewsDatabase(os.path.join(tmp, 'bench.db'))
+        start = time.perf_counter()
+        leidos = {articulo['url']: articulo['texto'] for articulo in reader.iter_article_texts()}
+        read_time = time.perf_counter() - start
+        diferencias = sum(1 for item in items if leidos.get(item['url']) != item['texto'])
+        print(f"Lectura (iter_article_texts): {len(leidos) / read_time:10,.0f} artículos/s, "
+              f"{raw_bytes / read_time / 1e6:.1f} MB/s de texto")
+        print(f"Textos distintos al original: {diferencias}")
+        reader.close_db()
+        db.close_db()
+
+
+if __name__ == "__main__":
+    main()
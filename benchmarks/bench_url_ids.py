@@ -0,0 +1,247 @@
+"""
+Benchmark de las claves enteras de urls (url_id + url_hash) frente a la url como clave primaria.
+
+Crea dos bases de datos con las mismas urls sintéticas (por defecto 5M urls exploradas, una de
+cada 5 con artículo y 3 palabras clave por artículo):
+- esquema anterior: url TEXT como clave de urls_exploradas, articulos y palabra_clave_articulos,
+- esquema actual: create_tables (url_id entero, índice por hash de 64 bits),
+y compara el tamaño de cada base de datos y de cada tabla o índice, y el tiempo de:
+- artículos de varias palabras clave (join palabra_clave_articulos -> articulos),
+- fetch_articles con filtro de palabras clave y fechas,
+- comprobación de urls sueltas (is_crawled_url sin índice en memoria),
+- carga del índice en memoria de urls exploradas (load_crawled_url_index).
+
+Uso:
+    python -m benchmarks.bench_url_ids [--urls 5000000] [--consultas 20000]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from news_database.core_db import URL_COMPLETADA
+from news_database.interface_db import NewsInterfaceDatabase
+from news_database.news_db import NewsDatabase
+from news_database.utils import url_hash, to_epoch
+
+LOTE = 100000
+FUENTES = [f'www.periodico{i}.es' for i in range(40)]
+SECCIONES = ['sociedad', 'asturias', 'economia', 'cultura', 'deportes', 'universidad', 'opinion']
+PALABRAS = ['universidad', 'investigacion', 'campus', 'rector', 'estudiantes', 'proyecto', 'ciencia',
+            'gobierno', 'consejeria', 'tecnologia', 'empresa', 'salud', 'hospital', 'cultura']
+TOTAL_PALABRAS = 500
+
+# Tablas de la versión 1 del esquema (url como clave), con los índices de la migración 1
+ESQUEMA_ANTERIOR = """
+    CREATE TABLE fuentes (fuente_id TEXT PRIMARY KEY, nombre TEXT, url_home TEXT);
+    CREATE TABLE palabras_clave (palabra_id INTEGER PRIMARY KEY AUTOINCREMENT, palabra TEXT UNIQUE, stem TEXT UNIQUE);
+    CREATE TABLE urls_exploradas (
+        url TEXT PRIMARY KEY,
+        crawled_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        estado TEXT NOT NULL DEFAULT 'completada'
+    );
+    CREATE TABLE articulos (
+        url TEXT PRIMARY KEY,
+        fuente TEXT,
+        titulo TEXT,
+        fecha_publicacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (fuente) REFERENCES fuentes(fuente_id) ON DELETE CASCADE,
+        FOREIGN KEY (url) REFERENCES urls_exploradas(url) ON DELETE CASCADE
+    );
+    CREATE TABLE palabra_clave_articulos (
+        url TEXT,
+        palabra_id INTEGER,
+        PRIMARY KEY (url, palabra_id),
+        FOREIGN KEY (url) REFERENCES articulos(url) ON DELETE CASCADE,
+        FOREIGN KEY (palabra_id) REFERENCES palabras_clave(palabra_id) ON DELETE CASCADE
+    );
+    CREATE INDEX idx_articulos_fecha ON articulos (fecha_publicacion, fuente, titulo, url);
+    CREATE INDEX idx_palabra_clave_articulos_palabra ON palabra_clave_articulos (palabra_id, url);
+"""
+
+CONSULTAS_PALABRAS = {
+    'anterior': """
+        SELECT COUNT(*), MAX(a.titulo) FROM palabra_clave_articulos pca
+        JOIN articulos a ON a.url = pca.url
+        WHERE pca.palabra_id IN (1, 2, 3)
+    """,
+    'actual': """
+        SELECT COUNT(*), MAX(a.titulo) FROM palabra_clave_articulos pca
+        JOIN articulos a ON a.url_id = pca.url_id
+        WHERE pca.palabra_id IN (1, 2, 3)
+    """,
+}
+FETCH_ARTICLES_ANTERIOR = """
+    SELECT a.titulo, a.url, f.nombre, a.fecha_publicacion
+    FROM articulos a
+    JOIN fuentes f ON a.fuente = f.fuente_id
+    WHERE EXISTS (
+        SELECT 1 FROM palabra_clave_articulos pca
+        JOIN palabras_clave pc ON pca.palabra_id = pc.palabra_id
+        WHERE pc.palabra IN (?, ?)
+        AND pca.url = a.url
+    )
+    AND a.fecha_publicacion >= ? AND a.fecha_publicacion < ?
+    ORDER BY a.fecha_publicacion DESC
+"""
+
+
+def generate(total_urls, seed):
+    """ Genera por lotes (urls, artículos, enlaces palabra clave - artículo) reproducibles """
+    rng = random.Random(seed)
+    fecha = datetime(2024, 1, 1)
+    for inicio in range(0, total_urls, LOTE):
+        urls, articulos, enlaces = [], [], []
+        for i in range(inicio, min(inicio + LOTE, total_urls)):
+            publicada = fecha + timedelta(minutes=(i * 7) % (365 * 24 * 60))
+            fuente = FUENTES[i % len(FUENTES)]
+            titulo = '-'.join(rng.choices(PALABRAS, k=rng.randint(6, 10)))
+            url = (f'https://{fuente}/{rng.choice(SECCIONES)}/{publicada:%Y/%m/%d}/'
+                   f'{titulo}-{i}.html')
+            urls.append(url)
+            if i % 5 == 0:
+                articulos.append((url, fuente, titulo.replace('-', ' ').capitalize(),
+                                  publicada.isoformat(sep=' ')))
+                enlaces.extend((url, palabra_id) for palabra_id in rng.sample(range(1, TOTAL_PALABRAS + 1), 3))
+        yield urls, articulos, enlaces
+
+
+def prepare_common(conn):
+    conn.executemany('INSERT INTO fuentes VALUES (?, ?, ?)',
+                     [(fuente, fuente, f'https://{fuente}/') for fuente in FUENTES])
+    conn.executemany('INSERT INTO palabras_clave (palabra, stem) VALUES (?, ?)',
+                     [(f'palabra{i}', f'palabr{i}') for i in range(1, TOTAL_PALABRAS + 1)])
+
+
+def build_old(path, total_urls, seed):
+    conn = sqlite3.connect(path)
+    conn.executescript(ESQUEMA_ANTERIOR)
+    prepare_common(conn)
+    for urls, articulos, enlaces in generate(total_urls, seed):
+        conn.executemany('INSERT INTO urls_exploradas (url, crawled_at, estado) VALUES (?, ?, ?)',
+                         [(url, '2025-01-01 00:00:00', URL_COMPLETADA) for url in urls])
+        conn.executemany('INSERT INTO articulos VALUES (?, ?, ?, ?)', articulos)
+        conn.executemany('INSERT INTO palabra_clave_articulos VALUES (?, ?)', enlaces)
+        conn.commit()
+    conn.execute('ANALYZE')
+    conn.commit()
+    return conn
+
+
+def build_new(path, total_urls, seed):
+    db = NewsDatabase(path)
+    db.create_tables()
+    prepare_common(db.conn)
+    conn = db.conn
+    url_id = 0
+    for urls, articulos, enlaces in generate(total_urls, seed):
+        # Inserción directa con los url_id consecutivos (equivalente a bulk_insert_crawled_urls)
+        ids = {}
+        filas = []
+        for url in urls:
+            url_id += 1
+            ids[url] = url_id
+            filas.append((url_id, url_hash(url), url, '2025-01-01 00:00:00', URL_COMPLETADA))
+        conn.executemany('INSERT INTO urls_exploradas VALUES (?, ?, ?, ?, ?)', filas)
+        conn.executemany('INSERT INTO articulos VALUES (?, ?, ?, ?)',
+                         [(ids[url], fuente, titulo, to_epoch(fecha)) for url, fuente, titulo, fecha in articulos])
+        conn.executemany('INSERT INTO palabra_clave_articulos VALUES (?, ?)',
+                         sorted((ids[url], palabra_id) for url, palabra_id in enlaces))
+        conn.commit()
+    conn.execute('ANALYZE')
+    conn.commit()
+    db.close_db()
+
+
+def object_sizes(conn):
+    """ Bytes por tabla e índice (dbstat si está disponible) """
+    try:
+        cursor = conn.execute('SELECT name, SUM(pgsize) FROM dbstat GROUP BY name')
+    except sqlite3.OperationalError:
+        return {}
+    return dict(cursor.fetchall())
+
+
+def timed(fn, repeticiones=3):
+    """ Mejor tiempo de varias repeticiones y el resultado """
+    mejor = None
+    for _ in range(repeticiones):
+        start = time.perf_counter()
+        resultado = fn()
+        elapsed = time.perf_counter() - start
+        mejor = elapsed if mejor is None else min(mejor, elapsed)
+    return mejor, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--urls', type=int, default=5000000)
+    parser.add_argument('--consultas', type=int, default=20000, help='Urls sueltas a comprobar')
+    parser.add_argument('--semilla', type=int, default=19)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        old_path = os.path.join(tmp, 'anterior.db')
+        new_path = os.path.join(tmp, 'actual.db')
+        start = time.perf_counter()
+        old = build_old(old_path, args.urls, args.semilla)
+        old_build = time.perf_counter() - start
+        start = time.perf_counter()
+        build_new(new_path, args.urls, args.semilla)
+        new_build = time.perf_counter() - start
+        new = NewsInterfaceDatabase(new_path)
+
+        print(f"{args.urls:,} urls, {args.urls // 5:,} artículos, {args.urls // 5 * 3:,} enlaces palabra clave")
+        print(f"Construcción: anterior {old_build:.0f}s, actual {new_build:.0f}s")
+        old_size, new_size = os.path.getsize(old_path), os.path.getsize(new_path)
+        print(f"Tamaño: anterior {old_size / 1e6:,.0f} MB, actual {new_size / 1e6:,.0f} MB "
+              f"({1 - new_size / old_size:.0%} menos)")
+        old_objects, new_objects = object_sizes(old), object_sizes(new.conn)
+        for nombre in sorted(set(old_objects) | set(new_objects)):
+            if max(old_objects.get(nombre, 0), new_objects.get(nombre, 0)) > 1e6:
+                print(f"    {nombre:45s} {old_objects.get(nombre, 0) / 1e6:8,.0f} MB -> "
+                      f"{new_objects.get(nombre, 0) / 1e6:8,.0f} MB")
+
+        resultados = []
+        old_time, old_result = timed(lambda: old.execute(CONSULTAS_PALABRAS['anterior']).fetchone())
+        new_time, new_result = timed(lambda: new.conn.execute(CONSULTAS_PALABRAS['actual']).fetchone())
+        resultados.append(('Join palabras clave -> artículos', old_time, new_time, old_result == new_result))
+
+        filtros = (['palabra1', 'palabra2'], '2024-03-01', '2024-06-01')
+        old_time, old_result = timed(lambda: old.execute(
+            FETCH_ARTICLES_ANTERIOR, (*filtros[0], filtros[1], filtros[2])).fetchall())
+        new_time, new_result = timed(lambda: new.fetch_articles(
+            keywords=filtros[0], start_date=filtros[1], end_date=filtros[2]))
+        # El esquema anterior guarda las fechas como texto
+        old_result = [(titulo, url, fuente, to_epoch(fecha)) for titulo, url, fuente, fecha in old_result]
+        resultados.append(('fetch_articles (palabras clave y fechas)', old_time, new_time, old_result == new_result))
+
+        rng = random.Random(args.semilla)
+        muestra = set(rng.sample(range(args.urls), args.consultas))
+        urls = [url for i, url in enumerate(u for lote, _, _ in generate(args.urls, args.semilla) for u in lote)
+                if i in muestra]
+        reader = NewsDatabase(new_path)
+        old_time, old_result = timed(lambda: sum(
+            old.execute('SELECT 1 FROM urls_exploradas WHERE url = ? AND estado = ?', (url, URL_COMPLETADA))
+            .fetchone() is not None for url in urls))
+        new_time, new_result = timed(lambda: sum(reader.is_crawled_url(url) for url in urls))
+        resultados.append((f'{len(urls):,} urls sueltas (is_crawled_url)', old_time, new_time, old_result == new_result))
+
+        old_time, old_result = timed(lambda: len({url_hash(row[0]) for row in old.execute(
+            'SELECT url FROM urls_exploradas WHERE estado = ?', (URL_COMPLETADA,))}), repeticiones=1)
+        new_time, new_result = timed(reader.load_crawled_url_index, repeticiones=1)
+        resultados.append(('load_crawled_url_index', old_time, new_time, old_result == new_result))
+
+        for nombre, old_time, new_time, iguales in resultados:
+            print(f"{nombre:45s} anterior {old_time * 1000:9.1f} ms, actual {new_time * 1000:9.1f} ms "
+                  f"(x{old_time / new_time:.1f}){'' if iguales else '  RESULTADOS DISTINTOS'}")
+        reader.close_db()
+        new.close_db()
+        old.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,7 @@ import os
 from news_search.embedding_generator import EmbeddingGenerator
 from news_search.chroma_engine import ChromaVectorEngine
 from news_search.search_manager import SearchManager
+from news_search.fulltext_engine import FulltextEngine
 
 
 def initialize_paths():
@@ -19,7 +20,10 @@ def initialize_search_manager(vector_db_path, database_path):
     model_name = 'intfloat/multilingual-e5-small'
     embedding_model = EmbeddingGenerator(model_name = model_name)
     vector_db = ChromaVectorEngine(embedding=embedding_model, persist_directory=vector_db_path, sqlite_path=database_path)
-    search_manager = SearchManager(embedding_model=embedding_model, vector_engine=vector_db, chunk_size=500, chunk_overlap=100)
+    # Búsqueda vectorial por defecto; la híbrida (mode=SEARCH_MODE_HYBRID, vectorial y BM25 fusionadas por artículo)
+    # queda disponible hasta comparar su recall@k y p95 con benchmarks/bench_hybrid_search.py
+    search_manager = SearchManager(embedding_model=embedding_model, vector_engine=vector_db, chunk_size=500, chunk_overlap=100,
+                                   lexical_engine=FulltextEngine(database_path))
     return search_manager
 
 def handle_interfaces(news_db, search_manager):
@@ -1,21 +1,300 @@
 import sqlite3
 from datetime import datetime
-from news_database.utils import get_domain
+from news_database.utils import get_domain, url_hash, to_epoch
 import nltk
-from nltk.stem.snowball import SnowballStemmer
+from news_database.normalization import stem
+from news_database.text_store import decompress_text
 nltk.download('punkt', quiet=True)
 
+# Estado de una url en urls_exploradas
+URL_EN_PROCESO = 'en_proceso'    # descubierta y pendiente de descargar/guardar el artículo
+URL_COMPLETADA = 'completada'    # artículo guardado, descartado o no recuperable
+
+
+# Migraciones del esquema de bases de datos existentes, en orden. La versión de cada una es
+# su posición (desde 1) y PRAGMA user_version guarda la última aplicada en cada base de datos.
+# Las bases de datos nuevas se crean directamente con el esquema actual (create_tables).
+# Nunca se modifica una migración publicada: los cambios nuevos se añaden al final.
+
+def _table_columns(cursor, tabla):
+    cursor.execute(f"PRAGMA table_info({tabla})")
+    return {row[1] for row in cursor.fetchall()}
+
+def _migration_query_indexes(cursor):
+    """ Índices de fetch_articles: fecha de publicación (cubriente), palabra clave y categoría """
+    # Filtro y orden por fecha sin leer la tabla ni ordenar en memoria (incluye las columnas del SELECT)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_articulos_fecha
+        ON articulos (fecha_publicacion, fuente, titulo, url)
+    """)
+    # Artículos de una palabra clave (y borrado en cascada al eliminar una palabra clave)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_palabra_clave_articulos_palabra
+        ON palabra_clave_articulos (palabra_id, url)
+    """)
+    # Palabras clave de una categoría
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_palabras_clave_categoria_categoria
+        ON palabras_clave_categoria (categoria_id, palabra_id)
+    """)
+
+
+def _migration_url_ids(cursor):
+    """ urls_exploradas con url_id y hash de 64 bits; articulos y tablas asociadas referencian url_id """
+    cursor.connection.create_function('url_hash', 1, url_hash, deterministic=True)
+
+    # Bases de datos anteriores a la columna estado: las urls registradas se consideran completadas
+    estado = 'estado' if 'estado' in _table_columns(cursor, 'urls_exploradas') else "'completada'"
+    cursor.execute("""
+        CREATE TABLE urls_exploradas_nueva (
+            url_id INTEGER PRIMARY KEY,
+            url_hash INTEGER NOT NULL,
+            url TEXT NOT NULL,
+            crawled_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            estado TEXT NOT NULL DEFAULT 'completada'
+        )
+    """)
+    cursor.execute(f"""
+        INSERT INTO urls_exploradas_nueva (url_hash, url, crawled_at, estado)
+        SELECT url_hash(url), url, crawled_at, {estado} FROM urls_exploradas ORDER BY rowid
+    """)
+    cursor.execute("CREATE INDEX idx_urls_exploradas_nueva_hash ON urls_exploradas_nueva (url_hash)")
+    # url -> url_id de la tabla anterior a la nueva
+    join_url = "JOIN urls_exploradas_nueva u ON u.url_hash = url_hash(t.url) AND u.url = t.url"
+
+    cursor.execute("""
+        CREATE TABLE articulos_nueva (
+            url_id INTEGER PRIMARY KEY,
+            fuente TEXT,
+            titulo TEXT,
+            fecha_publicacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (fuente) REFERENCES fuentes(fuente_id) ON DELETE CASCADE,
+            FOREIGN KEY (url_id) REFERENCES urls_exploradas(url_id) ON DELETE CASCADE
+        )
+    """)
+    cursor.execute(f"""
+        INSERT INTO articulos_nueva (url_id, fuente, titulo, fecha_publicacion)
+        SELECT u.url_id, t.fuente, t.titulo, t.fecha_publicacion FROM articulos t {join_url}
+    """)
+
+    cursor.execute("""
+        CREATE TABLE palabra_clave_articulos_nueva (
+            url_id INTEGER,
+            palabra_id INTEGER,
+            PRIMARY KEY (url_id, palabra_id),
+            FOREIGN KEY (url_id) REFERENCES articulos(url_id) ON DELETE CASCADE,
+            FOREIGN KEY (palabra_id) REFERENCES palabras_clave(palabra_id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    """)
+    cursor.execute(f"""
+        INSERT OR IGNORE INTO palabra_clave_articulos_nueva (url_id, palabra_id)
+        SELECT u.url_id, t.palabra_id FROM palabra_clave_articulos t {join_url}
+        ORDER BY u.url_id, t.palabra_id
+    """)
+    tablas = ['urls_exploradas', 'articulos', 'palabra_clave_articulos']
+
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    existentes = {row[0] for row in cursor.fetchall()}
+    if 'textos_articulos' in existentes:
+        cursor.execute("""
+            CREATE TABLE textos_articulos_nueva (
+                url_id INTEGER PRIMARY KEY,
+                dict_id INTEGER,
+                longitud INTEGER,
+                texto BLOB NOT NULL,
+                FOREIGN KEY (url_id) REFERENCES articulos(url_id) ON DELETE CASCADE,
+                FOREIGN KEY (dict_id) REFERENCES diccionarios_texto(dict_id)
+            )
+        """)
+        cursor.execute(f"""
+            INSERT INTO textos_articulos_nueva (url_id, dict_id, longitud, texto)
+            SELECT u.url_id, t.dict_id, t.longitud, t.texto FROM textos_articulos t {join_url}
+            ORDER BY u.url_id
+        """)
+        tablas.append('textos_articulos')
+    if 'indice_articulos' in existentes:
+        # Se conservan los articulo_id a los que apuntan los stems de indice_stems
+        cursor.execute("""
+            CREATE TABLE indice_articulos_nueva (
+                articulo_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url_id INTEGER UNIQUE NOT NULL,
+                FOREIGN KEY (url_id) REFERENCES textos_articulos(url_id) ON DELETE CASCADE
+            )
+        """)
+        cursor.execute(f"""
+            INSERT INTO indice_articulos_nueva (articulo_id, url_id)
+            SELECT t.articulo_id, u.url_id FROM indice_articulos t {join_url}
+        """)
+        tablas.append('indice_articulos')
+
+    # Primero las tablas que referencian a otras; los índices y triggers se eliminan con ellas
+    for tabla in reversed(tablas):
+        cursor.execute(f"DROP TABLE {tabla}")
+    for tabla in tablas:
+        cursor.execute(f"ALTER TABLE {tabla}_nueva RENAME TO {tabla}")
+    cursor.execute("DROP INDEX idx_urls_exploradas_nueva_hash")
+    cursor.execute("CREATE INDEX idx_urls_exploradas_hash ON urls_exploradas (url_hash)")
+    cursor.execute("CREATE INDEX idx_articulos_fecha ON articulos (fecha_publicacion, fuente, titulo)")
+    cursor.execute("CREATE INDEX idx_palabra_clave_articulos_palabra ON palabra_clave_articulos (palabra_id, url_id)")
+    if 'indice_articulos' in tablas:
+        cursor.execute("""
+            CREATE TRIGGER cleanup_indice_stems_after_articulo_delete
+            AFTER DELETE ON indice_articulos
+            BEGIN
+                DELETE FROM indice_stems WHERE articulo_id = OLD.articulo_id;
+            END;
+        """)
+
+
+def _migration_articulo_categoria(cursor):
+    """ Tabla materializada articulo_categoria para filtrar fetch_articles por categoría y fecha """
+    cursor.execute("""
+        CREATE TABLE articulo_categoria (
+            url_id INTEGER NOT NULL,
+            categoria_id INTEGER NOT NULL,
+            fecha TIMESTAMP,
+            PRIMARY KEY (url_id, categoria_id),
+            FOREIGN KEY (url_id) REFERENCES articulos(url_id) ON DELETE CASCADE,
+            FOREIGN KEY (categoria_id) REFERENCES categoria(categoria_id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        INSERT INTO articulo_categoria (url_id, categoria_id, fecha)
+        SELECT DISTINCT pca.url_id, pcc.categoria_id, a.fecha_publicacion
+        FROM palabra_clave_articulos pca
+        JOIN palabras_clave_categoria pcc ON pcc.palabra_id = pca.palabra_id
+        JOIN articulos a ON a.url_id = pca.url_id
+    """)
+    cursor.execute("CREATE INDEX idx_articulo_categoria_fecha ON articulo_categoria (categoria_id, fecha)")
+    # Los triggers que la mantienen los crea create_tables
+
+
+def _migration_articles_keyset_index(cursor):
+    """ idx_articulos_fecha ordenado por (fecha_publicacion, url_id) para paginar fetch_articles por clave """
+    cursor.execute("DROP INDEX IF EXISTS idx_articulos_fecha")
+    cursor.execute("CREATE INDEX idx_articulos_fecha ON articulos (fecha_publicacion, url_id, fuente, titulo)")
+
+
+def _migration_fecha_epoch(cursor):
+    """ Fecha de publicación en segundos UTC (INTEGER) en articulos y articulo_categoria """
+    # Las fechas se guardaban como texto: ISO-8601 con zona horaria, o sin ella (UTC) por defecto
+    cursor.connection.create_function('to_epoch', 1, to_epoch, deterministic=True)
+    cursor.execute("""
+        CREATE TABLE articulos_nueva (
+            url_id INTEGER PRIMARY KEY,
+            fuente TEXT,
+            titulo TEXT,
+            fecha_publicacion INTEGER,
+            FOREIGN KEY (fuente) REFERENCES fuentes(fuente_id) ON DELETE CASCADE,
+            FOREIGN KEY (url_id) REFERENCES urls_exploradas(url_id) ON DELETE CASCADE
+        )
+    """)
+    cursor.execute("""
+        INSERT INTO articulos_nueva (url_id, fuente, titulo, fecha_publicacion)
+        SELECT url_id, fuente, titulo, to_epoch(fecha_publicacion) FROM articulos ORDER BY url_id
+    """)
+    cursor.execute("""
+        CREATE TABLE articulo_categoria_nueva (
+            url_id INTEGER NOT NULL,
+            categoria_id INTEGER NOT NULL,
+            fecha INTEGER,
+            PRIMARY KEY (url_id, categoria_id),
+            FOREIGN KEY (url_id) REFERENCES articulos(url_id) ON DELETE CASCADE,
+            FOREIGN KEY (categoria_id) REFERENCES categoria(categoria_id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        INSERT INTO articulo_categoria_nueva (url_id, categoria_id, fecha)
+        SELECT ac.url_id, ac.categoria_id, a.fecha_publicacion
+        FROM articulo_categoria ac JOIN articulos_nueva a ON a.url_id = ac.url_id
+    """)
+    # Los triggers de articulo_categoria hacen referencia a las tablas que se sustituyen y no dejarían
+    # renombrarlas: se eliminan junto con los índices y create_tables los vuelve a crear
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'articulo_categoria_after_%'")
+    for (trigger,) in cursor.fetchall():
+        cursor.execute(f"DROP TRIGGER {trigger}")
+    for tabla in ('articulo_categoria', 'articulos'):
+        cursor.execute(f"DROP TABLE {tabla}")
+    for tabla in ('articulos', 'articulo_categoria'):
+        cursor.execute(f"ALTER TABLE {tabla}_nueva RENAME TO {tabla}")
+    cursor.execute("CREATE INDEX idx_articulos_fecha ON articulos (fecha_publicacion, url_id, fuente, titulo)")
+    cursor.execute("CREATE INDEX idx_articulo_categoria_fecha ON articulo_categoria (categoria_id, fecha)")
+
+
+def fill_fulltext_index(cursor, batch_size=500):
+    """
+    Añadir al índice de texto completo (busqueda_articulos) el título y el texto de todos los artículos
+    con texto guardado. Retorna el número de artículos indexados
+    """
+    cursor.execute('SELECT dict_id, zdict FROM diccionarios_texto')
+    zdicts = dict(cursor.fetchall())
+    ultimo_id = total = 0
+    while True:
+        cursor.execute("""
+            SELECT t.url_id, a.titulo, t.dict_id, t.texto
+            FROM textos_articulos t
+            JOIN articulos a ON a.url_id = t.url_id
+            WHERE t.url_id > ?
+            ORDER BY t.url_id
+            LIMIT ?
+        """, (ultimo_id, batch_size))
+        rows = cursor.fetchall()
+        cursor.executemany('INSERT INTO busqueda_articulos (rowid, titulo, texto) VALUES (?, ?, ?)', [
+            (url_id, titulo, decompress_text(blob, zdicts.get(dict_id))) for url_id, titulo, dict_id, blob in rows
+        ])
+        total += len(rows)
+        if len(rows) < batch_size:
+            return total
+        ultimo_id = rows[-1][0]
+
+
+def _migration_busqueda_articulos(cursor):
+    """ Índice de texto completo (FTS5) de los títulos y textos guardados """
+    cursor.execute("""
+        CREATE VIRTUAL TABLE busqueda_articulos USING fts5(
+            titulo, texto, content='', tokenize='unicode61 remove_diacritics 2'
+        )
+    """)
+    # Bases de datos anteriores al almacén de textos: create_tables crea sus tablas vacías
+    if _table_columns(cursor, 'textos_articulos') and _table_columns(cursor, 'diccionarios_texto'):
+        fill_fulltext_index(cursor)
+
+
+MIGRATIONS = [
+    _migration_query_indexes,
+    _migration_url_ids,
+    _migration_articulo_categoria,
+    _migration_articles_keyset_index,
+    _migration_fecha_epoch,
+    _migration_busqueda_articulos,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def analyze(cursor):
+    """
+    Actualizar las estadísticas del planificador (ANALYZE), salvo las de las tablas internas del índice
+    de texto completo: calculadas con el índice aún pequeño, hacen que FTS5 recorra sus segmentos en
+    cada inserción cuando el índice crece (x20 por lote del pipeline con 200k artículos)
+    """
+    cursor.execute("ANALYZE")
+    cursor.execute("DELETE FROM sqlite_stat1 WHERE tbl LIKE 'busqueda\\_articulos\\_%' ESCAPE '\\'")
+    # Recargar las estadísticas en la conexión
+    cursor.execute("ANALYZE sqlite_master")
+
 class NewsCoreDatabase:
     def __init__(self, db_path='news.db'):
         self.db_path = db_path
         self.conn = sqlite3.connect(db_path, check_same_thread=False)
         self.conn.execute("PRAGMA foreign_keys = ON;")
-        self.stemmer = SnowballStemmer('spanish')
         #self.create_tables()
 
     def create_tables(self):
         cursor = self.conn.cursor()
 
+        # Bases de datos existentes: llevar sus tablas al esquema actual antes de crear las que falten
+        self.migrate()
+
         # Habilitar claves foraneas
         cursor.execute("PRAGMA foreign_keys = ON;")
 
@@ -50,22 +329,35 @@ class NewsCoreDatabase:
         # Crear tabla de palabras clave y articulos
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS palabra_clave_articulos (
-                url TEXT,
+                url_id INTEGER,
                 palabra_id INTEGER,
-                PRIMARY KEY (url, palabra_id),
-                FOREIGN KEY (url) REFERENCES articulos(url) ON DELETE CASCADE,
+                PRIMARY KEY (url_id, palabra_id),
+                FOREIGN KEY (url_id) REFERENCES articulos(url_id) ON DELETE CASCADE,
                 FOREIGN KEY (palabra_id) REFERENCES palabras_clave(palabra_id) ON DELETE CASCADE
-            );
+            ) WITHOUT ROWID;
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_palabra_clave_articulos_palabra
+            ON palabra_clave_articulos (palabra_id, url_id)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_palabras_clave_categoria_categoria
+            ON palabras_clave_categoria (categoria_id, palabra_id)
         """)
 
 
-        # Crear tabla de url exploradas
+        # Crear tabla de url exploradas. Cada url se guarda una sola vez: las demás tablas usan url_id
+        # y las búsquedas por url usan el hash de 64 bits (news_database.utils.url_hash) y comparan la url
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS urls_exploradas (
-                url TEXT PRIMARY KEY,
-                crawled_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                url_id INTEGER PRIMARY KEY,
+                url_hash INTEGER NOT NULL,
+                url TEXT NOT NULL,
+                crawled_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                estado TEXT NOT NULL DEFAULT 'completada'
             )
         """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_urls_exploradas_hash ON urls_exploradas (url_hash)")
 
         # Crear tabla de fuentes
         cursor.execute("""
@@ -76,17 +368,173 @@ class NewsCoreDatabase:
             )
         """)
 
-
+        # Fecha de publicación en segundos UTC (news_database.utils.to_epoch): los filtros comparan enteros
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS articulos (
-                url TEXT PRIMARY KEY,
+                url_id INTEGER PRIMARY KEY,
                 fuente TEXT,
                 titulo TEXT,
-                fecha_publicacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                fecha_publicacion INTEGER,
                 FOREIGN KEY (fuente) REFERENCES fuentes(fuente_id) ON DELETE CASCADE,
-                FOREIGN KEY (url) REFERENCES urls_exploradas(url) ON DELETE CASCADE
+                FOREIGN KEY (url_id) REFERENCES urls_exploradas(url_id) ON DELETE CASCADE
             )
         ''')
+        # Filtro y orden por (fecha, url_id) de fetch_articles y sus páginas sin leer la tabla
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_articulos_fecha
+            ON articulos (fecha_publicacion, url_id, fuente, titulo)
+        """)
+
+        # Categorías de cada artículo (las de sus palabras clave) con su fecha de publicación, para que
+        # fetch_articles filtre por categoría y fecha con un recorrido de rango de idx_articulo_categoria.
+        # La llena NewsDatabase.bulk_insert_palabra_clave_articulos y los triggers la mantienen al cambiar
+        # las palabras clave de una categoría o de un artículo, o la fecha de un artículo
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS articulo_categoria (
+                url_id INTEGER NOT NULL,
+                categoria_id INTEGER NOT NULL,
+                fecha INTEGER,
+                PRIMARY KEY (url_id, categoria_id),
+                FOREIGN KEY (url_id) REFERENCES articulos(url_id) ON DELETE CASCADE,
+                FOREIGN KEY (categoria_id) REFERENCES categoria(categoria_id) ON DELETE CASCADE
+            ) WITHOUT ROWID
+        """)
+        # (categoria_id, fecha, url_id): la clave primaria va incluida en el índice
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_articulo_categoria_fecha
+            ON articulo_categoria (categoria_id, fecha)
+        """)
+        cursor.executescript("""
+            CREATE TRIGGER IF NOT EXISTS articulo_categoria_after_keyword_category_insert
+            AFTER INSERT ON palabras_clave_categoria
+            BEGIN
+                INSERT OR IGNORE INTO articulo_categoria (url_id, categoria_id, fecha)
+                SELECT a.url_id, NEW.categoria_id, a.fecha_publicacion
+                FROM palabra_clave_articulos pca
+                JOIN articulos a ON a.url_id = pca.url_id
+                WHERE pca.palabra_id = NEW.palabra_id;
+            END;
+
+            -- Los artículos de la palabra clave siguen en la categoría si tienen otra palabra clave de ella
+            CREATE TRIGGER IF NOT EXISTS articulo_categoria_after_keyword_category_delete
+            AFTER DELETE ON palabras_clave_categoria
+            BEGIN
+                DELETE FROM articulo_categoria
+                WHERE categoria_id = OLD.categoria_id
+                AND url_id IN (
+                    SELECT url_id FROM palabra_clave_articulos WHERE palabra_id = OLD.palabra_id
+                )
+                AND NOT EXISTS (
+                    SELECT 1 FROM palabra_clave_articulos pca
+                    JOIN palabras_clave_categoria pcc ON pcc.palabra_id = pca.palabra_id
+                    WHERE pca.url_id = articulo_categoria.url_id
+                    AND pcc.categoria_id = OLD.categoria_id
+                );
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS articulo_categoria_after_keyword_article_delete
+            AFTER DELETE ON palabra_clave_articulos
+            BEGIN
+                DELETE FROM articulo_categoria
+                WHERE url_id = OLD.url_id
+                AND categoria_id IN (
+                    SELECT categoria_id FROM palabras_clave_categoria WHERE palabra_id = OLD.palabra_id
+                )
+                AND NOT EXISTS (
+                    SELECT 1 FROM palabra_clave_articulos pca
+                    JOIN palabras_clave_categoria pcc ON pcc.palabra_id = pca.palabra_id
+                    WHERE pca.url_id = OLD.url_id
+                    AND pcc.categoria_id = articulo_categoria.categoria_id
+                );
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS articulo_categoria_after_fecha_update
+            AFTER UPDATE OF fecha_publicacion ON articulos
+            BEGIN
+                UPDATE articulo_categoria SET fecha = NEW.fecha_publicacion WHERE url_id = NEW.url_id;
+            END;
+        """)
+
+        # Diccionarios zlib entrenados con texto de noticias (news_database.text_store)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS diccionarios_texto (
+                dict_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                zdict BLOB NOT NULL,
+                muestras INTEGER,
+                creado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        # Texto limpio de los artículos comprimido, para volver a filtrar o generar embeddings sin descargar
+        # dict_id NULL: comprimido sin diccionario
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS textos_articulos (
+                url_id INTEGER PRIMARY KEY,
+                dict_id INTEGER,
+                longitud INTEGER,
+                texto BLOB NOT NULL,
+                FOREIGN KEY (url_id) REFERENCES articulos(url_id) ON DELETE CASCADE,
+                FOREIGN KEY (dict_id) REFERENCES diccionarios_texto(dict_id)
+            )
+        """)
+
+        # Índice de texto completo del título y el texto de los artículos con texto guardado (rowid = url_id),
+        # para buscar palabras o frases (NewsInterfaceDatabase.search_fulltext). Sin contenido (content=''):
+        # el texto ya está comprimido en textos_articulos y el índice solo guarda los términos.
+        # remove_diacritics 2: sin distinguir tildes ("economía" y "economia" son el mismo término).
+        # Se actualiza junto con los textos (NewsDatabase.bulk_insert_article_texts); los artículos eliminados se
+        # descartan al buscar (no hay fila en articulos) y NewsDatabase.rebuild_fulltext_index quita sus términos
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS busqueda_articulos USING fts5(
+                titulo, texto, content='', tokenize='unicode61 remove_diacritics 2'
+            )
+        """)
+
+        # Índice invertido stem -> artículo de los textos guardados, para aplicar reglas nuevas
+        # a artículos anteriores sin recorrer todos los textos (news_scraper.utils.rule_backfill).
+        # Si el texto de un artículo se reemplaza o elimina, su id y sus stems se eliminan en cascada
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS indice_articulos (
+                articulo_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url_id INTEGER UNIQUE NOT NULL,
+                FOREIGN KEY (url_id) REFERENCES textos_articulos(url_id) ON DELETE CASCADE
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS indice_stems (
+                stem TEXT NOT NULL,
+                articulo_id INTEGER NOT NULL,
+                PRIMARY KEY (stem, articulo_id)
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_indice_stems_articulo ON indice_stems (articulo_id)")
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS cleanup_indice_stems_after_articulo_delete
+            AFTER DELETE ON indice_articulos
+            BEGIN
+                DELETE FROM indice_stems WHERE articulo_id = OLD.articulo_id;
+            END;
+        """)
+
+        # Artículos pendientes de guardar sus embeddings en Chroma (EmbeddingPipeline): se registran al
+        # entrar en su lote y se quitan al guardarse; los que quedan (error o ejecución interrumpida)
+        # se vuelven a codificar desde textos_articulos en la siguiente ejecución
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings_pendientes (
+                url_id INTEGER PRIMARY KEY,
+                FOREIGN KEY (url_id) REFERENCES urls_exploradas(url_id) ON DELETE CASCADE
+            )
+        """)
+
+        # Reglas ya aplicadas a los artículos guardados y su contenido (tipo y palabras clave) en ese momento
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS reglas_aplicadas (
+                regla_id INTEGER PRIMARY KEY,
+                firma TEXT NOT NULL,
+                aplicada_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (regla_id) REFERENCES reglas(regla_id) ON DELETE CASCADE
+            )
+        """)
 
         # Crear una tabla de mapa del sitio
         cursor.execute("""
@@ -108,6 +556,46 @@ class NewsCoreDatabase:
         """)
 
 
+        # Validadores HTTP (ETag / Last-Modified) de robots.txt y sitemaps entre ejecuciones
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS cache_http (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                contenido TEXT,
+                actualizado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                fecha_inicio TEXT
+            )
+        """)
+
+
+        # Estado de cada sitemap procesado para omitir los que no han cambiado
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sitemap_state (
+                url TEXT PRIMARY KEY,
+                lastmod TEXT,
+                content_hash TEXT,
+                newest_article_date TIMESTAMP,
+                sitemap_count INTEGER DEFAULT 0,
+                processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                fecha_inicio TEXT
+            )
+        """)
+
+
+        # Páginas de categoría y feeds descubiertos con Newspaper por fuente (sin sitemap)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS cache_descubrimiento (
+                fuente_url TEXT NOT NULL,
+                pagina_url TEXT NOT NULL,
+                content_hash TEXT,
+                enlaces TEXT,
+                actualizado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (fuente_url, pagina_url)
+            )
+        """)
+
+
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS reglas (
                 regla_id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -154,7 +642,74 @@ class NewsCoreDatabase:
             END;
         """)
 
+        # Versión del conjunto de reglas: cualquier cambio en reglas o palabras clave la incrementa
+        # para que los procesos de extracción recarguen las reglas compiladas
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS rules_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL
+            )
+        """)
+        cursor.execute("INSERT OR IGNORE INTO rules_version (id, version) VALUES (1, 1)")
+        for tabla, eventos in (('reglas', ('INSERT', 'UPDATE', 'DELETE')),
+                               ('regla_palabras_clave', ('INSERT', 'UPDATE', 'DELETE')),
+                               ('palabras_clave', ('UPDATE', 'DELETE'))):
+            for evento in eventos:
+                cursor.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS rules_version_{tabla}_{evento.lower()}
+                    AFTER {evento} ON {tabla}
+                    BEGIN
+                        UPDATE rules_version SET version = version + 1 WHERE id = 1;
+                    END;
+                """)
+
+        self.conn.commit()
+
+    def migrate(self):
+        """
+        Aplica las migraciones pendientes según PRAGMA user_version, cada una en su propia
+        transacción, y actualiza las estadísticas del planificador (ANALYZE). Retorna la versión.
+        En una base de datos nueva solo registra la versión: create_tables crea el esquema actual.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("PRAGMA user_version")
+        version = cursor.fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return version
+
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'articulos'")
+        if cursor.fetchone() is None:
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self.conn.commit()
+            return SCHEMA_VERSION
+
+        # Las migraciones reconstruyen tablas: sin claves foráneas (DROP TABLE eliminaría en cascada).
+        # PRAGMA foreign_keys no tiene efecto dentro de una transacción
+        self.conn.commit()
+        cursor.execute("PRAGMA foreign_keys = OFF")
+        try:
+            for numero, migracion in enumerate(MIGRATIONS[version:], version + 1):
+                cursor.execute("SAVEPOINT migracion")
+                try:
+                    migracion(cursor)
+                    cursor.execute(f"PRAGMA user_version = {numero}")
+                except Exception:
+                    cursor.execute("ROLLBACK TO migracion")
+                    cursor.execute("RELEASE migracion")
+                    raise
+                cursor.execute("PRAGMA foreign_key_check")
+                violaciones = cursor.fetchall()
+                cursor.execute("RELEASE migracion")
+                print(f"Migración {numero} aplicada: {migracion.__doc__.strip()}")
+                if violaciones:
+                    print(f"Aviso: {len(violaciones)} filas con claves foráneas inválidas "
+                          f"(p. ej. {violaciones[0][0]}) tras la migración {numero}")
+        finally:
+            cursor.execute("PRAGMA foreign_keys = ON")
+
+        analyze(cursor)
         self.conn.commit()
+        return SCHEMA_VERSION
 
 
     # Métodos utilitarios compartidos
@@ -162,7 +717,7 @@ class NewsCoreDatabase:
         """NLTK SnowballStemmer español"""
         if not isinstance(palabra, str):
             return ''
-        return self.stemmer.stem(palabra.strip().lower())
+        return stem(palabra.strip().lower())
 
     def get_keyword_id(self, palabra):
         """Obtiene ID de palabra clave"""
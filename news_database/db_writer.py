@@ -0,0 +1,171 @@
+"""
+Hilo escritor de SQLite con confirmación agrupada (group commit).
+
+Un único hilo es dueño de la conexión de escritura (modo WAL) y ejecuta en orden las operaciones
+que le envían el spider, los middlewares y los pipelines. Todas las operaciones de una ventana
+(COMMIT_INTERVAL segundos o MAX_BATCH operaciones) se confirman en una sola transacción:
+un fsync por ventana en lugar de uno por cada commit() de los métodos de NewsDatabase.
+
+Cada operación se ejecuta dentro de su propio SAVEPOINT: si falla, solo se deshacen sus cambios
+desde su último commit() y el error se entrega en su Future, sin afectar al resto de la ventana.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from news_database.news_db import NewsDatabase
+
+COMMIT_INTERVAL = 1.0
+MAX_BATCH = 500
+
+_SAVEPOINT = 'operacion'
+_STOP = object()
+
+
+class _GroupCommitConnection:
+    """
+    Conexión que usan los métodos de NewsDatabase dentro del hilo escritor.
+    commit() no confirma (lo hace el escritor al cerrar la ventana): fija los cambios de la
+    operación en curso en la transacción de la ventana, y rollback() deshace los cambios
+    posteriores. Se mantiene así el comportamiento de los métodos que confirman o deshacen
+    varias veces (p. ej. SQLitePipeline._insert_individual).
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def commit(self):
+        self._conn.execute(f'RELEASE {_SAVEPOINT}')
+        self._conn.execute(f'SAVEPOINT {_SAVEPOINT}')
+
+    def rollback(self):
+        self._conn.execute(f'ROLLBACK TO {_SAVEPOINT}')
+
+
+class DatabaseWriter:
+
+    def __init__(self, db_path, commit_interval=COMMIT_INTERVAL, max_batch=MAX_BATCH):
+        self.commit_interval = commit_interval
+        self.max_batch = max_batch
+        self.queue = queue.Queue()
+        self.operations = 0
+        self.commits = 0
+        self.errors = 0
+
+        # Conexión propia en modo autocommit: las transacciones y savepoints se controlan aquí.
+        # Solo se usa desde el hilo escritor.
+        self.db = NewsDatabase(db_path)
+        self.conn = self.db.conn
+        self.conn.isolation_level = None
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        # En WAL, NORMAL solo sincroniza en los checkpoints: una transacción confirmada
+        # puede perderse ante un corte de corriente, pero la base de datos no se corrompe
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.db.conn = _GroupCommitConnection(self.conn)
+
+        self.thread = threading.Thread(target=self._run, name='sqlite-writer', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def enqueue(self, method, *args, **kwargs):
+        """
+        Encola la llamada a un método de NewsDatabase. Retorna un Future con su resultado,
+        que se resuelve cuando la transacción de su ventana se ha confirmado.
+        """
+        return self.enqueue_call(lambda db: getattr(db, method)(*args, **kwargs))
+
+    def enqueue_call(self, fn, *args, **kwargs):
+        """
+        Encola fn(db, *args, **kwargs), que se ejecuta en el hilo escritor con su NewsDatabase.
+        Retorna un Future con el resultado de fn.
+        """
+        future = Future()
+        self.queue.put((fn, args, kwargs, future))
+        return future
+
+    def flush(self):
+        """ Future que se resuelve cuando todo lo encolado hasta ahora está confirmado """
+        future = Future()
+        self.queue.put((None, (), {}, future))
+        return future
+
+    def close(self):
+        """ Confirma las operaciones pendientes y detiene el hilo """
+        if self.thread.is_alive():
+            self.queue.put(_STOP)
+            self.thread.join()
+        self.conn.close()
+
+    def _run(self):
+        stop = False
+        while not stop:
+            operation = self.queue.get()
+            if operation is _STOP:
+                break
+
+            # Ventana de confirmación: operaciones hasta MAX_BATCH, COMMIT_INTERVAL o un flush
+            batch = [operation]
+            deadline = time.monotonic() + self.commit_interval
+            while batch[-1][0] is not None and len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    operation = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if operation is _STOP:
+                    stop = True
+                    break
+                batch.append(operation)
+            self._execute(batch)
+
+        # Operaciones encoladas después de la señal de parada
+        pending = []
+        while True:
+            try:
+                operation = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if operation is not _STOP:
+                pending.append(operation)
+        if pending:
+            self._execute(pending)
+
+    def _execute(self, batch):
+        results = []
+        self.conn.execute('BEGIN')
+        for fn, args, kwargs, future in batch:
+            if fn is None:
+                results.append((future, None, None))
+                continue
+            self.conn.execute(f'SAVEPOINT {_SAVEPOINT}')
+            try:
+                result = fn(self.db, *args, **kwargs)
+                self.conn.execute(f'RELEASE {_SAVEPOINT}')
+                results.append((future, result, None))
+            except Exception as e:
+                self.conn.execute(f'ROLLBACK TO {_SAVEPOINT}')
+                self.conn.execute(f'RELEASE {_SAVEPOINT}')
+                self.errors += 1
+                print(f"Error en operación de escritura: {e}")
+                results.append((future, None, e))
+
+        try:
+            self.conn.execute('COMMIT')
+            self.commits += 1
+        except Exception as e:
+            self.conn.execute('ROLLBACK')
+            print(f"Error al confirmar {len(batch)} operaciones: {e}")
+            results = [(future, None, error or e) for future, _, error in results]
+
+        self.operations += sum(1 for fn, _, _, _ in batch if fn is not None)
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
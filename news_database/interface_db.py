@@ -1,5 +1,15 @@
 from news_database.core_db import NewsCoreDatabase
-from news_database.utils import get_domain
+from news_database.utils import get_domain, to_epoch, fulltext_query
+from news_database.normalization import get_spanish_stopwords
+
+# Artículos por página de fetch_articles_page y máximo que cuenta count_articles
+ARTICLES_PAGE_SIZE = 200
+COUNT_LIMIT = 10000
+# Resultados de search_fulltext, peso del título frente al texto en su orden (BM25) y artículos
+# encontrados que se ordenan como máximo (los más recientes) para acotar el coste de los términos frecuentes
+FULLTEXT_LIMIT = 50
+FULLTEXT_TITLE_WEIGHT = 4.0
+FULLTEXT_CANDIDATES = 5000
 
 class NewsInterfaceDatabase(NewsCoreDatabase):
     ALL_OPTION = "Todas"
@@ -35,57 +45,209 @@ class NewsInterfaceDatabase(NewsCoreDatabase):
 
 
     def fetch_articles(self, categories=None, keywords=None, start_date=None, end_date=None):
+        """ (titulo, url, fuente, fecha_publicacion en segundos UTC) de los artículos, del más reciente al más antiguo """
         c = self.conn.cursor()
+        c.execute(*self.articles_query(categories, keywords, start_date, end_date))
+        return c.fetchall()
+
+    def fetch_articles_page(self, categories=None, keywords=None, start_date=None, end_date=None,
+                            after=None, limit=ARTICLES_PAGE_SIZE):
+        """
+        Página de fetch_articles ordenada por (fecha_publicacion, url_id) descendente (paginación por clave).
+        after: cursor retornado por la página anterior (None para la primera)
+        Retorna (artículos, cursor de la página siguiente o None si no hay más)
+        """
+        c = self.conn.cursor()
+        c.execute(*self.articles_query(categories, keywords, start_date, end_date, after=after, limit=limit + 1))
+        rows = c.fetchall()
+        siguiente = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            siguiente = (rows[-1][3], rows[-1][4])
+        return [row[:4] for row in rows], siguiente
+
+    def count_articles(self, categories=None, keywords=None, start_date=None, end_date=None, limit=COUNT_LIMIT):
+        """
+        Número de artículos de fetch_articles, contando como máximo limit para acotar el coste.
+        Retorna (total, exacto): si exacto es False hay más de limit artículos
+        """
+        c = self.conn.cursor()
+        c.execute(*self.articles_query(categories, keywords, start_date, end_date, limit=limit + 1, count=True))
+        total = c.fetchone()[0]
+        return min(total, limit), total <= limit
+
+    def articles_query(self, categories=None, keywords=None, start_date=None, end_date=None, after=None, limit=None,
+                       count=False):
+        """
+        Consulta SQL y parámetros de fetch_articles (también para revisar su plan de ejecución).
+        Con limit, solo los primeros limit artículos posteriores al cursor after (fecha_publicacion, url_id)
+        en el orden de la consulta, con el url_id como quinta columna (fetch_articles_page).
+        Con count, el número de artículos (hasta limit) sin ordenar ni leer sus columnas (count_articles).
+        start_date y end_date: datetime o cadena ISO-8601 (sin zona horaria, UTC); se comparan en segundos UTC
+        """
+        start_date, end_date = to_epoch(start_date), to_epoch(end_date)
         query = """
-            SELECT a.titulo, a.url, f.nombre, a.fecha_publicacion
-            FROM articulos a
+            SELECT a.titulo, u.url, f.nombre, a.fecha_publicacion{}
+            FROM {}
+            JOIN urls_exploradas u ON u.url_id = a.url_id
             JOIN fuentes f ON a.fuente = f.fuente_id
             {}
+            ORDER BY {} DESC, {} DESC
             {}
-            {}
-            ORDER BY a.fecha_publicacion DESC
         """
+        tablas = "articulos a"
+        # Columnas del orden: las del índice que recorre la consulta
+        fecha, url_id = "a.fecha_publicacion", "a.url_id"
+        # Sin orden (todos los artículos o el número), las subconsultas IN dejan al planificador
+        # empezar por la tabla más selectiva; en una página, EXISTS recorre por fecha hasta completarla
+        conjuntos = count or limit is None
         where_clauses = []
         params = []
         if categories and NewsInterfaceDatabase.ALL_OPTION not in categories:
-            # Build a subquery for categories
-            subquery = """
-                EXISTS (
-                    SELECT 1 FROM palabras_clave_categoria pcc
-                    JOIN categoria c ON pcc.categoria_id = c.categoria_id
-                    WHERE c.nombre IN ({})
-                    AND pcc.palabra_id IN (
-                        SELECT palabra_id FROM palabra_clave_articulos pca
-                        WHERE pca.url = a.url
+            # Categorías de la tabla materializada articulo_categoria
+            if len(categories) == 1:
+                # Una categoría: recorrido de rango de idx_articulo_categoria_fecha, ya ordenado por fecha
+                tablas = "articulo_categoria ac" + ("" if count else " JOIN articulos a ON a.url_id = ac.url_id")
+                fecha, url_id = "ac.fecha", "ac.url_id"
+                where_clauses.append("ac.categoria_id = (SELECT categoria_id FROM categoria WHERE nombre = ?)")
+                params.extend(categories)
+            elif conjuntos:
+                # Varias categorías: un rango por categoría; un artículo puede estar en varias y
+                # solo se ordenan los artículos encontrados
+                where_clauses.append("""
+                    a.url_id IN (
+                        SELECT ac.url_id FROM articulo_categoria ac
+                        WHERE ac.categoria_id IN (SELECT categoria_id FROM categoria WHERE nombre IN ({}))
+                        {}
                     )
-                )
-            """.format(','.join(['?'] * len(categories)))
-            where_clauses.append(subquery)
-            params.extend(categories)
+                """.format(','.join(['?'] * len(categories)),
+                           (" AND ac.fecha >= ?" if start_date is not None else "")
+                           + (" AND ac.fecha < ?" if end_date is not None else "")))
+                params.extend(categories)
+                params.extend(fecha_limite for fecha_limite in (start_date, end_date) if fecha_limite is not None)
+            else:
+                # Varias categorías en una página: se recorren los artículos por fecha y se comprueba su
+                # categoría con la clave primaria, sin ordenar: termina al completar la página
+                where_clauses.append("""
+                    EXISTS (
+                        SELECT 1 FROM articulo_categoria ac
+                        WHERE ac.url_id = a.url_id
+                        AND ac.categoria_id IN (SELECT categoria_id FROM categoria WHERE nombre IN ({}))
+                    )
+                """.format(','.join(['?'] * len(categories))))
+                params.extend(categories)
         if keywords and NewsInterfaceDatabase.ALL_OPTION not in keywords:
-            # Build a subquery for keywords
-            subquery = """
-                EXISTS (
-                    SELECT 1 FROM palabra_clave_articulos pca
-                    JOIN palabras_clave pc ON pca.palabra_id = pc.palabra_id
-                    WHERE pc.palabra IN ({})
-                    AND pca.url = a.url
-                )
-            """.format(','.join(['?'] * len(keywords)))
-            where_clauses.append(subquery)
+            if count:
+                subquery = """
+                    {} IN (
+                        SELECT pca.url_id FROM palabra_clave_articulos pca
+                        JOIN palabras_clave pc ON pca.palabra_id = pc.palabra_id
+                        WHERE pc.palabra IN ({{}})
+                    )
+                """.format(url_id)
+            else:
+                # Build a subquery for keywords
+                subquery = """
+                    EXISTS (
+                        SELECT 1 FROM palabra_clave_articulos pca
+                        JOIN palabras_clave pc ON pca.palabra_id = pc.palabra_id
+                        WHERE pc.palabra IN ({})
+                        AND pca.url_id = a.url_id
+                    )
+                """
+            where_clauses.append(subquery.format(','.join(['?'] * len(keywords))))
             params.extend(keywords)
-        if start_date:
-            where_clauses.append("a.fecha_publicacion >= ?")
+        if start_date is not None:
+            where_clauses.append(f"{fecha} >= ?")
             params.append(start_date)
-        if end_date:
-            #where_clauses.append("a.fecha_publicacion <= ?")
-            where_clauses.append("a.fecha_publicacion < ?")
+        if after and after[0] is None:
+            # Los artículos sin fecha van al final del orden descendente (NULL es el menor valor) y la
+            # comparación de filas con NULL nunca es cierta: tras uno de ellos solo quedan los demás sin fecha
+            where_clauses.append(f"{fecha} IS NULL AND {url_id} < ?")
+            params.append(after[1])
+        elif after:
+            # El cursor ya es anterior a end_date; fecha <= ? es el límite del recorrido del índice
+            where_clauses.append(f"{fecha} <= ? AND ({fecha}, {url_id}) < (?, ?)")
+            params.extend((after[0], *after))
+        elif end_date is not None:
+            where_clauses.append(f"{fecha} < ?")
             params.append(end_date)
         where = "WHERE " + " AND ".join(where_clauses) if where_clauses else ""
-        query = query.format(where, "", "")
+        pagina = ""
+        if limit is not None:
+            pagina = "LIMIT ?"
+            params.append(limit)
+        if count:
+            return f"SELECT COUNT(*) FROM (SELECT 1 FROM {tablas} {where} {pagina})", params
+        query = query.format(f", {url_id}" if limit is not None else "", tablas, where, fecha, url_id, pagina)
+        return query, params
+
+    def search_fulltext(self, consulta, start_date=None, end_date=None, limit=FULLTEXT_LIMIT, any_term=False,
+                        candidates=FULLTEXT_CANDIDATES):
+        """
+        Artículos cuyo título o texto contienen todas las palabras y frases entre comillas de la consulta
+        (sin distinguir tildes ni mayúsculas; palabra* busca por prefijo), del más al menos relevante.
+        Con any_term basta con alguna de ellas y se omiten las stopwords (consultas en lenguaje natural).
+        Con más de candidates artículos encontrados, solo se ordenan los últimos descubiertos (None: todos).
+        Retorna (titulo, url, fuente (dominio, como en los metadatos de Chroma), fecha_publicacion en segundos UTC)
+        """
+        query, params = self.search_fulltext_query(consulta, start_date, end_date, limit, any_term, candidates)
+        if query is None:
+            return []
+        c = self.conn.cursor()
         c.execute(query, params)
         return c.fetchall()
 
+    def search_fulltext_query(self, consulta, start_date=None, end_date=None, limit=FULLTEXT_LIMIT, any_term=False,
+                              candidates=FULLTEXT_CANDIDATES):
+        """
+        Consulta SQL y parámetros de search_fulltext, o (None, []) si la consulta no tiene ningún término.
+        busqueda_articulos se recorre por url_id descendente (sin ordenar) hasta candidates artículos:
+        BM25 solo se calcula para ellos (con candidates None, para todos los encontrados).
+        Se ordenan (a igual puntuación, los más recientes) y limitan antes de leer su url
+        """
+        if any_term:
+            expresion = fulltext_query(consulta, any_term=True, stopwords=get_spanish_stopwords())
+        else:
+            expresion = fulltext_query(consulta)
+        if expresion is None:
+            return None, []
+        start_date, end_date = to_epoch(start_date), to_epoch(end_date)
+        where_clauses = ["busqueda_articulos MATCH ?"]
+        params = [expresion]
+        if start_date is not None:
+            where_clauses.append("a.fecha_publicacion >= ?")
+            params.append(start_date)
+        if end_date is not None:
+            where_clauses.append("a.fecha_publicacion < ?")
+            params.append(end_date)
+        if candidates is not None:
+            candidatos = "ORDER BY busqueda_articulos.rowid DESC LIMIT ?"
+            params.append(candidates)
+        else:
+            candidatos = ""
+        params.append(limit)
+        # El JOIN con articulos descarta también los términos de artículos eliminados que siguen en el índice
+        query = f"""
+            SELECT a.titulo, u.url, a.fuente, a.fecha_publicacion
+            FROM (
+                SELECT url_id, puntuacion FROM (
+                    SELECT busqueda_articulos.rowid AS url_id,
+                           bm25(busqueda_articulos, {FULLTEXT_TITLE_WEIGHT}, 1.0) AS puntuacion
+                    FROM busqueda_articulos
+                    JOIN articulos a ON a.url_id = busqueda_articulos.rowid
+                    WHERE {" AND ".join(where_clauses)}
+                    {candidatos}
+                )
+                ORDER BY puntuacion, url_id DESC
+                LIMIT ?
+            ) r
+            JOIN articulos a ON a.url_id = r.url_id
+            JOIN urls_exploradas u ON u.url_id = a.url_id
+            ORDER BY r.puntuacion, r.url_id DESC
+        """
+        return query, params
+
 
     # --- Métodos para administración ---
 
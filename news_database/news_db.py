@@ -1,9 +1,19 @@
-from news_database.core_db import NewsCoreDatabase
-from news_database.utils import get_domain
+from news_database.core_db import NewsCoreDatabase, URL_EN_PROCESO, URL_COMPLETADA, fill_fulltext_index
+from news_database.utils import get_domain, url_hash, to_epoch
+from news_database.text_store import (compress_text, decompress_text, train_dictionary,
+                                      TEXT_DICT_MIN_SAMPLES, TEXT_DICT_SAMPLES)
 from datetime import datetime
 import sqlite3
 
 class NewsDatabase(NewsCoreDatabase):
+    def __init__(self, db_path='news.db'):
+        super().__init__(db_path)
+        # Índice en memoria de urls exploradas (None hasta llamar a load_crawled_url_index)
+        self.crawled_url_index = None
+        # Diccionarios zlib del almacén de textos ya leídos: {dict_id: zdict}
+        self.text_dictionaries = {}
+        # Diccionario con el que se comprimen los textos nuevos (False hasta consultarlo)
+        self.current_text_dict_id = False
 
     def bulk_insert_sitemap(self, sitemap_data):
         cursor = self.conn.cursor()
@@ -40,30 +50,551 @@ class NewsDatabase(NewsCoreDatabase):
             print(f"Error al insertar en fuentes: {e}")
 
     def bulk_insert_articles(self, articles):
+        url_ids = self.require_url_ids(a['url'] for a in articles)
         cursor = self.conn.cursor()
         cursor.executemany('''
-        INSERT OR IGNORE INTO articulos (url, fuente, titulo, fecha_publicacion)
+        INSERT OR IGNORE INTO articulos (url_id, fuente, titulo, fecha_publicacion)
         VALUES (?, ?, ?, ?)
-        ''', [(a['url'], a['fuente'], a['titulo'], a['fecha_publicacion']) for a in articles])
+        ''', [(url_ids[a['url']], a['fuente'], a['titulo'], to_epoch(a['fecha_publicacion'])) for a in articles])
         self.conn.commit()
 
+    # --- Urls: url_id y hash de 64 bits ---
+    def get_url_ids(self, urls):
+        """
+        {url: url_id} de las urls registradas en urls_exploradas (las que no existen no se incluyen).
+        Busca por hash en lotes y compara la url para descartar colisiones.
+        """
+        urls = list(dict.fromkeys(urls))
+        url_ids = {}
+        cursor = self.conn.cursor()
+        batch_size = 500
+        for i in range(0, len(urls), batch_size):
+            batch = set(urls[i:i + batch_size])
+            hashes = {url_hash(url) for url in batch}
+            placeholders = ','.join('?' for _ in hashes)
+            cursor.execute(f'SELECT url_id, url FROM urls_exploradas WHERE url_hash IN ({placeholders})', list(hashes))
+            url_ids.update((url, url_id) for url_id, url in cursor.fetchall() if url in batch)
+        return url_ids
+
+    def require_url_ids(self, urls):
+        """
+        Como get_url_ids, pero lanza sqlite3.IntegrityError si alguna url no está registrada
+        (igual que la clave foránea cuando las tablas referenciaban la url).
+        """
+        urls = list(urls)
+        url_ids = self.get_url_ids(urls)
+        faltan = [url for url in urls if url not in url_ids]
+        if faltan:
+            raise sqlite3.IntegrityError(
+                f"FOREIGN KEY constraint failed: {len(faltan)} urls no registradas en urls_exploradas ({faltan[0]})")
+        return url_ids
+
+    # --- Almacén de textos comprimidos ---
+    def get_text_dictionary(self, dict_id):
+        if dict_id is None:
+            return None
+        if dict_id not in self.text_dictionaries:
+            cursor = self.conn.cursor()
+            cursor.execute('SELECT zdict FROM diccionarios_texto WHERE dict_id = ?', (dict_id,))
+            row = cursor.fetchone()
+            self.text_dictionaries[dict_id] = row[0] if row else None
+        return self.text_dictionaries[dict_id]
+
+    def get_current_text_dictionary_id(self):
+        """ Último diccionario entrenado, o None si aún no hay ninguno """
+        if self.current_text_dict_id is False:
+            cursor = self.conn.cursor()
+            cursor.execute('SELECT MAX(dict_id) FROM diccionarios_texto')
+            self.current_text_dict_id = cursor.fetchone()[0]
+        return self.current_text_dict_id
+
+    def sample_article_texts(self, muestras=TEXT_DICT_SAMPLES):
+        """ Los textos guardados más recientes: la muestra para entrenar un diccionario """
+        return [texto for _, texto in self._read_article_texts(
+            '''
+            SELECT u.url, t.dict_id, t.texto FROM textos_articulos t
+            JOIN urls_exploradas u ON u.url_id = t.url_id
+            ORDER BY t.url_id DESC LIMIT ?
+            ''', (muestras,))]
+
+    def insert_text_dictionary(self, zdict, muestras):
+        """
+        Guarda un diccionario ya entrenado (train_dictionary) y lo usa para los textos nuevos.
+        Los textos ya guardados siguen asociados a su diccionario. Retorna el dict_id.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute('INSERT INTO diccionarios_texto (zdict, muestras, creado_en) VALUES (?, ?, ?)',
+                       (zdict, muestras, datetime.now().isoformat(sep=' ', timespec='seconds')))
+        self.conn.commit()
+        self.current_text_dict_id = cursor.lastrowid
+        self.text_dictionaries[cursor.lastrowid] = zdict
+        print(f"Diccionario de textos {cursor.lastrowid} entrenado con {muestras} artículos ({len(zdict)} bytes)")
+        return cursor.lastrowid
+
+    def train_text_dictionary(self, muestras=TEXT_DICT_SAMPLES):
+        """
+        Entrena y guarda un diccionario con los textos guardados más recientes (paso puntual,
+        fuera del crawl: durante el crawl lo entrena SQLitePipeline en segundo plano).
+        Retorna el dict_id, o None si no hay suficientes textos.
+        """
+        textos = self.sample_article_texts(muestras)
+        if len(textos) < TEXT_DICT_MIN_SAMPLES:
+            return None
+        return self.insert_text_dictionary(train_dictionary(textos), len(textos))
+
+    def bulk_insert_article_texts(self, articles):
+        """
+        Guardar comprimido el texto de los artículos (deben existir en articulos).
+        Retorna (artículos, bytes sin comprimir, bytes comprimidos) de los textos guardados.
+        """
+        dict_id = self.get_current_text_dictionary_id()
+        zdict = self.get_text_dictionary(dict_id)
+        articles = [a for a in articles if isinstance(a.get('texto'), str)]
+        url_ids = self.require_url_ids(a['url'] for a in articles)
+        values = []
+        raw_bytes = compressed_bytes = 0
+        for a in articles:
+            texto = a['texto']
+            blob = compress_text(texto, zdict)
+            longitud = len(texto.encode('utf-8'))
+            values.append((url_ids[a['url']], dict_id, longitud, blob))
+            raw_bytes += longitud
+            compressed_bytes += len(blob)
+
+        cursor = self.conn.cursor()
+        # El índice de texto completo se actualiza en la misma transacción que los textos
+        textos = {url_ids[a['url']]: a['texto'] for a in articles}
+        self._unindex_fulltext(cursor, list(textos))
+        cursor.executemany('''
+        INSERT OR REPLACE INTO textos_articulos (url_id, dict_id, longitud, texto)
+        VALUES (?, ?, ?, ?)
+        ''', values)
+        self._index_fulltext(cursor, textos)
+        self.conn.commit()
+        return len(values), raw_bytes, compressed_bytes
+
+    def _index_fulltext(self, cursor, textos):
+        """ Añadir al índice de texto completo el título y el texto (url_id -> texto) de los artículos """
+        url_ids = list(textos)
+        filas = []
+        for i in range(0, len(url_ids), 500):
+            lote = url_ids[i:i + 500]
+            cursor.execute('SELECT url_id, titulo FROM articulos WHERE url_id IN ({})'.format(
+                ','.join(['?'] * len(lote))), lote)
+            filas.extend((url_id, titulo, textos[url_id]) for url_id, titulo in cursor.fetchall())
+        cursor.executemany('INSERT INTO busqueda_articulos (rowid, titulo, texto) VALUES (?, ?, ?)', filas)
+
+    def _unindex_fulltext(self, cursor, url_ids):
+        """ Quitar del índice de texto completo los textos guardados de los artículos que estén indexados """
+        anteriores = []
+        for i in range(0, len(url_ids), 500):
+            lote = url_ids[i:i + 500]
+            cursor.execute('''
+            SELECT t.url_id, a.titulo, t.dict_id, t.texto
+            FROM textos_articulos t
+            JOIN articulos a ON a.url_id = t.url_id
+            WHERE t.url_id IN ({})
+            AND EXISTS (SELECT 1 FROM busqueda_articulos b WHERE b.rowid = t.url_id)
+            '''.format(','.join(['?'] * len(lote))), lote)
+            # Sin contenido, FTS5 necesita los valores indexados para quitar sus términos
+            anteriores.extend(('delete', url_id, titulo, decompress_text(blob, self.get_text_dictionary(dict_id)))
+                              for url_id, titulo, dict_id, blob in cursor.fetchall())
+        cursor.executemany('''
+        INSERT INTO busqueda_articulos (busqueda_articulos, rowid, titulo, texto) VALUES (?, ?, ?, ?)
+        ''', anteriores)
+
+    def rebuild_fulltext_index(self):
+        """
+        Rehacer el índice de texto completo con los textos guardados, sin los términos de los artículos
+        eliminados. Retorna el número de artículos indexados
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("INSERT INTO busqueda_articulos (busqueda_articulos) VALUES ('delete-all')")
+        total = fill_fulltext_index(cursor)
+        cursor.execute("INSERT INTO busqueda_articulos (busqueda_articulos) VALUES ('optimize')")
+        self.conn.commit()
+        return total
+
+    def get_article_text(self, url):
+        textos = list(self._read_article_texts('''
+            SELECT u.url, t.dict_id, t.texto FROM urls_exploradas u
+            JOIN textos_articulos t ON t.url_id = u.url_id
+            WHERE u.url_hash = ? AND u.url = ?
+        ''', (url_hash(url), url)))
+        return textos[0][1] if textos else None
+
+    def _read_article_texts(self, query, params):
+        cursor = self.conn.cursor()
+        cursor.execute(query, params)
+        for url, dict_id, blob in cursor.fetchall():
+            yield url, decompress_text(blob, self.get_text_dictionary(dict_id))
+
+    def iter_article_texts(self, fuente=None, desde=None, batch_size=500):
+        """
+        Recorrer los artículos con texto guardado para reprocesarlos sin descargarlos de nuevo.
+        Genera diccionarios con url, fuente, titulo, fecha_publicacion (segundos UTC) y texto, en el orden
+        en que se descubrieron las urls. Lee por lotes (paginación por url_id) para no cargar todo en memoria
+        ni mantener abierta una lectura mientras el consumidor escribe en la base de datos.
+        """
+        condiciones = ['t.url_id > ?']
+        filtros = []
+        if fuente is not None:
+            condiciones.append('a.fuente = ?')
+            filtros.append(fuente)
+        if desde is not None:
+            condiciones.append('a.fecha_publicacion >= ?')
+            filtros.append(to_epoch(desde))
+        query = f'''
+            SELECT t.url_id, u.url, a.fuente, a.titulo, a.fecha_publicacion, t.dict_id, t.texto
+            FROM textos_articulos t
+            JOIN articulos a ON a.url_id = t.url_id
+            JOIN urls_exploradas u ON u.url_id = t.url_id
+            WHERE {' AND '.join(condiciones)}
+            ORDER BY t.url_id
+            LIMIT ?
+        '''
+
+        ultimo_id = 0
+        cursor = self.conn.cursor()
+        while True:
+            cursor.execute(query, (ultimo_id, *filtros, batch_size))
+            rows = cursor.fetchall()
+            for _, url, fuente_id, titulo, fecha_publicacion, dict_id, blob in rows:
+                yield {
+                    'url': url,
+                    'fuente': fuente_id,
+                    'titulo': titulo,
+                    'fecha_publicacion': fecha_publicacion,
+                    'texto': decompress_text(blob, self.get_text_dictionary(dict_id)),
+                }
+            if len(rows) < batch_size:
+                break
+            ultimo_id = rows[-1][0]
+
+    def get_text_store_stats(self):
+        """ (artículos, bytes sin comprimir, bytes comprimidos) del almacén de textos """
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT COUNT(*), COALESCE(SUM(longitud), 0), COALESCE(SUM(LENGTH(texto)), 0)
+            FROM textos_articulos
+        ''')
+        return cursor.fetchone()
+
+    # --- Embeddings pendientes ---
+    def add_pending_embeddings(self, urls):
+        """ Registrar artículos cuyos embeddings aún no están guardados (las urls deben estar exploradas) """
+        cursor = self.conn.cursor()
+        cursor.executemany('''
+        INSERT OR IGNORE INTO embeddings_pendientes (url_id)
+        SELECT url_id FROM urls_exploradas WHERE url_hash = ? AND url = ?
+        ''', [(url_hash(url), url) for url in urls])
+        self.conn.commit()
+
+    def remove_pending_embeddings(self, urls):
+        cursor = self.conn.cursor()
+        cursor.executemany('''
+        DELETE FROM embeddings_pendientes
+        WHERE url_id IN (SELECT url_id FROM urls_exploradas WHERE url_hash = ? AND url = ?)
+        ''', [(url_hash(url), url) for url in urls])
+        self.conn.commit()
+
+    def get_pending_embedding_articles(self):
+        """
+        Artículos pendientes de embeddings con texto y fecha guardados, como los de iter_article_texts
+        (url, fuente, titulo, fecha_publicacion en segundos UTC y texto)
+        """
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT u.url, a.fuente, a.titulo, a.fecha_publicacion, t.dict_id, t.texto
+            FROM embeddings_pendientes p
+            JOIN articulos a ON a.url_id = p.url_id
+            JOIN textos_articulos t ON t.url_id = p.url_id
+            JOIN urls_exploradas u ON u.url_id = p.url_id
+            WHERE a.fecha_publicacion IS NOT NULL
+            ORDER BY p.url_id
+        ''')
+        return [{
+            'url': url,
+            'fuente': fuente_id,
+            'titulo': titulo,
+            'fecha_publicacion': fecha_publicacion,
+            'texto': decompress_text(blob, self.get_text_dictionary(dict_id)),
+        } for url, fuente_id, titulo, fecha_publicacion, dict_id, blob in cursor.fetchall()]
+
+    # --- Índice invertido stem -> artículo ---
+    def count_unindexed_article_texts(self):
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT COUNT(*) FROM textos_articulos t
+            LEFT JOIN indice_articulos i ON i.url_id = t.url_id
+            WHERE i.url_id IS NULL
+        ''')
+        return cursor.fetchone()[0]
+
+    def get_unindexed_article_texts(self, limit=500):
+        """ Lista de (url, texto) de artículos guardados que aún no están en el índice de stems """
+        return list(self._read_article_texts('''
+            SELECT u.url, t.dict_id, t.texto FROM textos_articulos t
+            JOIN urls_exploradas u ON u.url_id = t.url_id
+            LEFT JOIN indice_articulos i ON i.url_id = t.url_id
+            WHERE i.url_id IS NULL
+            LIMIT ?
+        ''', (limit,)))
+
+    def bulk_index_articles(self, articulos):
+        """
+        Añadir artículos al índice invertido.
+        articulos: lista de (url, conjunto de stems del texto normalizado)
+        """
+        articulos = list(articulos)
+        url_ids = self.require_url_ids(url for url, _ in articulos)
+        cursor = self.conn.cursor()
+        postings = []
+        for url, stems in articulos:
+            # DELETE explícito para que el trigger elimine los stems anteriores (REPLACE no lo dispara)
+            cursor.execute('DELETE FROM indice_articulos WHERE url_id = ?', (url_ids[url],))
+            cursor.execute('INSERT INTO indice_articulos (url_id) VALUES (?)', (url_ids[url],))
+            articulo_id = cursor.lastrowid
+            postings.extend((stem, articulo_id) for stem in stems)
+        # Ordenados por clave primaria: inserciones consecutivas en el árbol B
+        postings.sort()
+        cursor.executemany('INSERT OR IGNORE INTO indice_stems (stem, articulo_id) VALUES (?, ?)', postings)
+        self.conn.commit()
+
+    def get_indexed_article_ids(self, stem=None):
+        """ Conjunto de ids de artículos indexados que contienen el stem (todos si stem es None) """
+        cursor = self.conn.cursor()
+        if stem is None:
+            cursor.execute('SELECT articulo_id FROM indice_articulos')
+        else:
+            cursor.execute('SELECT articulo_id FROM indice_stems WHERE stem = ?', (stem,))
+        return {row[0] for row in cursor.fetchall()}
+
+    def get_indexed_article_texts(self, articulo_ids, batch_size=500):
+        """ Genera (url, texto) de los artículos indexados con los ids indicados """
+        articulo_ids = sorted(articulo_ids)
+        for i in range(0, len(articulo_ids), batch_size):
+            batch = articulo_ids[i:i + batch_size]
+            placeholders = ','.join('?' for _ in batch)
+            yield from self._read_article_texts(f'''
+                SELECT u.url, t.dict_id, t.texto
+                FROM indice_articulos i
+                JOIN textos_articulos t ON t.url_id = i.url_id
+                JOIN urls_exploradas u ON u.url_id = i.url_id
+                WHERE i.articulo_id IN ({placeholders})
+            ''', batch)
+
+    def get_applied_rules(self):
+        """ {regla_id: firma} de las reglas ya aplicadas a los artículos guardados """
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT regla_id, firma FROM reglas_aplicadas')
+        return dict(cursor.fetchall())
+
+    def save_applied_rules(self, firmas):
+        """ firmas: {regla_id: firma} """
+        cursor = self.conn.cursor()
+        aplicada_en = datetime.now().isoformat(sep=' ', timespec='seconds')
+        cursor.executemany('''
+            INSERT OR REPLACE INTO reglas_aplicadas (regla_id, firma, aplicada_en) VALUES (?, ?, ?)
+        ''', [(regla_id, firma, aplicada_en) for regla_id, firma in firmas.items()])
+        self.conn.commit()
+
+    def load_crawled_url_index(self):
+        """
+        Carga en memoria el índice de urls exploradas como un conjunto de hashes de 64 bits.
+        A partir de este momento is_crawled_url y filter_crawled_urls no consultan la base de datos.
+        Las urls en proceso de una ejecución interrumpida no se incluyen: la araña las vuelve a pedir
+        y entonces las añade (add_to_crawled_url_index).
+        """
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT url_hash FROM urls_exploradas WHERE estado = ?', (URL_COMPLETADA,))
+        self.crawled_url_index = {row[0] for row in cursor}
+        return len(self.crawled_url_index)
+
     def is_crawled_url(self, url):
+        if self.crawled_url_index is not None:
+            return url_hash(url) in self.crawled_url_index
         cursor = self.conn.cursor()
-        cursor.execute('SELECT 1 FROM urls_exploradas WHERE url = ?', (url,))
+        cursor.execute('SELECT 1 FROM urls_exploradas WHERE url_hash = ? AND url = ? AND estado = ?',
+                       (url_hash(url), url, URL_COMPLETADA))
         return cursor.fetchone() is not None
 
-    def bulk_insert_crawled_urls(self, urls):
+    def filter_crawled_urls(self, urls):
+        """
+        Retorna las urls (sin repetir y en el mismo orden) que aún no han sido exploradas.
+        """
+        urls = list(dict.fromkeys(url for url in urls if url))
+        if self.crawled_url_index is not None:
+            return [url for url in urls if url_hash(url) not in self.crawled_url_index]
+
+        # Sin índice en memoria: consultas por lotes en lugar de una por url
+        crawled = set()
+        cursor = self.conn.cursor()
+        batch_size = 500
+        for i in range(0, len(urls), batch_size):
+            batch = urls[i:i + batch_size]
+            placeholders = ','.join('?' for _ in batch)
+            cursor.execute(f'SELECT url FROM urls_exploradas WHERE estado = ? AND url_hash IN ({placeholders})',
+                           [URL_COMPLETADA, *(url_hash(url) for url in batch)])
+            crawled.update(row[0] for row in cursor.fetchall())
+        return [url for url in urls if url not in crawled]
+
+    def bulk_insert_crawled_urls(self, urls, estado=URL_EN_PROCESO):
+        """
+        Registrar urls descubiertas. Quedan en proceso hasta que el artículo se guarda o se descarta.
+        """
         cursor = self.conn.cursor()
 
+        urls = list(urls)
         values = []
         for url in urls:
             crawled_time = datetime.now().isoformat(sep=' ', timespec='seconds')  # e.g., '2025-05-04 14:30:00'
-            values.append((url, crawled_time))
+            h = url_hash(url)
+            values.append((h, url, crawled_time, estado, h, url))
 
+        # Sin índice único sobre la url: se omiten las ya registradas buscando por hash
         cursor.executemany('''
-        INSERT OR IGNORE INTO urls_exploradas (url, crawled_at) VALUES (?, ?)
+        INSERT INTO urls_exploradas (url_hash, url, crawled_at, estado)
+        SELECT ?, ?, ?, ?
+        WHERE NOT EXISTS (SELECT 1 FROM urls_exploradas WHERE url_hash = ? AND url = ?)
         ''', values)
         self.conn.commit()
+        self.add_to_crawled_url_index(urls)
+
+    def add_to_crawled_url_index(self, urls):
+        """ Añade urls al índice en memoria (si está cargado) sin escribir en la base de datos """
+        if self.crawled_url_index is not None:
+            self.crawled_url_index.update(url_hash(url) for url in urls)
+
+    def mark_crawled_urls_completed(self, urls):
+        """
+        Marcar urls como completadas (artículo guardado, descartado o no recuperable)
+        """
+        cursor = self.conn.cursor()
+        cursor.executemany('''
+        UPDATE urls_exploradas SET estado = ? WHERE url_hash = ? AND url = ? AND estado = ?
+        ''', [(URL_COMPLETADA, url_hash(url), url, URL_EN_PROCESO) for url in urls])
+        self.conn.commit()
+
+    def get_in_flight_urls(self):
+        """
+        Obtener las urls que quedaron en proceso (p. ej. por una ejecución interrumpida)
+        """
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT url FROM urls_exploradas WHERE estado = ?', (URL_EN_PROCESO,))
+        return [row[0] for row in cursor.fetchall()]
+
+    def get_http_validators(self, url):
+        """
+        Obtener (etag, last_modified, contenido, fecha_inicio) guardados para una url, o None si no existen
+        """
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT etag, last_modified, contenido, fecha_inicio FROM cache_http WHERE url = ?', (url,))
+        return cursor.fetchone()
+
+    def save_http_validators(self, url, etag, last_modified, fecha_inicio=None):
+        """
+        Guardar los validadores de una respuesta ya procesada y la fecha de inicio (ISO) de la ejecución
+        que la procesó
+        """
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            INSERT INTO cache_http (url, etag, last_modified, actualizado_en, fecha_inicio)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP, ?)
+            ON CONFLICT(url) DO UPDATE SET
+                etag = excluded.etag,
+                last_modified = excluded.last_modified,
+                actualizado_en = excluded.actualizado_en,
+                fecha_inicio = excluded.fecha_inicio
+        ''', (url, etag, last_modified, fecha_inicio))
+        self.conn.commit()
+
+    def save_http_cache_content(self, url, contenido):
+        """
+        Guardar el resultado ya procesado de una url (p. ej. los sitemaps de robots.txt)
+        para reutilizarlo cuando el servidor responda 304
+        """
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            INSERT INTO cache_http (url, contenido) VALUES (?, ?)
+            ON CONFLICT(url) DO UPDATE SET contenido = excluded.contenido
+        ''', (url, contenido))
+        self.conn.commit()
+
+    def get_sitemap_state(self, url):
+        """
+        Obtener el último estado registrado de un sitemap, o None si nunca se procesó
+        """
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT lastmod, content_hash, newest_article_date, sitemap_count, processed_at, fecha_inicio
+            FROM sitemap_state WHERE url = ?
+        ''', (url,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return {
+            'lastmod': row[0],
+            'content_hash': row[1],
+            'newest_article_date': row[2],
+            'sitemap_count': row[3],
+            'processed_at': row[4],
+            'fecha_inicio': row[5],
+        }
+
+    def save_sitemap_state(self, url, lastmod, content_hash, newest_article_date, sitemap_count, fecha_inicio=None):
+        """
+        Guardar el estado de un sitemap procesado y la fecha de inicio (ISO) de la ejecución que descartó
+        sus entradas anteriores a ella
+        """
+        cursor = self.conn.cursor()
+        processed_at = datetime.now().isoformat(sep=' ', timespec='seconds')
+        cursor.execute('''
+            INSERT INTO sitemap_state (url, lastmod, content_hash, newest_article_date, sitemap_count, processed_at,
+                                       fecha_inicio)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET
+                lastmod = COALESCE(excluded.lastmod, sitemap_state.lastmod),
+                content_hash = excluded.content_hash,
+                newest_article_date = COALESCE(excluded.newest_article_date, sitemap_state.newest_article_date),
+                sitemap_count = excluded.sitemap_count,
+                processed_at = excluded.processed_at,
+                fecha_inicio = excluded.fecha_inicio
+        ''', (url, lastmod, content_hash, newest_article_date, sitemap_count, processed_at, fecha_inicio))
+        self.conn.commit()
+
+    def get_discovery_cache(self, fuente_url):
+        """
+        Obtener las páginas de categoría/feeds descubiertas para una fuente:
+        {pagina_url: (content_hash, set de enlaces)}
+        """
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT pagina_url, content_hash, enlaces
+            FROM cache_descubrimiento WHERE fuente_url = ?
+        ''', (fuente_url,))
+        return {
+            pagina_url: (content_hash, set(enlaces.splitlines()) if enlaces else set())
+            for pagina_url, content_hash, enlaces in cursor.fetchall()
+        }
+
+    def save_discovery_cache(self, fuente_url, paginas):
+        """
+        Reemplazar el estado de descubrimiento de una fuente.
+        paginas: {pagina_url: (content_hash, set de enlaces)}
+        Las páginas que ya no aparecen en la fuente se eliminan.
+        """
+        cursor = self.conn.cursor()
+        actualizado_en = datetime.now().isoformat(sep=' ', timespec='seconds')
+        cursor.execute('DELETE FROM cache_descubrimiento WHERE fuente_url = ?', (fuente_url,))
+        cursor.executemany('''
+            INSERT INTO cache_descubrimiento (fuente_url, pagina_url, content_hash, enlaces, actualizado_en)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [
+            (fuente_url, pagina_url, content_hash, '\n'.join(sorted(enlaces)), actualizado_en)
+            for pagina_url, (content_hash, enlaces) in paginas.items()
+        ])
+        self.conn.commit()
 
     def remove_old_articles(self, limit_date):
         cursor = self.conn.cursor()
@@ -71,7 +602,7 @@ class NewsDatabase(NewsCoreDatabase):
         cursor.execute('''
         DELETE FROM articulos
         WHERE fecha_publicacion < ?
-        ''', (limit_date,))
+        ''', (to_epoch(limit_date),))
         self.conn.commit()
 
     def vacuum_database(self):
@@ -189,12 +720,35 @@ class NewsDatabase(NewsCoreDatabase):
 
 
     def bulk_insert_palabra_clave_articulos(self, lista_palabra_url):
+        """
+        lista_palabra_url: pares (url, palabra_id).
+        Retorna el número de relaciones palabra clave - artículo nuevas (sin las de articulo_categoria)
+        """
+        url_ids = self.require_url_ids(url for url, _ in lista_palabra_url)
         cursor = self.conn.cursor()
         cursor.executemany(
-            'INSERT OR IGNORE INTO palabra_clave_articulos (url, palabra_id) VALUES (?, ?)',
-            lista_palabra_url
+            'INSERT OR IGNORE INTO palabra_clave_articulos (url_id, palabra_id) VALUES (?, ?)',
+            [(url_ids[url], palabra_id) for url, palabra_id in lista_palabra_url]
         )
+        insertadas = cursor.rowcount
+        self._insert_articulo_categoria(cursor, set(url_ids.values()))
         self.conn.commit()
+        return insertadas
+
+    def _insert_articulo_categoria(self, cursor, url_ids):
+        """ Añade a articulo_categoria las categorías de las palabras clave de los artículos """
+        url_ids = list(url_ids)
+        batch_size = 500
+        for i in range(0, len(url_ids), batch_size):
+            batch = url_ids[i:i + batch_size]
+            cursor.execute(f'''
+                INSERT OR IGNORE INTO articulo_categoria (url_id, categoria_id, fecha)
+                SELECT DISTINCT pca.url_id, pcc.categoria_id, a.fecha_publicacion
+                FROM palabra_clave_articulos pca
+                JOIN palabras_clave_categoria pcc ON pcc.palabra_id = pca.palabra_id
+                JOIN articulos a ON a.url_id = pca.url_id
+                WHERE pca.url_id IN ({','.join('?' for _ in batch)})
+            ''', batch)
 
 
     def get_category(self, categoria):
@@ -340,13 +894,26 @@ class NewsDatabase(NewsCoreDatabase):
         return [stem_to_id.get(stem) for stem in stems]
 
 
+    def get_rules_version(self):
+        """
+        Versión actual del conjunto de reglas (se incrementa con cada cambio en reglas o palabras clave)
+        """
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute('SELECT version FROM rules_version WHERE id = 1')
+        except sqlite3.OperationalError:
+            return 0
+        row = cursor.fetchone()
+        return row[0] if row else 0
+
+
     def obtener_reglas_con_palabras_clave(self):
         """
         Obtener todas las reglas de la base de datos
         """
         cursor = self.conn.cursor()
         query = '''
-            SELECT r.regla_id, r.descripcion, rpc.posicion, pc.palabra, rpc.operador
+            SELECT r.regla_id, r.descripcion, rpc.posicion, pc.palabra, rpc.operador, pc.palabra_id
             FROM reglas r
             JOIN regla_palabras_clave rpc ON r.regla_id = rpc.regla_id
             JOIN palabras_clave pc ON rpc.palabra_id = pc.palabra_id
@@ -360,11 +927,12 @@ class NewsDatabase(NewsCoreDatabase):
     def insert_article_individual(self, article):
         """Inserta artículo individual"""
         try:
+            url_id = self.require_url_ids([article['url']])[article['url']]
             cursor = self.conn.cursor()
             cursor.execute('''
-                INSERT OR IGNORE INTO articulos (url, fuente, titulo, fecha_publicacion)
+                INSERT OR IGNORE INTO articulos (url_id, fuente, titulo, fecha_publicacion)
                 VALUES (?, ?, ?, ?)
-            ''', (article['url'], article['fuente'], article['titulo'], article['fecha_publicacion']))
+            ''', (url_id, article['fuente'], article['titulo'], to_epoch(article['fecha_publicacion'])))
             self.conn.commit()
             return True
         except sqlite3.IntegrityError as e:
@@ -386,5 +954,5 @@ class NewsDatabase(NewsCoreDatabase):
      
     def exists_url_explorada(self, url):
         cursor = self.conn.cursor()
-        cursor.execute('SELECT 1 FROM urls_exploradas WHERE url = ?', (url,))
+        cursor.execute('SELECT 1 FROM urls_exploradas WHERE url_hash = ? AND url = ?', (url_hash(url), url))
         return cursor.fetchone() is not None
\ No newline at end of file
@@ -0,0 +1,57 @@
+"""
+Normalización de texto compartida por el pipeline de filtrado, la base de datos y la interfaz.
+El stemming de Snowball se memoriza en una caché LRU acotada: el vocabulario de las noticias
+sigue una distribución de Zipf y la mayoría de las llamadas repiten palabras ya vistas.
+"""
+import re
+import unicodedata
+from functools import lru_cache
+import nltk
+from nltk.stem.snowball import SnowballStemmer
+
+STEM_CACHE_SIZE = 200_000
+
+PUNCTUATION_RE = re.compile(r'[^\w\s]')
+WHITESPACE_RE = re.compile(r'\s+')
+
+_stemmer = SnowballStemmer('spanish')
+
+
+@lru_cache(maxsize=STEM_CACHE_SIZE)
+def stem(palabra):
+    """SnowballStemmer español con caché"""
+    return _stemmer.stem(palabra)
+
+
+@lru_cache(maxsize=None)
+def get_spanish_stopwords():
+    nltk.download('stopwords', quiet=True)
+    return frozenset(nltk.corpus.stopwords.words('spanish'))
+
+
+def strip_accents(texto):
+    """
+    Elimina acentos y caracteres no ASCII (NFKD + ASCII).
+    La mayoría de tokens ya son ASCII y no pasan por unicodedata.
+    """
+    if texto.isascii():
+        return texto
+    return unicodedata.normalize('NFKD', texto).encode('ASCII', 'ignore').decode('utf-8')
+
+
+def normalize_text(texto, stopwords, eliminar_puntuacion=True):
+    """
+    Minúsculas, sin acentos ni puntuación, sin stopwords y con stemming.
+    Retorna los stems separados por un espacio.
+    """
+    if not isinstance(texto, str):
+        return ''
+    texto = strip_accents(texto.lower())
+    if eliminar_puntuacion:
+        texto = PUNCTUATION_RE.sub(' ', texto)
+    palabras = WHITESPACE_RE.sub(' ', texto).strip().split()
+    return ' '.join([stem(palabra) for palabra in palabras if palabra not in stopwords])
+
+
+def stem_cache_info():
+    return stem.cache_info()
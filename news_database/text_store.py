@@ -0,0 +1,78 @@
+"""
+Compresión del texto de los artículos (tabla textos_articulos) con zlib y un diccionario
+predefinido (zdict) entrenado con texto de noticias.
+
+Los artículos son cortos (unos pocos KB) y zlib comprime cada uno por separado: sin diccionario
+apenas encuentra repeticiones dentro del propio texto. El diccionario aporta las palabras y
+expresiones frecuentes del corpus ("de la", "según ha informado", "Universidad de Oviedo"...)
+para que desde el primer byte puedan codificarse como referencias.
+"""
+import heapq
+import re
+import zlib
+from collections import Counter
+
+# zlib solo puede referenciar los últimos 32 KB, el diccionario no debe ser mayor
+TEXT_DICT_SIZE = 32 * 1024
+# Artículos guardados necesarios para entrenar el primer diccionario y tamaño de la muestra
+TEXT_DICT_MIN_SAMPLES = 200
+TEXT_DICT_SAMPLES = 2000
+COMPRESSION_LEVEL = 9
+
+WORD_RE = re.compile(r'\w+|[^\w\s]+')
+MAX_NGRAM = 5
+MAX_CANDIDATES = 20000
+
+
+def train_dictionary(textos, size=TEXT_DICT_SIZE):
+    """
+    Construye un diccionario para zlib a partir de una muestra de textos.
+    zlib no tiene entrenador propio: se seleccionan los n-gramas de palabras (1 a MAX_NGRAM)
+    que más bytes ahorrarían (frecuencia x longitud), sin repetir los ya contenidos en otro
+    más largo, y se concatenan dejando los más frecuentes al final, donde las referencias
+    son más cortas.
+    """
+    ngramas = Counter()
+    for texto in textos:
+        # Posiciones de cada token para extraer los n-gramas tal y como aparecen en el texto
+        spans = [match.span() for match in WORD_RE.finditer(texto)]
+        for n in range(1, MAX_NGRAM + 1):
+            for i in range(len(spans) - n + 1):
+                ngramas[texto[spans[i][0]:spans[i + n - 1][1]]] += 1
+
+    candidatos = heapq.nlargest(
+        MAX_CANDIDATES,
+        ((frecuencia * len(ngrama.encode('utf-8')), ngrama) for ngrama, frecuencia in ngramas.items()
+         if frecuencia > 1 and len(ngrama) > 3)
+    )
+
+    seleccionados = []
+    contenido = ''
+    total = 0
+    for _, ngrama in candidatos:
+        longitud = len(ngrama.encode('utf-8')) + 1
+        if total + longitud > size or ngrama in contenido:
+            continue
+        seleccionados.append(ngrama)
+        contenido += ngrama + '\n'
+        total += longitud
+        if total >= size - 4:
+            break
+
+    return ' '.join(reversed(seleccionados)).encode('utf-8')[:size]
+
+
+def compress_text(texto, zdict=None):
+    if zdict:
+        compressor = zlib.compressobj(COMPRESSION_LEVEL, zdict=zdict)
+    else:
+        compressor = zlib.compressobj(COMPRESSION_LEVEL)
+    return compressor.compress(texto.encode('utf-8')) + compressor.flush()
+
+
+def decompress_text(blob, zdict=None):
+    if zdict:
+        decompressor = zlib.decompressobj(zdict=zdict)
+    else:
+        decompressor = zlib.decompressobj()
+    return (decompressor.decompress(blob) + decompressor.flush()).decode('utf-8')
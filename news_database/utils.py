@@ -1,4 +1,7 @@
 from urllib.parse import urljoin, urlparse
+from datetime import datetime, date, time, timezone
+import hashlib
+import re
 
 def get_base_url(url):
     parsed_url = urlparse(url)
@@ -21,4 +24,57 @@ def split_rule_text(rule):
         operator = 'o'
     else:
         partes = [rule]
-    return partes, operator
\ No newline at end of file
+    return partes, operator
+
+
+def url_hash(url):
+    """Hash de 64 bits (con signo, compatible con INTEGER de SQLite) de una url"""
+    digest = hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+def to_epoch(fecha):
+    """
+    Segundos UTC (entero) con los que se guarda la fecha de publicación de un artículo.
+    Acepta datetime, date, cadenas ISO-8601 o segundos; sin zona horaria se interpreta en UTC.
+    Retorna None si la fecha no es válida
+    """
+    if fecha is None:
+        return None
+    if isinstance(fecha, (int, float)):
+        return int(fecha)
+    if isinstance(fecha, str):
+        try:
+            fecha = datetime.fromisoformat(fecha.strip())
+        except ValueError:
+            return None
+    elif not isinstance(fecha, datetime):
+        if not isinstance(fecha, date):
+            return None
+        fecha = datetime.combine(fecha, time.min)
+    if fecha.tzinfo is None:
+        fecha = fecha.replace(tzinfo=timezone.utc)
+    return int(fecha.timestamp())
+
+
+# Frases entre comillas o palabras sueltas de una búsqueda escrita por el usuario
+FULLTEXT_TERM_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+def fulltext_query(texto, any_term=False, stopwords=frozenset()):
+    """
+    Expresión FTS5 de una búsqueda escrita por el usuario: deben aparecer todas las palabras y frases
+    entre comillas (con any_term, alguna de ellas), y una palabra terminada en * busca por prefijo. Cada término
+    va entrecomillado para que los operadores y signos de FTS5 (AND, OR, NOT, -, :, ^...) se busquen como texto.
+    Las palabras sueltas en stopwords (en minúsculas) se omiten. Retorna None si no hay ningún término
+    """
+    terminos = []
+    for frase, palabra in FULLTEXT_TERM_RE.findall(texto or ''):
+        termino = frase or palabra.rstrip('*')
+        # Solo signos de puntuación: el tokenizador no obtiene ningún término de ellos
+        if not re.search(r'\w', termino):
+            continue
+        if not frase and re.sub(r'[^\w]', '', termino).lower() in stopwords:
+            continue
+        prefijo = ' *' if not frase and palabra.endswith('*') else ''
+        terminos.append('"{}"{}'.format(termino.replace('"', '""'), prefijo))
+    return (' OR ' if any_term else ' ').join(terminos) or None
@@ -2,6 +2,8 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime,date, timedelta
 from news_database.utils import get_domain, split_rule_text
+from news_database.normalization import stem, get_spanish_stopwords, PUNCTUATION_RE
+from news_scraper.utils.rule_backfill import run_rule_backfill
 from urllib.parse import urlparse, urlunparse
 from thefuzz import fuzz
 import subprocess
@@ -10,27 +12,31 @@ import time
 import os
 from datetime import datetime
 from datetime import time as dt_time
+from zoneinfo import ZoneInfo
 import queue
 import urllib.parse
 import re
 # Cargar modelo de spaCy para español
 from unidecode import unidecode
-from nltk.stem.snowball import SnowballStemmer
 #import spacy
 import nltk
 nltk.download('stopwords', quiet=True)
 
-# Inicializar
-stemmer = SnowballStemmer("spanish")
-stop_words = set(nltk.corpus.stopwords.words('spanish'))
+# Inicializar (stemming con caché compartido con el pipeline y la base de datos)
+stop_words = get_spanish_stopwords()
+WORD_3_RE = re.compile(r'\b[a-z]{3,}\b')
 
 #nlp_fast = spacy.load("es_core_news_sm")
 #nlp_fast.disable_pipes("ner", "parser")
 
 APP_URL = "http://156.35.163.135:80"#"https://localhost:8508"
+# Zona horaria en la que se muestran y filtran las fechas de publicación (guardadas en segundos UTC)
+MADRID_TZ = ZoneInfo('Europe/Madrid')
 
 #-------- Scrapy tab ---------
 LOG_FILE = "news_scraper/output.log"
+# Punto de control de Scrapy (JOBDIR en news_scraper/settings.py)
+CRAWL_JOBDIR = "crawls/news_extractor"
 output_queue = queue.Queue()
 
 def run_scrapy_and_log(q):
@@ -70,6 +76,8 @@ def scrapy_tab():
             pass
 
     else:
+        if os.path.isdir(CRAWL_JOBDIR):
+            st.info("La última extracción no terminó: se reanudará desde donde se detuvo.")
         if st.button("Iniciar extracción de artículos"):
             st.session_state.scrapy_running = True
             st.session_state.elapsed_time = None
@@ -89,6 +97,50 @@ def scrapy_tab():
         st.success(f"Extracción finalizada en: {str(st.session_state.elapsed_time).split('.')[0]} (HH:MM:SS)")
 
 
+#-------- Aplicar reglas a artículos guardados ---------
+# Estado del proceso en segundo plano, compartido entre ejecuciones del script de Streamlit
+backfill_state = {'running': False, 'fase': None, 'hechos': 0, 'total': 0, 'resumen': None, 'error': None}
+
+def run_backfill(db_path):
+    def progress(fase, hechos, total):
+        backfill_state.update(fase=fase, hechos=hechos, total=total)
+    try:
+        backfill_state['resumen'] = run_rule_backfill(db_path, progress=progress)
+    except Exception as e:
+        backfill_state['error'] = str(e)
+    finally:
+        backfill_state['running'] = False
+
+def start_backfill(news_db):
+    if backfill_state['running']:
+        return
+    backfill_state.update(running=True, fase=None, hechos=0, total=0, resumen=None, error=None)
+    threading.Thread(target=run_backfill, args=(news_db.db_path,), daemon=True).start()
+
+def backfill_status(news_db):
+    st.markdown("### Aplicar reglas a artículos guardados")
+
+    if backfill_state['running']:
+        fase = {'indexando': 'Indexando textos nuevos', 'evaluando': 'Evaluando artículos candidatos'}.get(
+            backfill_state['fase'], 'Preparando')
+        total = backfill_state['total']
+        st.progress(backfill_state['hechos'] / total if total else 0.0,
+                    text=f"{fase}: {backfill_state['hechos']}/{total}")
+        time.sleep(1)
+        st.rerun()
+
+    if backfill_state['error']:
+        st.error(f"Error al aplicar reglas: {backfill_state['error']}")
+    elif backfill_state['resumen']:
+        resumen = backfill_state['resumen']
+        st.success(f"{resumen['reglas']} reglas nuevas o modificadas aplicadas a {resumen['candidatos']} artículos "
+                   f"candidatos: {resumen['enlaces']} asociaciones nuevas ({resumen['segundos']:.1f} s)")
+
+    if st.button("Aplicar reglas nuevas a artículos guardados"):
+        start_backfill(news_db)
+        st.rerun()
+
+
 #-------- Agrupar titulos similares ---------
 def remove_url_fragment(url):
     parsed_url = urlparse(url)
@@ -140,11 +192,11 @@ def preprocesar_titulos(titulos_list):
     for title in titulos_list:
         # Limpieza básica
         title = unidecode(title.lower().strip()) # Normaliza caracteres
-        title = re.sub(r'[^\w\s]', ' ', title)   # Elimina puntuacion 
-        words = re.findall(r'\b[a-z]{3,}\b', title) # Extrae palabras >= 3
+        title = PUNCTUATION_RE.sub(' ', title)   # Elimina puntuacion 
+        words = WORD_3_RE.findall(title) # Extrae palabras >= 3
         
         # Stemming
-        stemmed_words = [stemmer.stem(w) for w in words if w not in stop_words]
+        stemmed_words = [stem(w) for w in words if w not in stop_words]
         titulos_norm_list.append(' '.join(stemmed_words))
     
     return titulos_norm_list
@@ -179,10 +231,10 @@ def agrupar_similares(articulos, umbral=70):
 def mostrar_articulos_con_grupos(articulos, umbral=80):
     articulos = pd.DataFrame(articulos, columns=['Titulo', 'URL', 'Fuente', 'Fecha de Publicación'])
 
-    # Convertir a tipo datetime usando UTC para tener un formato estandarizado
-    articulos['Fecha de Publicación'] = pd.to_datetime(articulos['Fecha de Publicación'], format='mixed', errors='coerce', utc=True)
+    # Segundos UTC a datetime en una sola operación vectorizada (sin interpretar cada cadena)
+    articulos['Fecha de Publicación'] = pd.to_datetime(articulos['Fecha de Publicación'], unit='s', utc=True)
     # Convertir a zona horaria de españa
-    articulos['Fecha de Publicación'] = articulos['Fecha de Publicación'].dt.tz_convert('Europe/Madrid')
+    articulos['Fecha de Publicación'] = articulos['Fecha de Publicación'].dt.tz_convert(MADRID_TZ)
     articulos['Fecha de Publicación'] = articulos['Fecha de Publicación'].dt.strftime('%Y-%m-%d')
 
     grupos = agrupar_similares(articulos, umbral)
@@ -345,10 +397,9 @@ def search_articles_filter(news_db):
         start_date = st.date_input('Fecha de inicio', value=default_start_date)
     with col2:
         end_date = st.date_input('Fecha de fin', value=default_end_date)
-    start_datetime = datetime.combine(start_date, dt_time.min)
-    end_datetime = datetime.combine(end_date, dt_time.min) + timedelta(days=1)
-    start_iso = start_datetime.strftime('%Y-%m-%d %H:%M:%S') if start_datetime else None
-    end_iso = end_datetime.strftime('%Y-%m-%d %H:%M:%S') if end_datetime else None
+    # Días completos en la hora de España (fetch_articles los compara en segundos UTC)
+    start_datetime = datetime.combine(start_date, dt_time.min, tzinfo=MADRID_TZ)
+    end_datetime = datetime.combine(end_date, dt_time.min, tzinfo=MADRID_TZ) + timedelta(days=1)
 
     # --- Actualizar parámetros de la URL (igual que antes) ---
     current_params = {}
@@ -356,13 +407,19 @@ def search_articles_filter(news_db):
         current_params["categories"] = selected_categories
     if selected_keywords and ALL_OPTION not in selected_keywords:
         current_params["keywords"] = selected_keywords
-    if start_iso:
+    if start_datetime:
         current_params["start_date"] = start_date
-    if end_iso:
+    if end_datetime:
         current_params["end_date"] = end_date
     current_params["radio_key"] = mode_key
     current_params["radio_cat"] = mode_cat
 
+    filtros = {
+        'categories': selected_categories if ALL_OPTION not in selected_categories else None,
+        'keywords': selected_keywords if ALL_OPTION not in selected_keywords else None,
+        'start_date': start_datetime,
+        'end_date': end_datetime,
+    }
     if st.button('Mostrar Noticias'):
         if not selected_categories:
             st.warning("Por favor seleccione una categoria.")
@@ -372,19 +429,38 @@ def search_articles_filter(news_db):
             if current_params != dict(st.query_params):
                 st.query_params.clear()
                 st.query_params.update(current_params)
-            articles = news_db.fetch_articles(
-                categories=selected_categories if ALL_OPTION not in selected_categories else None,
-                keywords=selected_keywords if ALL_OPTION not in selected_keywords else None,
-                start_date=start_iso,
-                end_date=end_iso
-            )
-            if articles:
-                mostrar_articulos_con_grupos(articles)
-            else:
-                st.write('No se encontraron noticias relacionadas.')
+            st.session_state.resultados_filtro = buscar_primera_pagina(news_db, filtros)
+
+    # Los resultados se conservan entre ejecuciones del script (p. ej. al cargar más) mientras no cambien los filtros
+    resultados = st.session_state.get('resultados_filtro')
+    if resultados and resultados['filtros'] == filtros:
+        mostrar_resultados_filtro(news_db, resultados)
     share_url(current_params)
 
 
+def buscar_primera_pagina(news_db, filtros):
+    """ Primera página de artículos y número total estimado (hasta COUNT_LIMIT) """
+    articulos, cursor = news_db.fetch_articles_page(**filtros)
+    total, exacto = news_db.count_articles(**filtros) if cursor else (len(articulos), True)
+    return {'filtros': filtros, 'articulos': articulos, 'cursor': cursor, 'total': total, 'exacto': exacto}
+
+
+def mostrar_resultados_filtro(news_db, resultados):
+    articulos = resultados['articulos']
+    if not articulos:
+        st.write('No se encontraron noticias relacionadas.')
+        return
+
+    total = f"{resultados['total']:,}".replace(',', '.')
+    st.caption(f"Mostrando {len(articulos)} de {total if resultados['exacto'] else 'más de ' + total} noticias")
+    mostrar_articulos_con_grupos(articulos)
+
+    if resultados['cursor'] and st.button('Cargar más noticias'):
+        pagina, resultados['cursor'] = news_db.fetch_articles_page(**resultados['filtros'], after=resultados['cursor'])
+        resultados['articulos'] = articulos + pagina
+        st.rerun()
+
+
 def show_search_results(results):
     articles_list = []
     for metadata in results:
@@ -580,6 +656,9 @@ def manage_keywords(news_db):
                     news_db.associate_rule_keywords(regla, keyword_pairs)
                     #st.success(f"Regla '{regla}' agregada con {len(palabras_clave_regla)} palabras clave.")
 
+                    # Aplicar la nueva regla a los artículos ya guardados en segundo plano
+                    start_backfill(news_db)
+
                     time.sleep(2)
                     st.rerun()
                 except ValueError as ve:
@@ -589,6 +668,9 @@ def manage_keywords(news_db):
                 except Exception as e:
                     st.error(f"Error al agregar palabra clave: {e}")
 
+        st.markdown("---")
+        backfill_status(news_db)
+
     elif action == "Asociar a categorías":
         st.markdown("### Asociar palabra clave a categorías")
         if not all_keywords:
@@ -12,3 +12,10 @@ SITEMAP_NAMESPACES = {
     'ns': 'http://www.sitemaps.org/schemas/sitemap/0.9',  # Namespace por defecto
     'news': 'http://www.google.com/schemas/sitemap-news/0.9'  # Namespace de Google News
 }
+
+# Meta para peticiones condicionales (If-None-Match / If-Modified-Since) de robots.txt y sitemaps.
+# La respuesta 304 se entrega al callback en lugar de tratarse como error.
+CONDITIONAL_GET_META = {
+    'conditional_get': True,
+    'handle_httpstatus_list': [304],
+}
@@ -101,10 +101,12 @@ class TutorialDownloaderMiddleware:
 
 
 import random
+import time
+from twisted.internet import reactor
 from scrapy import signals
 from scrapy.downloadermiddlewares.retry import RetryMiddleware
 from scrapy.utils.response import response_status_message
-from scrapy.exceptions import NotConfigured
+from scrapy.exceptions import NotConfigured, IgnoreRequest, DontCloseSpider
 from scrapy.utils.python import global_object_name
 
 class RandomUserAgentMiddleware:
@@ -130,3 +132,225 @@ class RandomUserAgentMiddleware:
         if user_agent:
             request.headers['User-Agent'] = user_agent
             spider.logger.debug(f"Assigned User-Agent: {user_agent} to {request.url}")
+
+
+class ConditionalGetMiddleware:
+    """
+    Envía If-None-Match / If-Modified-Since en las peticiones marcadas con meta['conditional_get']
+    usando los validadores guardados en la base de datos de noticias (tabla cache_http).
+    Los validadores de cada respuesta 200 se dejan en meta['http_validators']: la araña los guarda
+    cuando termina de procesar la respuesta (save_http_validators), de modo que un 304 posterior
+    solo omite contenido ya procesado.
+    """
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool('CONDITIONAL_GET_ENABLED', True):
+            raise NotConfigured("CONDITIONAL_GET_ENABLED is disabled.")
+        return cls()
+
+    def process_request(self, request, spider):
+        if not request.meta.get('conditional_get') or not hasattr(spider, 'news_db'):
+            return None
+
+        validators = spider.news_db.get_http_validators(request.url)
+        if validators:
+            etag, last_modified, _, fecha_inicio = validators
+            # Validadores de una ejecución con fecha de inicio posterior (o desconocida): lo que entonces
+            # se descartó por antiguo se debe procesar ahora
+            from_date = getattr(spider, 'from_date', None)
+            if from_date and (fecha_inicio is None or from_date.isoformat() < fecha_inicio):
+                return None
+            if etag:
+                request.headers.setdefault('If-None-Match', etag)
+            if last_modified:
+                request.headers.setdefault('If-Modified-Since', last_modified)
+        return None
+
+    def process_response(self, request, response, spider):
+        if not request.meta.get('conditional_get') or not hasattr(spider, 'news_db'):
+            return response
+
+        if response.status == 304:
+            spider.logger.debug(f"Sin cambios desde la última ejecución (304): {request.url}")
+            spider.crawler.stats.inc_value('conditional_get/not_modified')
+        elif response.status == 200:
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            if etag or last_modified:
+                request.meta['http_validators'] = (
+                    request.url,
+                    etag.decode('latin-1') if etag else None,
+                    last_modified.decode('latin-1') if last_modified else None,
+                )
+        return response
+
+
+class SourceBackoff(IgnoreRequest):
+    """Petición aplazada por AdaptiveThrottleMiddleware: se reprograma al terminar la espera de su fuente"""
+
+
+class _SourceThrottleState:
+    """Estadísticas de descarga de una fuente (slot de descarga)"""
+
+    def __init__(self, concurrency, delay):
+        self.concurrency = concurrency
+        self.delay = delay
+        self.latency = None             # media móvil exponencial de la latencia (s)
+        self.error_rate = 0.0           # media móvil exponencial de errores
+        self.throttled = 0              # respuestas 429/403/503 recibidas
+        self.consecutive_failures = 0
+        self.backoff_until = 0.0
+        self.backoffs = 0
+
+
+class AdaptiveThrottleMiddleware:
+    """
+    Ajusta la concurrencia y el retraso de cada slot de descarga (un slot por dominio)
+    según la latencia, la tasa de errores y las respuestas 429/403/503 de la fuente.
+    - Fuentes rápidas y estables: aumenta la concurrencia de uno en uno y reduce el retraso.
+    - Fuentes lentas: reduce la concurrencia y ajusta el retraso a la latencia.
+    - 429/403/503: divide la concurrencia a la mitad y duplica el retraso (o usa Retry-After).
+    - Tras varios fallos consecutivos la fuente queda en espera: sus peticiones salen del
+      descargador (SourceBackoff) para que no ocupen la concurrencia global de las demás y
+      se reprograman (engine.crawl) al terminar la espera.
+    """
+    THROTTLE_STATUS = (403, 429, 503)
+    EWMA_ALPHA = 0.3
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        self.crawler = crawler
+        self.target_latency = settings.getfloat('ADAPTIVE_THROTTLE_TARGET_LATENCY', 2.0)
+        self.min_delay = settings.getfloat('DOWNLOAD_DELAY', 0.0)
+        self.max_delay = settings.getfloat('ADAPTIVE_THROTTLE_MAX_DELAY', 30.0)
+        self.start_concurrency = settings.getint('ADAPTIVE_THROTTLE_START_CONCURRENCY', 2)
+        self.max_concurrency = settings.getint('CONCURRENT_REQUESTS_PER_DOMAIN', 8)
+        self.backoff = settings.getfloat('ADAPTIVE_THROTTLE_BACKOFF', 60.0)
+        self.max_backoff = settings.getfloat('ADAPTIVE_THROTTLE_MAX_BACKOFF', 900.0)
+        self.failure_threshold = settings.getint('ADAPTIVE_THROTTLE_FAILURE_THRESHOLD', 5)
+        self.sources = {}
+        # Llamadas (reactor.callLater) que reprograman las peticiones aplazadas
+        self.delayed_calls = set()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool('ADAPTIVE_THROTTLE_ENABLED', True):
+            raise NotConfigured("ADAPTIVE_THROTTLE_ENABLED is disabled.")
+        s = cls(crawler)
+        crawler.signals.connect(s.spider_idle, signal=signals.spider_idle)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+    def _get_state(self, key):
+        state = self.sources.get(key)
+        if state is None:
+            state = _SourceThrottleState(self.start_concurrency, self.min_delay)
+            self.sources[key] = state
+        return state
+
+    def _apply(self, key, state):
+        # Los slots se eliminan cuando están inactivos; se reaplica el estado al recrearse
+        slot = self.crawler.engine.downloader.slots.get(key)
+        if slot is not None:
+            slot.concurrency = state.concurrency
+            slot.delay = state.delay
+
+    def _clamp_delay(self, delay):
+        return min(max(self.min_delay, delay), self.max_delay)
+
+    def process_request(self, request, spider):
+        key = self.crawler.engine.downloader.get_slot_key(request)
+        state = self._get_state(key)
+        wait = state.backoff_until - time.time()
+        if wait > 0:
+            # dont_filter: el filtro de duplicados ya vio la petición original
+            self.crawler.stats.inc_value('adaptive_throttle/delayed')
+            call = reactor.callLater(wait, self._reschedule, request.replace(dont_filter=True))
+            self.delayed_calls.add(call)
+            raise SourceBackoff(f"Fuente en espera por fallos consecutivos: {key}")
+        self._apply(key, state)
+        return None
+
+    def _reschedule(self, request):
+        self.delayed_calls = {call for call in self.delayed_calls if call.active()}
+        self.crawler.engine.crawl(request)
+
+    def process_response(self, request, response, spider):
+        key = request.meta.get('download_slot')
+        if key is None:
+            return response
+        state = self._get_state(key)
+
+        latency = request.meta.get('download_latency')
+        if latency is not None:
+            state.latency = latency if state.latency is None else \
+                self.EWMA_ALPHA * latency + (1 - self.EWMA_ALPHA) * state.latency
+
+        if response.status in self.THROTTLE_STATUS:
+            state.throttled += 1
+            self._register_failure(key, state)
+            state.concurrency = max(1, state.concurrency // 2)
+            retry_after = self._retry_after(response)
+            state.delay = self._clamp_delay(max(state.delay * 2, retry_after, 1.0))
+            self.crawler.stats.inc_value('adaptive_throttle/slowdowns')
+        elif response.status >= 500:
+            self._register_failure(key, state)
+            state.delay = self._clamp_delay(max(state.delay * 1.5, 0.5))
+        else:
+            state.consecutive_failures = 0
+            state.error_rate = (1 - self.EWMA_ALPHA) * state.error_rate
+            if state.latency is not None and state.latency > self.target_latency:
+                # Fuente lenta: menos peticiones en paralelo y retraso proporcional a la latencia
+                state.concurrency = max(1, state.concurrency - 1)
+                state.delay = self._clamp_delay(state.latency / state.concurrency)
+            elif state.error_rate < 0.1:
+                state.concurrency = min(self.max_concurrency, state.concurrency + 1)
+                state.delay = self._clamp_delay(state.delay * 0.75)
+
+        self._apply(key, state)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        key = request.meta.get('download_slot')
+        if key is None or isinstance(exception, IgnoreRequest):
+            return None
+        state = self._get_state(key)
+        self._register_failure(key, state)
+        state.delay = self._clamp_delay(max(state.delay * 1.5, 0.5))
+        self._apply(key, state)
+        return None
+
+    def _register_failure(self, key, state):
+        state.consecutive_failures += 1
+        state.error_rate = self.EWMA_ALPHA + (1 - self.EWMA_ALPHA) * state.error_rate
+        if state.consecutive_failures >= self.failure_threshold:
+            backoff = min(self.backoff * 2 ** state.backoffs, self.max_backoff)
+            state.backoff_until = time.time() + backoff
+            state.backoffs += 1
+            state.consecutive_failures = 0
+            state.concurrency = 1
+            self.crawler.stats.inc_value('adaptive_throttle/backoffs')
+            print(f"Fuente {key} en espera {backoff:.0f}s tras {self.failure_threshold} fallos consecutivos")
+
+    def _retry_after(self, response):
+        value = response.headers.get('Retry-After')
+        try:
+            return float(value.decode('latin-1')) if value else 0.0
+        except ValueError:
+            return 0.0
+
+    def spider_idle(self, spider):
+        # Mantener abierta la araña mientras queden peticiones aplazadas por reprogramar
+        if any(call.active() for call in self.delayed_calls):
+            raise DontCloseSpider
+
+    def spider_closed(self, spider):
+        for call in self.delayed_calls:
+            if call.active():
+                call.cancel()
+        for key, state in sorted(self.sources.items(), key=lambda item: -item[1].throttled):
+            if state.throttled or state.backoffs:
+                latency = f"{state.latency:.2f}s" if state.latency is not None else "-"
+                print(f"{key}: latencia {latency}, errores {state.error_rate:.0%}, "
+                      f"429/403/503: {state.throttled}, esperas: {state.backoffs}")
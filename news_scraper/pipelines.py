@@ -13,18 +13,69 @@ class NewsScraperPipeline:
 
 # Pipeline para que la base de datos almacene información de los articulos encontrados
 import sqlite3
+from scrapy import signals
 import traceback
 import json
 import time
 import os
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from twisted.internet import defer, reactor, threads
+from twisted.python.threadpool import ThreadPool
+from news_database.news_db import NewsDatabase
+from news_database.normalization import normalize_text, get_spanish_stopwords, stem_cache_info
+from news_scraper.utils.rule_matcher import RuleMatcher, build_rules
+from news_scraper.utils.rule_set import load_rule_set, save_rule_set, init_filter_worker, filter_article
+from news_search.embedding_generator import EmbeddingGenerator
+from news_search.chroma_engine import ChromaVectorEngine
+from news_search.fulltext_engine import MADRID_TZ
+from news_search.search_manager import SearchManager
+from news_database.text_store import train_dictionary, TEXT_DICT_MIN_SAMPLES
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+def deferred_from_future(future):
+    """ Deferred que se resuelve en el reactor cuando termina un concurrent.futures.Future """
+    d = defer.Deferred()
+
+    def _done(f):
+        error = f.exception()
+        if error is not None:
+            reactor.callFromThread(d.errback, error)
+        else:
+            reactor.callFromThread(d.callback, f.result())
+
+    future.add_done_callback(_done)
+    return d
+
 
 class SQLitePipeline:
-    def __init__(self):
+    def __init__(self, stats=None):
         self.buffer = []
         self.batch_size = 10
+        # Urls de artículos descartados por los filtros, pendientes de marcar como completadas
+        self.dropped_urls = []
+        self.stats = stats
+        # Primer diccionario del almacén de textos: se entrena en segundo plano, fuera del escritor
+        self.texts_without_dictionary = None
+        self.dictionary_training = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        pipeline = cls(stats=crawler.stats)
+        crawler.signals.connect(pipeline.item_dropped, signal=signals.item_dropped)
+        return pipeline
 
     def open_spider(self, spider):
-        self.db = spider.news_db
+        # Las escrituras se encolan en el hilo escritor del spider (news_database.db_writer)
+        self.writer = spider.db_writer
+        self.db_path = spider.db_path
+        if spider.news_db.get_current_text_dictionary_id() is None:
+            self.texts_without_dictionary = spider.news_db.get_text_store_stats()[0]
 
     def process_item(self, item, spider):
         self.buffer.append(item)
@@ -32,57 +83,131 @@ class SQLitePipeline:
             self._flush_buffer()
         return item
 
+    def item_dropped(self, item, response, exception, spider):
+        url = item.get('url') if item else None
+        if url:
+            self.dropped_urls.append(url)
+        if len(self.dropped_urls) >= self.batch_size:
+            self._flush_dropped_urls()
+
     def close_spider(self, spider):
         self._flush_buffer()
-
-    def _get_list_url_keyword_id(self):
+        self._flush_dropped_urls()
+        # Esperar (sin bloquear el reactor) al entrenamiento en curso y a que el escritor confirme todo lo encolado
+        d = self.dictionary_training or defer.succeed(None)
+        d.addCallback(lambda _: deferred_from_future(self.writer.flush()))
+        d.addCallback(lambda _: self._print_text_store_stats())
+        return d
+
+    def _print_text_store_stats(self):
+        articulos = self.stats.get_value('text_store/articles', 0) if self.stats else 0
+        if articulos:
+            raw_bytes = self.stats.get_value('text_store/raw_bytes', 0)
+            compressed_bytes = self.stats.get_value('text_store/compressed_bytes', 0)
+            print(f"Textos guardados: {articulos} artículos, {compressed_bytes / articulos:.0f} bytes/artículo "
+                  f"comprimidos ({raw_bytes / articulos:.0f} sin comprimir, ratio {raw_bytes / max(compressed_bytes, 1):.2f})")
+
+    def _flush_dropped_urls(self):
+        if self.dropped_urls:
+            self.writer.enqueue('mark_crawled_urls_completed', self.dropped_urls)
+            self.dropped_urls = []
+
+    def _get_list_url_keyword_id(self, batch):
         lista_palabra_url = []
-        for articulo in self.buffer:
+        for articulo in batch:
             lista_palabra_url.extend( [(articulo['url'], keyword_id) for keyword_id in articulo['keyword-ids']])
         return lista_palabra_url
 
 
     def _flush_buffer(self):
-
         if self.buffer:
+            batch = self.buffer
+            self.buffer = []
+            # Las estadísticas se actualizan en el reactor con el resultado del lote, una vez confirmado
+            d = deferred_from_future(self.writer.enqueue_call(self._write_batch, batch))
+            d.addCallbacks(self._update_text_store_stats, self._handle_write_error)
+
+    def _update_text_store_stats(self, resultado):
+        articulos, raw_bytes, compressed_bytes = resultado
+        if self.stats:
+            self.stats.inc_value('text_store/articles', articulos)
+            self.stats.inc_value('text_store/raw_bytes', raw_bytes)
+            self.stats.inc_value('text_store/compressed_bytes', compressed_bytes)
+        if self.texts_without_dictionary is not None:
+            self.texts_without_dictionary += articulos
+            if self.texts_without_dictionary >= TEXT_DICT_MIN_SAMPLES and self.dictionary_training is None:
+                self._start_dictionary_training()
+
+    def _start_dictionary_training(self):
+        """
+        Entrena el primer diccionario en un hilo aparte con su propia conexión de lectura;
+        en el escritor solo se encola la inserción del diccionario ya entrenado.
+        """
+        self.dictionary_training = threads.deferToThread(self._train_text_dictionary, self.db_path)
+        self.dictionary_training.addCallback(self._save_text_dictionary)
+        self.dictionary_training.addErrback(lambda failure: print(f"Error al entrenar el diccionario de textos: {failure.value}"))
+
+    @staticmethod
+    def _train_text_dictionary(db_path):
+        db = NewsDatabase(db_path)
+        try:
+            textos = db.sample_article_texts()
+        finally:
+            db.close_db()
+        return train_dictionary(textos), len(textos)
+
+    def _save_text_dictionary(self, resultado):
+        zdict, muestras = resultado
+        self.texts_without_dictionary = None
+        return deferred_from_future(self.writer.enqueue('insert_text_dictionary', zdict, muestras))
+
+    def _handle_write_error(self, failure):
+        # El hilo escritor ya informó del error y deshizo la operación
+        if self.stats:
+            self.stats.inc_value('text_store/batch_errors')
+
+    def _write_batch(self, db, batch):
+        """
+        Se ejecuta en el hilo escritor con su conexión (db).
+        Retorna (artículos, bytes sin comprimir, bytes comprimidos) de los textos guardados.
+        """
+        resultado = (0, 0, 0)
+        if batch:
             max_retries = 2
             retry_count = 0
             insertados = False
             while retry_count < max_retries:
                 try:
-                    print(f"Intento {retry_count + 1}/{max_retries}")
+                    logger.debug(f"Insertando {len(batch)} artículos y relaciones (intento {retry_count + 1}/{max_retries})")
 
-                    print("Intentando insertar artículos y relaciones...")
-
-                    # Mostrar los datos del buffer antes de insertar
-                    print(f"Buffer a insertar ({len(self.buffer)} elementos):")
-                    
                     if retry_count > 0:
                         # Insertar URLs primero en caso aún no se haya realizado
-                        urls = [item['url'] for item in self.buffer]
-                        self.db.bulk_insert_crawled_urls(urls)
+                        urls = [item['url'] for item in batch]
+                        db.bulk_insert_crawled_urls(urls)
 
                         # CRÍTICO: commit explícito después URLs
                         #self.db.conn.commit()
 
-                        # Verificar URLs existen (debug temporal)
-                        print("Se insertaron las URLs faltantes correctamente.")
+                        logger.debug("Se insertaron las URLs faltantes correctamente.")
 
                     # Intentar insertar los artículos
-                    self.db.bulk_insert_articles(self.buffer)
+                    db.bulk_insert_articles(batch)
 
                     # Intentar insertar las relaciones (palabra clave - artículo)
-                    lista_palabra_url = self._get_list_url_keyword_id()
-                    self.db.bulk_insert_palabra_clave_articulos(lista_palabra_url)
+                    lista_palabra_url = self._get_list_url_keyword_id(batch)
+                    db.bulk_insert_palabra_clave_articulos(lista_palabra_url)
+
+                    # Guardar el texto comprimido para poder reprocesar sin volver a descargar
+                    resultado = db.bulk_insert_article_texts(batch)
 
-                    print(f"Se insertaron {len(self.buffer)} elementos con éxito.")
+                    logger.debug(f"Se insertaron {len(batch)} elementos con éxito.")
                     insertados = True
                     break  # Éxito
 
                 except sqlite3.IntegrityError as e:
                     retry_count += 1
-                    print(f"Error en intento {retry_count}: {e}")
-                    self.db.conn.rollback()
+                    logger.warning(f"Error en intento {retry_count}/{max_retries} al insertar {len(batch)} artículos: {e}")
+                    db.conn.rollback()
 
                     # Delay para Scrapy threads
                     #import time
@@ -90,15 +215,15 @@ class SQLitePipeline:
 
                     if retry_count >= max_retries:
                         #print("MÁXIMO Intentos - Guardando debug")
-                        print("MÁXIMO Intentos - No se pudieron guardar todos los articulos")
-                        print(self.buffer)
+                        logger.warning(f"No se pudieron guardar los {len(batch)} artículos del lote tras {max_retries} intentos: "
+                                       f"{[item['url'] for item in batch]}")
                         #import json, time
                         #with open(f"failed_batch_{int(time.time())}.json", "w") as f:
                         #    json.dump(self.buffer, f, default=str, indent=2)
 
                 except Exception as e:
-                    print(f"Error inesperado: {e}")
-                    self.db.conn.rollback()
+                    logger.error(f"Error inesperado al insertar {len(batch)} artículos: {e}")
+                    db.conn.rollback()
                     break
 
                 #finally:
@@ -107,13 +232,12 @@ class SQLitePipeline:
                 #    #print("Buffer limpiado.")
             
             if insertados:
-                # Limpiar el buffer después de la inserción
-                self.buffer.clear()
-                print("Buffer limpiado.")
+                # Solo ahora las urls dejan de estar en proceso
+                db.mark_crawled_urls_completed([item['url'] for item in batch])
             else:
-                print("Fallback: Insertando artículos individuales...")
-                self._insert_individual()
-
+                logger.info("Fallback: insertando artículos individuales...")
+                resultado = self._insert_individual(db, batch)
+        return resultado
 
 
     def _get_list_url_keyword_id_subset(self, valid_items):
@@ -123,13 +247,14 @@ class SQLitePipeline:
             lista_palabra_url.extend([(item['url'], kid) for kid in item['keyword-ids']])
         return lista_palabra_url
         
-    def _insert_individual(self):
+    def _insert_individual(self, db, batch):
         """ Insertar de forma individual cada articulo para detectar errores"""
+        resultado = (0, 0, 0)
         successful_articles = []
         failed_articles = []
     
-        for item in self.buffer:
-            if self.db.insert_article_individual(item):
+        for item in batch:
+            if db.insert_article_individual(item):
                 successful_articles.append(item)
             else:
                 failed_articles.append(item)
@@ -137,16 +262,19 @@ class SQLitePipeline:
         # 3. Keywords solo para artículos exitosos
         if len(successful_articles) > 0:
             lista_palabra_url = self._get_list_url_keyword_id_subset(successful_articles)
-            self.db.bulk_insert_palabra_clave_articulos(lista_palabra_url)
+            db.bulk_insert_palabra_clave_articulos(lista_palabra_url)
+            resultado = db.bulk_insert_article_texts(successful_articles)
             
-        print(f"{len(successful_articles)} artículos OK | {len(failed_articles)} fallidos")
+        logger.info(f"{len(successful_articles)} artículos OK | {len(failed_articles)} fallidos")
         
         if failed_articles:
-            self._save_failed_batch(failed_articles)
-        
-        self.buffer.clear()
+            self._save_failed_batch(db, failed_articles)
+
+        # Los fallidos quedan registrados en failed_article_insertion y no se reintentan
+        db.mark_crawled_urls_completed([item['url'] for item in batch])
+        return resultado
 
-    def _save_failed_batch(self, failed_items):
+    def _save_failed_batch(self, db, failed_items):
         """Guarda batch fallido con timestamp"""
         # Crear carpeta failed_batches
         failed_dir = "failed_article_insertion"
@@ -167,7 +295,7 @@ class SQLitePipeline:
         
         # Solo datos básicos (sin datetime)
         for item in failed_items:
-            error_type = self._diagnose_item(item)
+            error_type = self._diagnose_item(db, item)
             debug_data['errors'].append({
                 'url': item['url'],
                 'fuente': item.get('fuente', 'N/A'),
@@ -179,22 +307,22 @@ class SQLitePipeline:
         with open(filename, 'w', encoding='utf-8') as f:
             json.dump(debug_data, f, indent=2, ensure_ascii=False)
         
-        print(f"Fallidos guardados: {filename} ({len(failed_items)} errores)")
+        logger.warning(f"Fallidos guardados: {filename} ({len(failed_items)} errores)")
 
 
-    def _diagnose_item(self, item):
+    def _diagnose_item(self, db, item):
         """Diagnostica por qué falló el item"""
 
         # 1. ¿Existe fuente?
         fuente = item.get('fuente')
         if fuente:
-            if not self.db.exists_fuente(fuente):
+            if not db.exists_fuente(fuente):
                 return f"FUENTE_NO_EXISTE: {fuente}"
         
         # 2. ¿Keywords inválidos?
         invalid_keywords = []
         for kid in item.get('keyword-ids', []):
-            if not self.db.exists_keyword_by_id(kid):
+            if not db.exists_keyword_by_id(kid):
                 invalid_keywords.append(kid)
         
         if invalid_keywords:
@@ -203,184 +331,149 @@ class SQLitePipeline:
             
         # 3. Urls no insertadas como exploradas
         url = item['url']
-        if not self.db.exists_url_explorada(url):
+        if not db.exists_url_explorada(url):
             return f"URL_NO_EN_EXPLORADAS: '{url[:50]}...'"
 
         return "DESCONOCIDO"
 
 
 ###############################################################################
-import re
-import unicodedata
-import nltk
-from nltk.corpus import stopwords
-from news_database.news_db import NewsDatabase
 import scrapy
 from scrapy.utils.project import get_project_settings
 
-nltk.download('stopwords', quiet=True)
-
 class FiltradoNoticiasPipeline:
-    PUNCTUATION_RE = re.compile(r'[^\w\s]')
 
-    def __init__(self):
+    def __init__(self, pool_size=0, rules_dir='news_database/reglas_compiladas', reload_interval=30, stats=None):
         settings = get_project_settings()
         db_path = settings.get('DATABASE_PATH')
         self.news_db = NewsDatabase(db_path)
 
-        # Usar NLTK stemmer de la base de datos para consistencia
-        self.stemmer = self.news_db.stemmer
+        # Stemming y normalización compartidos con la base de datos y la interfaz (news_database.normalization)
+        self.stopwords = get_spanish_stopwords()
+
+        # Pool de procesos para el filtrado (0 = en el hilo del reactor)
+        self.pool_size = pool_size
+        self.pool = None
+        self.pending = deque()
+        self.stats = stats
+
+        # Conjunto de reglas compilado (RuleMatcher) de la versión actual, desde disco si ya existe
+        self.rules_dir = rules_dir
+        self.reload_interval = reload_interval
+        self.rules_version = self.news_db.get_rules_version()
+        self.rule_matcher = self._cargar_rule_set(self.rules_version)
+        self.last_version_check = time.monotonic()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        return cls(
+            pool_size=settings.getint('FILTER_POOL_SIZE', 0),
+            rules_dir=settings.get('RULES_ARTIFACT_DIR', 'news_database/reglas_compiladas'),
+            reload_interval=settings.getfloat('RULES_RELOAD_INTERVAL', 30),
+            stats=crawler.stats,
+        )
 
-        self.stopwords = set(stopwords.words('spanish'))
-
-        # Cargar todas las reglas (AND, OR, simple) desde la tabla de uniones
-        self.parsed_rules = self._cargar_todas_las_reglas()
+    def open_spider(self, spider):
+        if self.pool_size > 0:
+            # spawn: los procesos no heredan el estado del reactor ni los hilos de la araña
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.pool_size,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_filter_worker,
+                initargs=(self.rules_dir, self.stopwords),
+            )
+
+    def _cargar_rule_set(self, version):
+        rule_matcher = load_rule_set(self.rules_dir, version)
+        if rule_matcher is None:
+            # Cargar todas las reglas (AND, OR, simple) desde la tabla de uniones y compilarlas
+            rule_matcher = RuleMatcher(self._cargar_todas_las_reglas())
+            # No eliminar las versiones con las que se filtran los artículos en cola
+            save_rule_set(self.rules_dir, version, rule_matcher,
+                          in_use={pending_version for pending_version, *_ in self.pending})
+            print(f"Reglas compiladas (versión {version}): {len(rule_matcher.rules)}")
+        return rule_matcher
+
+    def _check_rules_version(self):
+        """
+        Cambia al conjunto de reglas de la nueva versión si se editaron reglas o palabras clave.
+        Se ejecuta entre artículos: cada artículo se filtra completo con una única versión.
+        """
+        now = time.monotonic()
+        if now - self.last_version_check < self.reload_interval:
+            return
+        self.last_version_check = now
+        version = self.news_db.get_rules_version()
+        if version != self.rules_version:
+            self.rule_matcher = self._cargar_rule_set(version)
+            self.rules_version = version
+            print(f"Reglas actualizadas a la versión {version}")
 
 
     def _cargar_todas_las_reglas(self):
-        # Cargar reglas y metadata de la union de reglas con palabras_clave_reglas
+        # Cargar reglas y metadata de la union de reglas con palabras_clave_reglas, agrupadas por id
         reglas_metadata = self.news_db.obtener_reglas_con_palabras_clave()
 
-        # Agrupar reglas por id
-        reglas = {}
-        for rule_id, rule_desc, posicion, keyword, operador in reglas_metadata:
-            if rule_id not in reglas:
-                reglas[rule_id] = {
-                    'desc': rule_desc,
-                    'keywords': [],
-                    'preprocessed': [],
-                    'operator': operador
-                }
-            reglas[rule_id]['keywords'].append(keyword)
-            reglas[rule_id]['preprocessed'].append(self._preprocesar_palabra_clave(keyword))
-
-        # Convertir al formato de diccionario
         """
-        Analiza una cadena de reglas y retorna un diccionario con el tipo y una lista de patrones d
-        e expresiones regulares compilados.
+        Analiza las reglas y retorna diccionarios con el tipo, los stems y las palabras clave
+        (la entrada de RuleMatcher).
         Admite:
         - Reglas AND con '+'
         - Reglas OR con 'o'
         - Reglas de una sola palabra clave
         """
-        parsed_rules = []
-        for rule_id, rule_data in reglas.items():
-            patterns = [self._compilar_patron(preprocessed) for preprocessed in rule_data['preprocessed']]
-
-            # Determine rule type based on count and operator
-            if rule_data['operator'] == '+':
-                rule_type = 'AND'
-            elif rule_data['operator'] == 'o':  # ',' operator
-                rule_type = 'OR'
-            else:
-                rule_type = 'SINGLE'
-
-            parsed_rules.append({
-                'type': rule_type,
-                'patterns': patterns,
-                'keywords': rule_data['keywords'], #palabras_clave_originales
-                #'rule': rule_data['desc'],
-                #'id': rule_id
-            })
-        return parsed_rules
+        return build_rules(reglas_metadata, self._preprocesar_palabra_clave)
 
 
     def _preprocesar_palabra_clave(self, word, eliminar_puntuacion = True):
-        if not isinstance(word, str):
-            return ''
-        word = word.lower()
-        word = unicodedata.normalize('NFKD', word).encode('ASCII', 'ignore').decode('utf-8')
-        if eliminar_puntuacion:
-            word = self.PUNCTUATION_RE.sub(' ', word)
-        word = re.sub(r'\s+', ' ', word).strip()  # elimina espacios múltiples
-        palabras = word.split()
-        palabras_limpias = [p for p in palabras if p not in self.stopwords]
-        stems = [self.stemmer.stem(palabra) for palabra in palabras_limpias] # stemming
-        #return ' '.join(palabras)
-        return ' '.join(stems)
+        return normalize_text(word, self.stopwords, eliminar_puntuacion)
 
     def _preprocesar_texto(self, texto, eliminar_puntuacion = True):
-        if not isinstance(texto, str):
-            return ''
-        texto = texto.lower()
-        texto = unicodedata.normalize('NFKD', texto).encode('ASCII', 'ignore').decode('utf-8')
-        if eliminar_puntuacion:
-            texto = self.PUNCTUATION_RE.sub(' ', texto)
-        texto = re.sub(r'\s+', ' ', texto).strip()  # elimina espacios múltiples
-        palabras = texto.split()
-        palabras_limpias = [p for p in palabras if p not in self.stopwords]
-        stems = [self.stemmer.stem(palabra) for palabra in palabras_limpias] # stemming
-        #return ' '.join(palabras)
-        return ' '.join(stems)
-
-    def _compilar_patron(self, word):
-        escaped = re.escape(word)
-        return re.compile(rf'\b{escaped}\b', re.IGNORECASE)
-
-
-    def cumple_regla(self, texto, parsed_rule):
-        """
-        Verificar el tipo de regla y si el texto cumple con la regla
-        """
-        if parsed_rule['type'] == 'AND':
-            return all(p.search(texto) for p in parsed_rule['patterns']), parsed_rule['patterns']
-        elif parsed_rule['type'] == 'OR':
-            presentes = []
-            for p, kw in zip(parsed_rule['patterns'], parsed_rule['keywords']):
-                if p.search(texto):
-                    presentes.append(kw)
-            cumple = len(presentes) > 0
-            return cumple, presentes
-        else:
-            return parsed_rule['patterns'][0].search(texto) is not None, parsed_rule['patterns']
+        return normalize_text(texto, self.stopwords, eliminar_puntuacion)
 
     def filtrar_texto(self, texto):
-        palabras_clave_single = set()
-        palabras_clave_compuestas_and = set()
-        palabras_clave_compuestas_or = set()
-        palabras_clave_compuestas_secundarias_and = set()
-
-        for parsed_rule in self.parsed_rules:
-            #if self.cumple_regla(texto, parsed_rule):
-            cumple, palabras_clave_encontradas = self.cumple_regla(texto, parsed_rule)
-            if cumple:
-                print(f"Parsed rule: {parsed_rule}")
-                if parsed_rule['type'] == 'AND':
-                    # solo la primera palabra es la palabra clave asociada
-                    palabras_clave_compuestas_and.add(parsed_rule['keywords'][0])
-                    palabras_clave_compuestas_secundarias_and.update(parsed_rule['keywords'][1:])
-                elif parsed_rule['type'] == 'OR':
-                    # todas son posibles palabras clave encontradas en el texto
-                    palabras_clave_compuestas_or.update(palabras_clave_encontradas)
-                else:
-                    # single keyword
-                    palabras_clave_single.update(parsed_rule['keywords'])
-
-        # palabras clave unicas que no forman parte de palabras compuestas por AND
-        palabras_validas_single = palabras_clave_single - palabras_clave_compuestas_secundarias_and
-
-        # unimos palabras clave de and, or y unicas
-        palabras_clave = palabras_clave_compuestas_and | palabras_clave_compuestas_or | palabras_validas_single
-
-        cumple = len(palabras_clave) > 0
-
-        #if cumple:
-        #    print(f"Palabras clave and: {palabras_clave_compuestas_and}")
-        #    print(f"Palabras clave and secundaria: {palabras_clave_compuestas_secundarias_and}")
-        #    print(f"Palabras clave or: {palabras_clave_compuestas_or}")
-        #    print(f"Palabras clave unicas: {palabras_clave_single}")
-        #    print(f"Palabras clave unicas validas: {palabras_validas_single}")
-
-        return cumple, list(palabras_clave)
+        # Solo se evalúan las reglas que contienen algún stem del texto (ver RuleMatcher)
+        return self.rule_matcher.filtrar_texto(texto)
 
     def process_item(self, item, spider):
+        self._check_rules_version()
         texto_original = item.get('texto', '')
-        texto = self._preprocesar_texto(texto_original)
-        #print("Preprocessed")
-        cumple, palabras_clave = self.filtrar_texto(texto)
+
+        if self.pool is None:
+            texto = self._preprocesar_texto(texto_original)
+            cumple, palabras_clave = self.filtrar_texto(texto)
+            keyword_ids = self.rule_matcher.get_keyword_ids(palabras_clave)
+            return self._resultado_filtrado(item, cumple, palabras_clave, keyword_ids)
+
+        # Filtrado en el pool de procesos; el Deferred se resuelve en el orden de llegada
+        d = defer.Deferred()
+        future = self.pool.submit(filter_article, self.rules_version, texto_original, time.time())
+        self.pending.append((self.rules_version, future, d, item))
+        future.add_done_callback(lambda _: reactor.callFromThread(self._release_in_order))
+        return d
+
+    def _release_in_order(self):
+        while self.pending and self.pending[0][1].done():
+            _, future, d, item = self.pending.popleft()
+            try:
+                cumple, palabras_clave, keyword_ids, queue_delay = future.result()
+                if self.stats:
+                    self.stats.inc_value('filter_pool/items')
+                    self.stats.inc_value('filter_pool/queue_delay_seconds', queue_delay)
+                    self.stats.max_value('filter_pool/queue_delay_max', queue_delay)
+                resultado = self._resultado_filtrado(item, cumple, palabras_clave, keyword_ids)
+            except Exception:
+                # DropItem o error del proceso
+                d.errback()
+            else:
+                d.callback(resultado)
+
+    def _resultado_filtrado(self, item, cumple, palabras_clave, keyword_ids):
         if cumple:
             print(f"Palabras clave encontradas: {palabras_clave}")
-            item['keyword-ids'] = self.news_db.get_keyword_ids(palabras_clave)
+            # Ids incluidos en el conjunto de reglas compilado (sin consultar la base de datos)
+            item['keyword-ids'] = keyword_ids
             print(f"Artículo aceptado: {item.get('url', '')}")
             #print(f"Metadata: {item}") # for testing
             return item
@@ -389,22 +482,75 @@ class FiltradoNoticiasPipeline:
                 del item['texto']
             raise scrapy.exceptions.DropItem(f"Artículo descartado: {item.get('url', '')}")
 
+    def close_spider(self, spider):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+            self.pool = None
+            items = self.stats.get_value('filter_pool/items', 0) if self.stats else 0
+            if items:
+                queue_delay = self.stats.get_value('filter_pool/queue_delay_seconds', 0)
+                print(f"Filtrado en {self.pool_size} procesos: {items} artículos, "
+                      f"espera media en cola {queue_delay / items * 1000:.1f} ms")
+        info = stem_cache_info()
+        total = info.hits + info.misses
+        if total:
+            print(f"Caché de stems: {info.hits / total:.1%} aciertos ({info.currsize} palabras distintas)")
+            spider.crawler.stats.set_value('normalization/stem_cache_hit_rate', round(info.hits / total, 4))
 
 
-###############################################################################
-from news_search.embedding_generator import EmbeddingGenerator
-from news_search.chroma_engine import ChromaVectorEngine
-from news_search.search_manager import SearchManager
 
+###############################################################################
 class EmbeddingPipeline:
 
-    def __init__(self):
+    def __init__(self, token_budget=8192, stats=None):
         model_name = 'intfloat/multilingual-e5-small'
         embedding_model = EmbeddingGenerator(model_name = model_name)
         vector_db = ChromaVectorEngine(embedding=embedding_model, persist_directory="./news_search/chroma_db", sqlite_path="./news_database/news.db")
         self.search_manager = SearchManager(embedding_model=embedding_model, vector_engine=vector_db, chunk_size=500, chunk_overlap=100)
+        self.embedding_model = embedding_model
+        # Fragmentos de varios artículos pendientes de codificar juntos, hasta token_budget tokens
+        self.token_budget = token_budget
+        self.chunks = []
+        self.chunk_tokens = 0
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(token_budget=crawler.settings.getint('EMBEDDING_TOKEN_BUDGET', 8192), stats=crawler.stats)
+
+    def open_spider(self, spider):
+        # Los artículos se registran como pendientes hasta que sus embeddings están en Chroma
+        self.writer = spider.db_writer
+        # Codificación y escritura en Chroma fuera del reactor, en un solo hilo: los lotes se guardan en orden
+        self.pool = ThreadPool(minthreads=0, maxthreads=1, name='embeddings')
+        self.pool.start()
+        # Artículos que quedaron pendientes en ejecuciones anteriores (error o interrupción): desde su texto guardado
+        pendientes = spider.news_db.get_pending_embedding_articles()
+        if pendientes:
+            logger.info(f"Artículos pendientes de embeddings de ejecuciones anteriores: {len(pendientes)}")
+            if self.stats:
+                self.stats.inc_value('embedding/retried_articles', len(pendientes))
+        flushes = []
+        for articulo in pendientes:
+            fecha = datetime.fromtimestamp(articulo['fecha_publicacion'], MADRID_TZ)
+            d = self._add_article({**articulo, 'fecha_publicacion': fecha}, pending=True)
+            if d is not None:
+                flushes.append(d)
+        return defer.DeferredList(flushes) if flushes else None
 
     def process_item(self, item, spider):
+        # Con un lote completo, el item termina cuando el lote está guardado
+        d = self._add_article(item)
+        if d is None:
+            return item
+        d.addCallback(lambda _: item)
+        return d
+
+    def _add_article(self, item, pending=False):
+        """
+        Añade todos los fragmentos del artículo al lote (un artículo nunca se reparte entre dos lotes).
+        Retorna el Deferred del lote anterior si se ha tenido que guardar, o None
+        """
         page_content=f"{item['titulo']}\n\n{item['texto']}"
         metadata={
             "titulo": item["titulo"],
@@ -412,7 +558,93 @@ class EmbeddingPipeline:
             "fuente": item["fuente"],
             "fecha_publicacion": item["fecha_publicacion"].strftime("%Y-%m-%d")
         }
-        print(f'Metadata vector db: {metadata}')
-        self.search_manager.ingest_article(page_content, metadata)
-        return item
+        logger.debug(f'Metadata vector db: {metadata}')
+        chunks = self.search_manager.split_article(page_content, metadata)
+        tokens = sum(self.embedding_model.count_tokens(chunk["chunk_text"]) for chunk in chunks)
+        d = None
+        if self.chunks and self.chunk_tokens + tokens > self.token_budget:
+            d = self._flush_chunks()
+        if not pending:
+            self.writer.enqueue('add_pending_embeddings', [item["url"]])
+        self.chunks.extend(chunks)
+        self.chunk_tokens += tokens
+        return d
 
+    def close_spider(self, spider):
+        self._flush_chunks()
+        # El hilo guarda los lotes en orden: esta tarea termina después de todos los encolados
+        d = threads.deferToThreadPool(reactor, self.pool, lambda: None)
+        d.addCallback(lambda _: self._print_embedding_stats())
+        d.addBoth(lambda result: self._stop_pool(result))
+        return d
+
+    def _stop_pool(self, result):
+        reactor.callInThread(self.pool.stop)
+        return result
+
+    def _print_embedding_stats(self):
+        chunks = self.stats.get_value('embedding/chunks', 0) if self.stats else 0
+        if chunks:
+            seconds = self.stats.get_value('embedding/seconds', 0)
+            batches = self.stats.get_value('embedding/batches', 0)
+            print(f"Embeddings: {chunks} fragmentos en {batches} lotes, {chunks / max(seconds, 1e-9):.1f} fragmentos/s")
+            self.stats.set_value('embedding/chunks_per_second', round(chunks / max(seconds, 1e-9), 1))
+
+    def _flush_chunks(self):
+        """ Encola el lote en el hilo de embeddings. Retorna el Deferred de su guardado, o None si está vacío """
+        if not self.chunks:
+            return None
+        chunks = self.chunks
+        self.chunks = []
+        self.chunk_tokens = 0
+        d = threads.deferToThreadPool(reactor, self.pool, self._ingest_batch, chunks)
+        d.addCallback(self._batch_saved, chunks)
+        return d
+
+    def _ingest_batch(self, chunks):
+        """
+        Se ejecuta en el hilo de embeddings. Si falla el lote, se guarda artículo por artículo.
+        Retorna (urls guardadas, error del lote o None, segundos)
+        """
+        start = time.perf_counter()
+        try:
+            self.search_manager.ingest_chunks(chunks)
+            return list(dict.fromkeys(chunk["url"] for chunk in chunks)), None, time.perf_counter() - start
+        except Exception as e:
+            articulos = len({chunk["url"] for chunk in chunks})
+            logger.warning(f"Error al guardar los embeddings de {articulos} artículos ({len(chunks)} fragmentos), "
+                           f"se reintentan por artículo: {e}")
+            return self._ingest_by_article(chunks), e, time.perf_counter() - start
+
+    def _batch_saved(self, resultado, chunks):
+        """ En el reactor: quita los artículos guardados de los pendientes y actualiza las estadísticas """
+        guardados, error, seconds = resultado
+        if guardados:
+            self.writer.enqueue('remove_pending_embeddings', guardados)
+        if self.stats:
+            guardados = set(guardados)
+            if error is not None:
+                self.stats.inc_value('embedding/errors')
+            fallidos = len({chunk["url"] for chunk in chunks} - guardados)
+            if fallidos:
+                self.stats.inc_value('embedding/failed_articles', fallidos)
+            self.stats.inc_value('embedding/chunks', sum(1 for chunk in chunks if chunk["url"] in guardados))
+            self.stats.inc_value('embedding/batches')
+            self.stats.inc_value('embedding/seconds', seconds)
+
+    def _ingest_by_article(self, chunks):
+        """
+        Guarda los fragmentos artículo por artículo. Retorna las urls guardadas; las demás quedan
+        pendientes y se reintentan en la siguiente ejecución
+        """
+        por_articulo = {}
+        for chunk in chunks:
+            por_articulo.setdefault(chunk["url"], []).append(chunk)
+        guardados = []
+        for url, fragmentos in por_articulo.items():
+            try:
+                self.search_manager.ingest_chunks(fragmentos)
+                guardados.append(url)
+            except Exception as e:
+                logger.error(f"Error al guardar los embeddings de {url}, queda pendiente: {e}")
+        return guardados
@@ -113,7 +113,31 @@ DOWNLOAD_TIMEOUT = 30
 RETRY_ENABLED = True
 #RETRY_TIMES = 5
 RETRY_TIMES = 3
-RETRY_HTTP_CODES = [403, 404, 500, 502, 503, 504] # Codes to retry on
+RETRY_HTTP_CODES = [429, 500, 502, 503, 504] # Codes to retry on
+
+# Extracción con Newspaper (fuentes sin sitemap) en un pool de hilos fuera del reactor
+NEWSPAPER_MAX_WORKERS = 4
+# Tiempo máximo (segundos) de extracción por dominio
+NEWSPAPER_BUILD_TIMEOUT = 120
+
+# Procesos para el filtrado de artículos por reglas (0 = en el hilo del reactor)
+FILTER_POOL_SIZE = 2
+# Conjuntos de reglas compilados por versión y cada cuántos segundos se comprueba si hay una versión nueva
+RULES_ARTIFACT_DIR = 'news_database/reglas_compiladas'
+RULES_RELOAD_INTERVAL = 30
+
+# Hilo escritor de SQLite (modo WAL): las escrituras del crawl se confirman en una transacción
+# cada DB_WRITER_COMMIT_INTERVAL segundos o DB_WRITER_MAX_BATCH operaciones
+DB_WRITER_COMMIT_INTERVAL = 1.0
+DB_WRITER_MAX_BATCH = 500
+
+# Tokens de los fragmentos de varios artículos que EmbeddingPipeline codifica juntos
+# (una llamada al modelo y una escritura en Chroma por lote)
+EMBEDDING_TOKEN_BUDGET = 8192
+
+# Cola de peticiones y huellas de duplicados en disco para reanudar ejecuciones interrumpidas.
+# Se elimina al terminar una ejecución con normalidad.
+JOBDIR = 'crawls/news_extractor'
 
 # Obey robots.txt rules
 ROBOTSTXT_OBEY = True
@@ -122,6 +146,20 @@ ROBOTSTXT_OBEY = True
 #CONCURRENT_REQUESTS = 16
 #CONCURRENT_REQUESTS_PER_DOMAIN = 1
 #DOWNLOAD_DELAY = 1
+CONCURRENT_REQUESTS = 64
+CONCURRENT_REQUESTS_PER_DOMAIN = 8
+
+# Concurrencia y retraso adaptativos por fuente (news_scraper.middlewares.AdaptiveThrottleMiddleware)
+ADAPTIVE_THROTTLE_ENABLED = True
+# Concurrencia inicial de cada fuente (máximo: CONCURRENT_REQUESTS_PER_DOMAIN)
+ADAPTIVE_THROTTLE_START_CONCURRENCY = 2
+# Latencia (segundos) a partir de la cual se reduce la concurrencia de una fuente
+ADAPTIVE_THROTTLE_TARGET_LATENCY = 2.0
+ADAPTIVE_THROTTLE_MAX_DELAY = 30.0
+# Fallos consecutivos tras los que se deja de pedir a la fuente durante ADAPTIVE_THROTTLE_BACKOFF segundos (se duplica en cada espera)
+ADAPTIVE_THROTTLE_FAILURE_THRESHOLD = 5
+ADAPTIVE_THROTTLE_BACKOFF = 60.0
+ADAPTIVE_THROTTLE_MAX_BACKOFF = 900.0
 
 # Disable cookies (enabled by default)
 #COOKIES_ENABLED = False
@@ -149,8 +187,14 @@ ROBOTSTXT_OBEY = True
 DOWNLOADER_MIDDLEWARES = {
     'scrapy.downloadermiddlewares.useragent.UserAgentMiddleware': None,
     'news_scraper.middlewares.RandomUserAgentMiddleware': 400,
+    'news_scraper.middlewares.ConditionalGetMiddleware': 560,
+    # Después de RetryMiddleware (550) para observar cada respuesta, incluidas las reintentadas
+    'news_scraper.middlewares.AdaptiveThrottleMiddleware': 580,
 }
 
+# Peticiones condicionales (ETag / Last-Modified) para robots.txt y sitemaps entre ejecuciones
+CONDITIONAL_GET_ENABLED = True
+
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
 #EXTENSIONS = {
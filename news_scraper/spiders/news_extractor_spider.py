@@ -3,6 +3,8 @@ from newspaper import build, Config, Article
 import requests
 from urllib.parse import urljoin, urlparse
 import os
+import shutil
+import threading
 import time
 import re
 from datetime import datetime
@@ -10,11 +12,18 @@ import gzip
 from scrapy.selector import Selector
 from scrapy.http import TextResponse
 from news_scraper.utils.sitemap_parser import SitemapParser
-from news_scraper.constants import INVALID_URL_WORDS
+from news_scraper.utils.newspaper_discovery import discover_source_urls, DiscoveryTimeout
+from news_scraper.constants import INVALID_URL_WORDS, CONDITIONAL_GET_META
+from news_scraper.middlewares import SourceBackoff
 from news_scraper.utils.utils import *
 from news_database.news_db import NewsDatabase
+from news_database.db_writer import DatabaseWriter
 from scrapy.spidermiddlewares.httperror import HttpError
 from scrapy.utils.project import get_project_settings
+from scrapy import signals
+from scrapy.exceptions import DontCloseSpider
+from twisted.internet import reactor, threads
+from twisted.python.threadpool import ThreadPool
 
 class NewsUrlExtractorSpider(scrapy.Spider):
     # Nombre de spider usado al momento de ejecutar
@@ -29,9 +38,15 @@ class NewsUrlExtractorSpider(scrapy.Spider):
 
         settings = get_project_settings()
         db_path = settings.get('DATABASE_PATH')
+        self.db_path = db_path
 
         self.news_db = NewsDatabase(db_path)
-        self.sitemap_parser = SitemapParser(self.from_date, self.news_db)
+        # Crear tablas nuevas (p. ej. cache_http) en bases de datos existentes
+        self.news_db.create_tables()
+        # Cargar una sola vez el índice de urls exploradas
+        total_crawled = self.news_db.load_crawled_url_index()
+        print(f"Urls exploradas cargadas en memoria: {total_crawled}")
+        self.sitemap_parser = SitemapParser(self.from_date, self.news_db, spider=self)
         # Remover articulos anteriores a limit_date
         #self.news_db.remove_old_articles(self.from_date)
 
@@ -39,6 +54,35 @@ class NewsUrlExtractorSpider(scrapy.Spider):
         #self.news_db.vacuum_database()
 
 
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super(NewsUrlExtractorSpider, cls).from_crawler(crawler, *args, **kwargs)
+
+        # Pool acotado de hilos para la extracción con Newspaper (bloqueante) fuera del reactor
+        spider.newspaper_pending = set()
+        # Al cerrar la araña, las extracciones en curso se abandonan en su siguiente comprobación
+        spider.newspaper_cancelled = threading.Event()
+        spider.newspaper_timeout = crawler.settings.getfloat('NEWSPAPER_BUILD_TIMEOUT', 120)
+        spider.newspaper_pool = ThreadPool(minthreads=0,
+                                           maxthreads=crawler.settings.getint('NEWSPAPER_MAX_WORKERS', 4),
+                                           name='newspaper')
+        spider.newspaper_pool.start()
+
+        # Hilo escritor: todas las escrituras del crawl (spider, middlewares y pipelines) se
+        # encolan y se confirman en una transacción por ventana. self.news_db queda para lecturas
+        spider.db_writer = DatabaseWriter(
+            spider.db_path,
+            commit_interval=crawler.settings.getfloat('DB_WRITER_COMMIT_INTERVAL', 1.0),
+            max_batch=crawler.settings.getint('DB_WRITER_MAX_BATCH', 500),
+        )
+        spider.db_writer.start()
+
+        crawler.signals.connect(spider.spider_idle, signal=signals.spider_idle)
+        crawler.signals.connect(spider.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(spider.engine_stopped, signal=signals.engine_stopped)
+        return spider
+
+
     def _initialize_start_date(self, fecha_inicio=None):
         if fecha_inicio:
             return datetime.strptime(fecha_inicio, '%Y-%m-%d').date()
@@ -50,36 +94,62 @@ class NewsUrlExtractorSpider(scrapy.Spider):
         for url in news_urls:
             yield scrapy.Request(url=url, callback=self.parse, errback=self.handle_error_start_request)
 
+        # Urls que quedaron en proceso en una ejecución interrumpida: descargadas cuyo artículo no llegó a
+        # guardarse, aplazadas por una fuente en espera (SourceBackoff) o pendientes en la cola.
+        # Se piden con dont_filter: al reanudar desde JOBDIR, el filtro de duplicados guardado descartaría
+        # las ya descargadas. Las que siguen en la cola de JOBDIR se descargan dos veces (la inserción es idempotente)
+        in_flight_urls = self.news_db.get_in_flight_urls()
+        if in_flight_urls:
+            print(f"Urls en proceso de una ejecución anterior: {len(in_flight_urls)}")
+        # El índice en memoria solo tiene las completadas: sin esto, un sitemap que vuelva a listar una de
+        # estas urls la pediría otra vez (la petición con dont_filter no deja huella en el filtro de duplicados)
+        self.news_db.add_to_crawled_url_index(in_flight_urls)
+        for url in in_flight_urls:
+            yield self._article_request(url, get_domain(url), dont_filter=True)
+
 
     def start_requests(self):
         self.start()
 
 
     def handle_error_start_request(self, failure):
+        if failure.check(SourceBackoff):
+            # Aplazada por AdaptiveThrottleMiddleware: se reprograma sola
+            return
         self.logger.error(f"Request fallida: {failure}")
         if failure.check(HttpError):
             response = failure.value.response
             self.logger.error(f"HTTP Error {response.status} en URL: {response.url}")
-            yield from self._get_news_urls(response.url)
+            self._get_news_urls(response.url)
 
 
     def parse(self, response):
         robots_url = urljoin(response.url, "/robots.txt")
         print(f'Robots URL: {robots_url}')
         yield scrapy.Request(robots_url, callback=self.parse_robots,
-                             meta={'domain': response.url},
-                             errback=lambda failure: self.handle_error(failure, response.url))
+                             meta={**CONDITIONAL_GET_META, 'domain': response.url},
+                             errback=self.handle_error)
 
 
     def parse_robots(self, response):
-        if response.status != 200:
+        if response.status == 304:
+            # robots.txt sin cambios: reutilizar los sitemaps extraídos en la ejecución anterior
+            validators = self.news_db.get_http_validators(response.url)
+            contenido = validators[2] if validators else None
+            if contenido is None:
+                print(f"robots.txt sin cambios pero sin sitemaps guardados: {response.url}")
+                return
+            urls_sitemap = set(contenido.splitlines())
+        elif response.status != 200:
             print(f"Error al acceder a la url: {response.status}.")
             return
+        else:
+            robots_text = response.text
+            urls_sitemap = extract_sitemap_urls(robots_text, INVALID_URL_WORDS)
+            self.db_writer.enqueue('save_http_cache_content', response.url, '\n'.join(sorted(urls_sitemap)))
 
         domain = response.meta['domain']
         domain_base = get_base_url(domain)
-        robots_text = response.text
-        urls_sitemap = extract_sitemap_urls(robots_text, INVALID_URL_WORDS)
 
         if len(urls_sitemap) > 0:
             print(f"Se encontraron los siguientes enlaces xml: {urls_sitemap}")
@@ -94,7 +164,9 @@ class NewsUrlExtractorSpider(scrapy.Spider):
             print("No se encontraron enlaces xml. Accediendo a enlaces con librería Newspaper...")
             # Si no se encuentra ningún mapa del sitio,
             # utilizar Newspaper para obtener las URL de los artículos de noticias
-            yield from self._get_news_urls(domain)
+            self._get_news_urls(domain)
+
+        self.sitemap_parser.save_http_validators(response)
 
 
     def _process_urls_sitemap(self, urls_sitemap, domain):
@@ -105,13 +177,17 @@ class NewsUrlExtractorSpider(scrapy.Spider):
                 # Archivo comprimido en .gz
                 print(f"Se encontró archivo comprimido {sitemap_url}")
                 yield scrapy.Request(sitemap_url,
-                                     callback=lambda response: self.sitemap_parser.parse_sitemap_gz(response, sitemap_url),
-                                     errback=(lambda failure: self.handle_error(failure, sitemap_url)) if enum == 0 else None)
+                                     meta=CONDITIONAL_GET_META,
+                                     callback=self.parse_sitemap_gz,
+                                     cb_kwargs={'domain': sitemap_url},
+                                     errback=self.handle_error if enum == 0 else None)
             else:
                 # Archivo xml
                 yield scrapy.Request(sitemap_url,
-                                     callback=lambda response: self.sitemap_parser.parse_sitemap(response, domain),
-                                     errback=(lambda failure: self.handle_error(failure, domain))  if enum == 0 else None )
+                                     meta=CONDITIONAL_GET_META,
+                                     callback=self.parse_sitemap,
+                                     cb_kwargs={'domain': domain},
+                                     errback=self.handle_error if enum == 0 else None)
 
 
     def _process_sitemap_from_metadata(self, domain_base, domain):
@@ -120,18 +196,64 @@ class NewsUrlExtractorSpider(scrapy.Spider):
             url_sitemap = urljoin(domain_base, sitemap_name)
             print(f"Accediendo al siguiente enlace especificado... {url_sitemap}")
             yield scrapy.Request(url_sitemap,
-                                 callback=lambda response: self.sitemap_parser.parse_sitemap(response, domain_base) )
+                                 meta=CONDITIONAL_GET_META,
+                                 callback=self.parse_sitemap,
+                                 cb_kwargs={'domain': domain_base})
+
+
+    def parse_sitemap(self, response, domain=None):
+        yield from self.sitemap_parser.parse_sitemap(response, domain)
+
+
+    def parse_sitemap_gz(self, response, domain=None):
+        yield from self.sitemap_parser.parse_sitemap_gz(response, domain)
+
+
+    def parse_article(self, response):
+        items = list(self.sitemap_parser.parse_article(response))
+        if not items:
+            # Artículo sin texto, título o fecha válidos: no se volverá a descargar
+            self.db_writer.enqueue('mark_crawled_urls_completed', [response.meta['url']])
+        yield from items
+
+
+    def handle_article_error(self, failure):
+        # Respuestas HTTP de error definitivas (tras reintentos) se marcan como completadas.
+        # Errores de red quedan en proceso para la siguiente ejecución; las peticiones aplazadas
+        # por una fuente en espera (SourceBackoff) se reprograman solas.
+        if failure.check(HttpError):
+            self.db_writer.enqueue('mark_crawled_urls_completed', [failure.request.meta['url']])
+
+
+    def _article_request(self, url, fuente, titulo='', fecha_publicacion=None, dont_filter=False):
+        return scrapy.Request(
+            url=url,
+            callback=self.parse_article,
+            errback=self.handle_article_error,
+            dont_filter=dont_filter,
+            meta={
+                'fuente': fuente,
+                'url': url,
+                'titulo': titulo,
+                'fecha_publicacion': fecha_publicacion,
+            }
+        )
 
 
     def handle_error(self, failure, domain=None):
-        if failure and failure.value and failure.value.response:
+        if failure.check(SourceBackoff):
+            # Aplazada por AdaptiveThrottleMiddleware: se reprograma sola
+            return
+        if failure and failure.value and getattr(failure.value, 'response', None):
             print(f"Request fallida: {failure.value.response.status} para {failure.request.url}")
         else:
             print(f"Request fallida para {failure.request.url}")
         print(f"Accediendo a enlaces con librería Newspaper...")
+        if domain is None:
+            domain = failure.request.cb_kwargs.get('domain') or failure.request.meta.get('domain')
         if domain is None:
             domain = failure.request.url
-        yield from self._get_news_urls(domain)
+        self._get_news_urls(domain)
 
 
     def _configure_newspaper(self):
@@ -170,40 +292,120 @@ class NewsUrlExtractorSpider(scrapy.Spider):
 
 
     def _get_news_urls(self, domain):
+        """
+        Programa la extracción con Newspaper en el pool de hilos sin bloquear el reactor.
+        Las urls encontradas se envían al motor de Scrapy cuando termina la extracción.
+        """
+        if domain in self.newspaper_pending:
+            return
+        self.newspaper_pending.add(domain)
+
         config = self._configure_newspaper()
-        try:
-            print(f'Extrayendo noticias con librería Newspaper para url: {domain}')
-            start_time = time.time()
-            paper = build(domain, config=config)
-            print(f"--- {(time.time() - start_time):.2f}s segundos ---")
-            articulos_urls = set(paper.article_urls())
-            print(f'Se encontraron {len(articulos_urls)} enlaces de noticias.')
-
-            #fuente = self._get_source_from_domain(domain)
-            fuente = get_domain(domain)
-
-            crawled_urls = []
-            for articulo_url in articulos_urls:
-                if not self.news_db.is_crawled_url(articulo_url):
-                    crawled_urls.append(articulo_url)
-                    yield scrapy.Request(
-                        url=articulo_url,
-                        callback=self.sitemap_parser.parse_article,
-                        meta={
-                            'fuente': fuente,
-                            'url': articulo_url,
-                            'titulo': '',
-                            'fecha_publicacion': None,
-                        }
-                    )
-
-            if len(crawled_urls) > 0:
-                self.news_db.bulk_insert_crawled_urls(crawled_urls)
-
-        except Exception as e:
+        # La caché se lee en el reactor; el hilo solo recibe una copia
+        cache = self.news_db.get_discovery_cache(domain)
+        print(f'Extrayendo noticias con librería Newspaper para url: {domain}')
+        # El plazo se comprueba dentro de la extracción: el dominio sigue pendiente (y no se vuelve
+        # a lanzar) hasta que el hilo termina de verdad y libera su puesto en el pool
+        deadline = time.monotonic() + self.newspaper_timeout
+        d = threads.deferToThreadPool(reactor, self.newspaper_pool, self._build_news_urls,
+                                      domain, config, cache, deadline)
+        d.addCallback(self._crawl_news_urls, domain)
+        d.addErrback(self._handle_newspaper_error, domain)
+        d.addBoth(lambda _: self.newspaper_pending.discard(domain))
+
+
+    def _build_news_urls(self, domain, config, cache, deadline):
+        """
+        Se ejecuta en un hilo del pool: descarga la portada y categorías con Newspaper,
+        expandiendo solo las páginas que cambiaron desde la ejecución anterior.
+        """
+        start_time = time.time()
+        discovery = discover_source_urls(domain, config, cache, deadline, self.newspaper_cancelled)
+        elapsed = time.time() - start_time
+        return discovery, elapsed
+
+
+    def _crawl_news_urls(self, result, domain):
+        """
+        Se ejecuta en el reactor: filtra urls ya exploradas y las envía al motor de Scrapy.
+        """
+        discovery, elapsed = result
+        if self.newspaper_cancelled.is_set():
+            # La araña ya se cerró (y con ella el escritor) mientras terminaba la extracción
+            return
+        print(f"--- {elapsed:.2f}s segundos (Newspaper, fuera del reactor) para {domain} ---")
+        print(f'Páginas re-expandidas: {discovery.cambiadas}, sin cambios: {discovery.sin_cambios}. '
+              f'Se encontraron {len(discovery.nuevos_enlaces)} enlaces de noticias nuevos.')
+        self.crawler.stats.inc_value('newspaper/builds')
+        self.crawler.stats.inc_value('newspaper/build_seconds', elapsed)
+        self.crawler.stats.inc_value('newspaper/pages_expanded', discovery.cambiadas)
+        self.crawler.stats.inc_value('newspaper/pages_unchanged', discovery.sin_cambios)
+        if discovery.paginas:
+            self.db_writer.enqueue('save_discovery_cache', domain, discovery.paginas)
+
+        #fuente = self._get_source_from_domain(domain)
+        fuente = get_domain(domain)
+
+        crawled_urls = self.news_db.filter_crawled_urls(discovery.nuevos_enlaces)
+        if len(crawled_urls) > 0:
+            self.register_crawled_urls(crawled_urls)
+
+        for articulo_url in crawled_urls:
+            self.crawler.engine.crawl(self._article_request(articulo_url, fuente))
+
+
+    def register_crawled_urls(self, urls):
+        """
+        Registra urls descubiertas: el índice en memoria se actualiza en el momento (las siguientes
+        comprobaciones ya las excluyen) y la inserción en la base de datos se encola en el escritor.
+        """
+        self.news_db.add_to_crawled_url_index(urls)
+        self.db_writer.enqueue('bulk_insert_crawled_urls', urls)
+
+
+    def _handle_newspaper_error(self, failure, domain):
+        if failure.check(DiscoveryTimeout):
+            self.crawler.stats.inc_value('newspaper/timeouts')
+            print(f"Tiempo agotado ({self.newspaper_timeout}s) al obtener noticias de {domain}")
+        else:
             print(f"No se pudieron obtener noticias de {domain}")
 
 
+    def spider_idle(self, spider):
+        # Mantener abierta la araña mientras haya extracciones de Newspaper pendientes
+        if self.newspaper_pending:
+            raise DontCloseSpider
+
+
+    def spider_closed(self, spider, reason):
+        build_seconds = self.crawler.stats.get_value('newspaper/build_seconds', 0)
+        print(f"Tiempo de Newspaper ejecutado fuera del reactor: {build_seconds:.2f}s")
+        # Sin bloquear el reactor: las extracciones en curso se abandonan en su siguiente
+        # comprobación y el pool se detiene (join de sus hilos) desde un hilo aparte
+        self.newspaper_cancelled.set()
+        reactor.callInThread(self.newspaper_pool.stop)
+        # Los pipelines ya esperaron a sus escrituras en close_spider: confirmar lo que quede
+        self.db_writer.close()
+        stats = self.crawler.stats
+        stats.set_value('db_writer/operations', self.db_writer.operations)
+        stats.set_value('db_writer/commits', self.db_writer.commits)
+        stats.set_value('db_writer/errors', self.db_writer.errors)
+        print(f"Escritor de base de datos: {self.db_writer.operations} operaciones en "
+              f"{self.db_writer.commits} transacciones ({self.db_writer.errors} con error)")
+        self.close_reason = reason
+
+
+    def engine_stopped(self):
+        # Se ejecuta después de que el planificador y SpiderState guarden su estado en JOBDIR.
+        # Solo una ejecución terminada con normalidad elimina el punto de control.
+        jobdir = self.crawler.settings.get('JOBDIR')
+        if jobdir and getattr(self, 'close_reason', None) == 'finished' and os.path.isdir(jobdir):
+            shutil.rmtree(jobdir, ignore_errors=True)
+            print(f"Ejecución finalizada: punto de control eliminado ({jobdir})")
+        elif jobdir:
+            print(f"Ejecución interrumpida: se reanudará desde {jobdir}")
+
+
     def _get_source_from_domain(self, domain):
         if domain is None:
             return ""
@@ -0,0 +1,114 @@
+import hashlib
+import time
+from collections import namedtuple
+from newspaper import Source
+
+# Resultado de una extracción incremental con Newspaper
+DiscoveryResult = namedtuple('DiscoveryResult', [
+    'paginas',          # {pagina_url: (content_hash, set de enlaces)} estado actualizado
+    'nuevos_enlaces',   # enlaces que no estaban en la caché de su página
+    'cambiadas',        # número de páginas re-expandidas
+    'sin_cambios',      # número de páginas omitidas por tener el mismo contenido
+])
+
+
+class DiscoveryTimeout(Exception):
+    """ La extracción superó su plazo o se canceló (cierre de la araña) """
+
+
+def _check_deadline(domain, deadline, cancelled):
+    if cancelled is not None and cancelled.is_set():
+        raise DiscoveryTimeout(f"Extracción de {domain} cancelada")
+    if deadline is not None and time.monotonic() > deadline:
+        raise DiscoveryTimeout(f"Extracción de {domain} fuera de plazo")
+
+
+def _download_in_batches(source, attr, download, domain, deadline, cancelled):
+    """
+    Descarga las categorías o feeds (source.<attr>) en tandas de config.number_threads páginas,
+    comprobando el plazo entre tandas: cada tanda dura como mucho config.request_timeout.
+    """
+    pendientes = getattr(source, attr)
+    descargadas = []
+    tanda = max(1, source.config.number_threads)
+    for i in range(0, len(pendientes), tanda):
+        _check_deadline(domain, deadline, cancelled)
+        setattr(source, attr, pendientes[i:i + tanda])
+        download()
+        descargadas.extend(getattr(source, attr))
+    setattr(source, attr, descargadas)
+
+
+def _content_hash(html):
+    if isinstance(html, str):
+        html = html.encode('utf-8', 'ignore')
+    return hashlib.blake2b(html, digest_size=16).hexdigest()
+
+
+def _group_by_page(articles):
+    enlaces = {}
+    for article in articles:
+        enlaces.setdefault(article.source_url, set()).add(article.url)
+    return enlaces
+
+
+def discover_source_urls(domain, config, cache, deadline=None, cancelled=None):
+    """
+    Reproduce Source.build() de Newspaper paso a paso, pero solo expande
+    (extrae enlaces de) las categorías y feeds cuyo contenido cambió respecto a la caché.
+    cache: {pagina_url: (content_hash, set de enlaces)} de la ejecución anterior.
+    deadline: instante (time.monotonic()) a partir del cual se abandona la extracción;
+    cancelled: threading.Event que la abandona antes. En ambos casos lanza DiscoveryTimeout
+    en la siguiente comprobación, como mucho una tanda de descargas después.
+    """
+    source = Source(domain, config=config)
+    source.download()
+    source.parse()
+    if source.doc is None:
+        return DiscoveryResult({}, set(), 0, 0)
+
+    source.set_categories()
+    _download_in_batches(source, 'categories', source.download_categories, domain, deadline, cancelled)
+    _check_deadline(domain, deadline, cancelled)
+    # El documento de cada categoría es necesario para localizar los feeds
+    source.parse_categories()
+    source.set_feeds()
+    _download_in_batches(source, 'feeds', source.download_feeds, domain, deadline, cancelled)
+    _check_deadline(domain, deadline, cancelled)
+
+    paginas = {}
+    categorias_cambiadas = []
+    for category in source.categories:
+        content_hash = _content_hash(category.html)
+        cached = cache.get(category.url)
+        if cached and cached[0] == content_hash:
+            paginas[category.url] = cached
+        else:
+            paginas[category.url] = (content_hash, set())
+            categorias_cambiadas.append(category)
+
+    feeds_cambiados = []
+    for feed in source.feeds:
+        content_hash = _content_hash(feed.rss)
+        cached = cache.get(feed.url)
+        if cached and cached[0] == content_hash:
+            paginas[feed.url] = cached
+        else:
+            paginas[feed.url] = (content_hash, set())
+            feeds_cambiados.append(feed)
+
+    # Extraer enlaces solo de las páginas modificadas
+    source.categories = categorias_cambiadas
+    source.feeds = feeds_cambiados
+    enlaces_por_pagina = _group_by_page(source.categories_to_articles())
+    for pagina_url, enlaces in _group_by_page(source.feeds_to_articles()).items():
+        enlaces_por_pagina.setdefault(pagina_url, set()).update(enlaces)
+
+    nuevos_enlaces = set()
+    for pagina_url, enlaces in enlaces_por_pagina.items():
+        anteriores = cache.get(pagina_url, (None, set()))[1]
+        nuevos_enlaces.update(enlaces - anteriores)
+        paginas[pagina_url] = (paginas[pagina_url][0], enlaces)
+
+    cambiadas = len(categorias_cambiadas) + len(feeds_cambiados)
+    return DiscoveryResult(paginas, nuevos_enlaces, cambiadas, len(paginas) - cambiadas)
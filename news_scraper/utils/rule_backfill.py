@@ -0,0 +1,141 @@
+"""
+Aplicación retroactiva de reglas nuevas o modificadas a los artículos ya guardados.
+
+1. Indexa los textos guardados (textos_articulos) que aún no están en el índice invertido
+   stem -> artículo (solo los nuevos desde la última ejecución).
+2. Compara cada regla con la firma con la que se aplicó por última vez (reglas_aplicadas).
+3. Con el índice obtiene los artículos candidatos de las reglas nuevas o modificadas
+   (los que contienen todos los stems necesarios) y solo descomprime y evalúa esos.
+4. Evalúa cada candidato con el conjunto completo de reglas, igual que FiltradoNoticiasPipeline,
+   e inserta los enlaces palabra_clave_articulos que falten.
+
+Los enlaces existentes no se eliminan aunque una regla cambie o desaparezca.
+"""
+import time
+from news_database.news_db import NewsDatabase
+from news_database.normalization import normalize_text, get_spanish_stopwords
+from news_scraper.utils.rule_matcher import RuleMatcher, build_rules
+
+INDEX_BATCH_SIZE = 500
+
+
+def rule_signature(rule):
+    return f"{rule['type']}:" + '|'.join(rule['keywords'])
+
+
+class RuleBackfill:
+
+    def __init__(self, news_db, stopwords=None, progress=None):
+        """
+        progress: función opcional progress(fase, hechos, total) para informar del avance
+        """
+        self.news_db = news_db
+        self.stopwords = get_spanish_stopwords() if stopwords is None else stopwords
+        self.progress = progress or (lambda fase, hechos, total: None)
+
+    def _normalizar(self, texto):
+        return normalize_text(texto, self.stopwords)
+
+    def index_pending_articles(self):
+        """ Añade al índice los textos guardados desde la última ejecución. Retorna cuántos """
+        total = self.news_db.count_unindexed_article_texts()
+        hechos = 0
+        self.progress('indexando', 0, total)
+        while hechos < total:
+            articulos = self.news_db.get_unindexed_article_texts(INDEX_BATCH_SIZE)
+            if not articulos:
+                break
+            self.news_db.bulk_index_articles([(url, set(self._normalizar(texto).split())) for url, texto in articulos])
+            hechos += len(articulos)
+            self.progress('indexando', hechos, total)
+        return hechos
+
+    def pending_rules(self, rules):
+        """ Reglas nuevas o cuyo contenido cambió desde que se aplicaron """
+        aplicadas = self.news_db.get_applied_rules()
+        return [rule for rule in rules if aplicadas.get(rule['id']) != rule_signature(rule)]
+
+    def _articles_with_stem(self, stem, cache):
+        """ Artículos que contienen todos los tokens del stem (compuesto o no) """
+        if stem not in cache:
+            tokens = stem.split()
+            if not tokens:
+                # Palabra clave vacía tras normalizar: cumple en cualquier texto
+                cache[stem] = self.news_db.get_indexed_article_ids()
+            else:
+                articulos = None
+                for token in sorted(set(tokens)):
+                    ids = self.news_db.get_indexed_article_ids(token)
+                    articulos = ids if articulos is None else articulos & ids
+                    if not articulos:
+                        break
+                cache[stem] = articulos
+        return cache[stem]
+
+    def candidate_articles(self, rules):
+        """
+        Ids de artículos que pueden cumplir alguna de las reglas según el índice.
+        Para stems de varios tokens el índice no guarda posiciones: se verifica después con el texto.
+        """
+        cache = {}
+        candidatos = set()
+        for rule in rules:
+            if rule['type'] == 'AND':
+                articulos = None
+                for stem in rule['stems']:
+                    ids = self._articles_with_stem(stem, cache)
+                    articulos = set(ids) if articulos is None else articulos & ids
+                    if not articulos:
+                        break
+                candidatos |= articulos or set()
+            elif rule['type'] == 'OR':
+                for stem in rule['stems']:
+                    candidatos |= self._articles_with_stem(stem, cache)
+            else:
+                candidatos |= self._articles_with_stem(rule['stems'][0], cache)
+        return candidatos
+
+    def run(self):
+        """
+        Ejecuta el proceso completo. Retorna un resumen con los artículos indexados,
+        las reglas aplicadas, los candidatos evaluados, los enlaces nuevos y la duración.
+        """
+        inicio = time.perf_counter()
+        indexados = self.index_pending_articles()
+
+        rules = build_rules(self.news_db.obtener_reglas_con_palabras_clave(), self._normalizar)
+        pendientes = self.pending_rules(rules)
+        candidatos = self.candidate_articles(pendientes) if pendientes else set()
+
+        enlaces = 0
+        if candidatos:
+            matcher = RuleMatcher(rules)
+            lista_palabra_url = []
+            self.progress('evaluando', 0, len(candidatos))
+            for hechos, (url, texto) in enumerate(self.news_db.get_indexed_article_texts(candidatos), 1):
+                cumple, palabras_clave = matcher.filtrar_texto(self._normalizar(texto))
+                if cumple:
+                    lista_palabra_url.extend((url, keyword_id) for keyword_id in matcher.get_keyword_ids(palabras_clave))
+                if hechos % INDEX_BATCH_SIZE == 0:
+                    self.progress('evaluando', hechos, len(candidatos))
+            self.progress('evaluando', len(candidatos), len(candidatos))
+
+            enlaces = self.news_db.bulk_insert_palabra_clave_articulos(lista_palabra_url)
+
+        self.news_db.save_applied_rules({rule['id']: rule_signature(rule) for rule in pendientes})
+        return {
+            'indexados': indexados,
+            'reglas': len(pendientes),
+            'candidatos': len(candidatos),
+            'enlaces': enlaces,
+            'segundos': time.perf_counter() - inicio,
+        }
+
+
+def run_rule_backfill(db_path, progress=None):
+    """ Ejecuta RuleBackfill con su propia conexión (para lanzarlo en un hilo en segundo plano) """
+    news_db = NewsDatabase(db_path)
+    try:
+        return RuleBackfill(news_db, progress=progress).run()
+    finally:
+        news_db.close_db()
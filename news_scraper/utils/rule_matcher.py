@@ -0,0 +1,161 @@
+from collections import namedtuple
+
+# Regla compilada: stems de cada palabra clave (preprocesada) en el mismo orden que keywords
+CompiledRule = namedtuple('CompiledRule', ['type', 'stems', 'keywords'])
+
+# Marca de fin de frase dentro del trie de stems compuestos
+_END = None
+
+
+def build_rules(reglas_metadata, normalizar):
+    """
+    Agrupa las filas (regla_id, descripcion, posicion, palabra, operador, palabra_id) de
+    NewsDatabase.obtener_reglas_con_palabras_clave en reglas con id, tipo, stems, palabras clave
+    y sus ids:
+    - '+' -> AND, 'o' -> OR, otro operador -> SINGLE
+    normalizar: función que convierte una palabra clave en sus stems (normalize_text)
+    """
+    reglas = {}
+    for rule_id, rule_desc, posicion, keyword, operador, keyword_id in reglas_metadata:
+        if rule_id not in reglas:
+            if operador == '+':
+                rule_type = 'AND'
+            elif operador == 'o':
+                rule_type = 'OR'
+            else:
+                rule_type = 'SINGLE'
+            reglas[rule_id] = {'id': rule_id, 'type': rule_type, 'stems': [], 'keywords': [], 'keyword_ids': []}
+        reglas[rule_id]['keywords'].append(keyword)
+        reglas[rule_id]['keyword_ids'].append(keyword_id)
+        reglas[rule_id]['stems'].append(normalizar(keyword))
+    return list(reglas.values())
+
+
+class RuleMatcher:
+    """
+    Motor de coincidencia de reglas de palabras clave sobre texto ya preprocesado
+    (minúsculas, sin acentos ni puntuación, sin stopwords y con stemming, separado por espacios).
+
+    Equivale a buscar r'\\b<stem>\\b' de cada palabra clave en cada regla, pero:
+    - el texto se tokeniza una sola vez,
+    - los stems de un token se buscan en un diccionario y los de varios tokens en un trie,
+    - solo se evalúan las reglas que contienen algún stem encontrado (índice invertido stem -> reglas).
+    """
+
+    def __init__(self, rules):
+        self.rules = [CompiledRule(rule['type'], list(rule['stems']), list(rule['keywords'])) for rule in rules]
+        self.single_token_stems = set()
+        self.multi_token_trie = {}
+        self.rules_by_stem = {}
+        self.has_empty_stem = False
+        # palabra clave -> palabra_id, para no consultar la base de datos por cada artículo aceptado
+        self.keyword_ids = {}
+        for rule in rules:
+            self.keyword_ids.update(zip(rule['keywords'], rule.get('keyword_ids', ())))
+
+        for rule_index, rule in enumerate(self.rules):
+            # SINGLE solo evalúa la primera palabra clave de la regla
+            stems = rule.stems[:1] if rule.type == 'SINGLE' else rule.stems
+            for stem in stems:
+                self._add_stem(stem)
+                self.rules_by_stem.setdefault(stem, set()).add(rule_index)
+
+    def _add_stem(self, stem):
+        tokens = stem.split()
+        if not tokens:
+            # Palabra clave compuesta solo de stopwords/puntuación: r'\b\b' coincide con cualquier texto no vacío
+            self.has_empty_stem = True
+        elif len(tokens) == 1:
+            self.single_token_stems.add(tokens[0])
+        else:
+            node = self.multi_token_trie
+            for token in tokens:
+                node = node.setdefault(token, {})
+            node[_END] = stem
+
+    def find_stems(self, texto):
+        """
+        Retorna el conjunto de stems de palabras clave presentes en el texto en una sola pasada.
+        """
+        tokens = texto.split()
+        found = self.single_token_stems.intersection(tokens)
+        if self.has_empty_stem and tokens:
+            found.add('')
+
+        if self.multi_token_trie:
+            trie = self.multi_token_trie
+            total = len(tokens)
+            for start, token in enumerate(tokens):
+                node = trie.get(token)
+                position = start + 1
+                while node is not None:
+                    stem = node.get(_END)
+                    if stem is not None:
+                        found.add(stem)
+                    if position >= total:
+                        break
+                    node = node.get(tokens[position])
+                    position += 1
+        return found
+
+    def match(self, texto):
+        """
+        Retorna las reglas que cumple el texto como lista de (regla, palabras clave encontradas),
+        en el mismo orden en que se cargaron las reglas.
+        Para reglas OR las palabras clave encontradas son las presentes en el texto;
+        para AND y SINGLE son todas las palabras clave de la regla.
+        """
+        found = self.find_stems(texto)
+        if not found:
+            return []
+
+        candidates = set()
+        for stem in found:
+            candidates.update(self.rules_by_stem.get(stem, ()))
+
+        matches = []
+        for rule_index in sorted(candidates):
+            rule = self.rules[rule_index]
+            if rule.type == 'AND':
+                if all(stem in found for stem in rule.stems):
+                    matches.append((rule, rule.keywords))
+            elif rule.type == 'OR':
+                presentes = [keyword for stem, keyword in zip(rule.stems, rule.keywords) if stem in found]
+                if presentes:
+                    matches.append((rule, presentes))
+            elif rule.stems[0] in found:
+                matches.append((rule, rule.keywords))
+        return matches
+
+    def filtrar_texto(self, texto):
+        """
+        Retorna (cumple, palabras clave) combinando las reglas que cumple el texto:
+        - AND: solo la primera palabra es la palabra clave asociada
+        - OR: las palabras clave presentes en el texto
+        - SINGLE: la palabra clave, salvo que sea secundaria de una regla AND cumplida
+        """
+        palabras_clave_single = set()
+        palabras_clave_compuestas_and = set()
+        palabras_clave_compuestas_or = set()
+        palabras_clave_compuestas_secundarias_and = set()
+
+        for rule, palabras_clave_encontradas in self.match(texto):
+            if rule.type == 'AND':
+                palabras_clave_compuestas_and.add(rule.keywords[0])
+                palabras_clave_compuestas_secundarias_and.update(rule.keywords[1:])
+            elif rule.type == 'OR':
+                palabras_clave_compuestas_or.update(palabras_clave_encontradas)
+            else:
+                palabras_clave_single.update(rule.keywords)
+
+        # palabras clave unicas que no forman parte de palabras compuestas por AND
+        palabras_validas_single = palabras_clave_single - palabras_clave_compuestas_secundarias_and
+
+        palabras_clave = palabras_clave_compuestas_and | palabras_clave_compuestas_or | palabras_validas_single
+        return len(palabras_clave) > 0, list(palabras_clave)
+
+    def get_keyword_ids(self, palabras_clave):
+        """
+        Retorna los palabra_id de las palabras clave (las desconocidas se omiten)
+        """
+        return [self.keyword_ids[palabra] for palabra in palabras_clave if palabra in self.keyword_ids]
@@ -0,0 +1,101 @@
+"""
+Conjunto de reglas compilado (RuleMatcher) serializado en disco por versión (tabla rules_version),
+y funciones que se ejecutan en los procesos del pool de filtrado.
+"""
+import glob
+import os
+import pickle
+import re
+import tempfile
+import time
+from news_database.normalization import normalize_text
+
+# Formato del RuleMatcher serializado: cambia cuando cambian sus atributos, para no cargar
+# artefactos anteriores de la misma versión de reglas (2: incluye los palabra_id)
+RULE_SET_FORMAT = 2
+RULE_SET_FILE_RE = re.compile(r'reglas_(?:f(\d+)_)?v(\d+)\.pickle$')
+
+# Versiones anteriores (las más recientes, por número de ficheros) que se conservan además de la actual.
+# Las versiones de los artículos que aún estén en cola se conservan siempre (save_rule_set(in_use=...))
+KEEP_PREVIOUS_VERSIONS = 2
+
+
+def rule_set_path(directory, version):
+    return os.path.join(directory, f'reglas_f{RULE_SET_FORMAT}_v{version}.pickle')
+
+
+def load_rule_set(directory, version):
+    """
+    Retorna el RuleMatcher guardado para la versión, o None si no existe
+    """
+    try:
+        with open(rule_set_path(directory, version), 'rb') as f:
+            return pickle.load(f)
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+        return None
+
+
+def save_rule_set(directory, version, rule_matcher, in_use=()):
+    """
+    Guarda el RuleMatcher de forma atómica (fichero temporal + os.replace)
+    y elimina los artefactos de otros formatos y los de versiones antiguas, salvo las
+    KEEP_PREVIOUS_VERSIONS anteriores más recientes y las versiones in_use (artículos en cola).
+    Los triggers pueden aumentar rules_version en varias unidades de una vez: se cuentan ficheros,
+    no números de versión.
+    """
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        pickle.dump(rule_matcher, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, rule_set_path(directory, version))
+
+    versiones = {}
+    for path in glob.glob(os.path.join(directory, 'reglas_*.pickle')):
+        match = RULE_SET_FILE_RE.search(path)
+        if not match:
+            continue
+        formato, file_version = match.groups()
+        if formato != str(RULE_SET_FORMAT):
+            os.remove(path)
+        else:
+            versiones[int(file_version)] = path
+
+    conservar = {version, *in_use}
+    conservar.update(sorted((v for v in versiones if v < version), reverse=True)[:KEEP_PREVIOUS_VERSIONS])
+    for file_version, path in versiones.items():
+        if file_version not in conservar:
+            os.remove(path)
+
+
+# --- Procesos del pool de filtrado ---
+_worker = {
+    'directory': None,
+    'stopwords': frozenset(),
+    'version': None,
+    'rule_matcher': None,
+}
+
+
+def init_filter_worker(directory, stopwords):
+    _worker['directory'] = directory
+    _worker['stopwords'] = stopwords
+
+
+def filter_article(version, texto, submitted_at):
+    """
+    Preprocesa y filtra el texto de un artículo con la versión de reglas indicada.
+    El conjunto de reglas se carga una vez por versión y proceso.
+    Retorna (cumple, palabras clave, ids de las palabras clave, segundos en cola).
+    """
+    started_at = time.time()
+    if _worker['version'] != version:
+        rule_matcher = load_rule_set(_worker['directory'], version)
+        if rule_matcher is None:
+            raise RuntimeError(f"No existe el conjunto de reglas compilado v{version} en {_worker['directory']}")
+        _worker['rule_matcher'] = rule_matcher
+        _worker['version'] = version
+
+    texto = normalize_text(texto, _worker['stopwords'])
+    rule_matcher = _worker['rule_matcher']
+    cumple, palabras_clave = rule_matcher.filtrar_texto(texto)
+    return cumple, palabras_clave, rule_matcher.get_keyword_ids(palabras_clave), started_at - submitted_at
@@ -1,171 +1,206 @@
 import scrapy
-import gzip
+import hashlib
+from collections import namedtuple
 from urllib.parse import urljoin
 from scrapy import Request
-from scrapy.selector import Selector
-from scrapy.http import TextResponse
 from news_scraper.utils.utils import *
-from news_scraper.constants import INVALID_URL_WORDS, SITEMAP_NAMESPACES
+from news_scraper.utils.sitemap_stream import iter_sitemap_entries, open_sitemap_body
+from news_scraper.constants import INVALID_URL_WORDS, CONDITIONAL_GET_META
 from news_database.news_db import NewsDatabase
 
+# Registro compacto de cada entrada del sitemap con la fecha ya normalizada
+SitemapRecord = namedtuple('SitemapRecord', ['url', 'fecha', 'titulo'])
+# Urls de un sitemap que se comprueban (y registran) juntas contra las ya exploradas
+SITEMAP_URL_BATCH = 1000
+
 class SitemapParser:
-    def __init__(self, from_date, news_db=None):
+    def __init__(self, from_date, news_db=None, spider=None):
         self.from_date = from_date
         self.news_db = news_db
+        # Las peticiones usan métodos de la araña como callbacks para poder serializarse en JOBDIR
+        self.spider = spider
 
 
     def parse_sitemap(self, response, domain=None):
         """
         Procesa un sitemap para extraer URLs de noticias.
         """
-        # Procesar sitemaps anidados
-        yield from self._process_nested_sitemaps(response, domain)
-
-        # Verificar que el archivo tenga noticias recientes
-        if not self._has_recent_news(response):
-            #print(f"No se tienen noticias recientes en {response.url}")
+        if response.status == 304:
+            # Sitemap sin cambios desde la ejecución anterior
             return
 
-        # Extraer datos de cada tag <url>
-        yield from self._extract_url_data(response, domain)
+        # Url original (antes de redirecciones) con la que se registra el estado del sitemap
+        sitemap_url = response.meta.get('redirect_urls', [response.url])[0]
+        content_hash = hashlib.blake2b(response.body, digest_size=16).hexdigest()
+        state = self.news_db.get_sitemap_state(sitemap_url)
+        unchanged = self._covers_from_date(state) and state['content_hash'] == content_hash
 
+        # Sitemap de noticias sin sitemaps anidados y con el mismo contenido: nada nuevo que procesar
+        if unchanged and not state['sitemap_count']:
+            return
 
-    def _process_nested_sitemaps(self, response, domain=None):
+        # Una sola pasada sobre el documento (comprimido o no): los sitemaps anidados se solicitan y las urls
+        # se comprueban por lotes a medida que se leen. Solo se conservan el lote actual y la fecha más reciente
+        sitemap_count = 0
+        newest_article_date = None
+        batch = []
+        for is_sitemap, record in self._iter_records(response):
+            if is_sitemap:
+                sitemap_count += 1
+                # Procesar sitemaps anidados (los anidados sin cambios en lastmod se omiten)
+                request = self._nested_sitemap_request(record, domain)
+                if request is not None:
+                    yield request
+                continue
+            if record.fecha and (newest_article_date is None or record.fecha > newest_article_date):
+                newest_article_date = record.fecha
+            if unchanged:
+                continue
+            batch.append(record)
+            if len(batch) >= SITEMAP_URL_BATCH:
+                # Extraer datos de cada tag <url>
+                yield from self._extract_url_data(batch, domain)
+                batch = []
+        if batch:
+            yield from self._extract_url_data(batch, domain)
+
+        # Los índices de sitemaps no guardan validadores: sus sitemaps anidados se filtran por fecha
+        # y un 304 del índice los omitiría todos
+        if not sitemap_count:
+            self.save_http_validators(response)
+
+        self.spider.db_writer.enqueue(
+            'save_sitemap_state',
+            sitemap_url,
+            response.meta.get('sitemap_lastmod'),
+            content_hash,
+            newest_article_date.isoformat() if newest_article_date else None,
+            sitemap_count,
+            # Sin cambios, las entradas siguen procesadas desde la fecha de inicio de entonces
+            state['fecha_inicio'] if unchanged else self.from_date.isoformat(),
+        )
+
+
+    def _covers_from_date(self, state):
         """
-        Procesa los sitemaps anidados dentro de un sitemap.
+        Si el estado es de una ejecución con fecha de inicio igual o anterior a la actual. Con una posterior
+        (o desconocida) se descartaron por antiguas entradas que ahora se deben procesar
         """
-        if isinstance(response, Selector):
-            # Si es un selector, usar sus métodos directamente
-            sitemap_selectors = response.xpath('//ns:sitemap', namespaces=SITEMAP_NAMESPACES)
-        elif isinstance(response, TextResponse):
-            # Si es una TextResponse, acceder a su selector
-            sitemap_selectors = response.selector.xpath('//ns:sitemap', namespaces=SITEMAP_NAMESPACES)
-        else:
-            print(f"La respuesta no es un TextResponse ni un Selector. {type(response)}")
-            return
+        return (state is not None and state['fecha_inicio'] is not None
+                and state['fecha_inicio'] <= self.from_date.isoformat())
 
-        for sitemap in sitemap_selectors:
-            sitemap_loc = sitemap.xpath('./ns:loc/text()', namespaces=SITEMAP_NAMESPACES).get()
 
-            # Omitir sitemaps antiguos
-            last_mod = sitemap.xpath('./ns:lastmod/text()', namespaces=SITEMAP_NAMESPACES).get()
-            if last_mod:
-                lastmod_norm = normalize_date(last_mod)
-                if lastmod_norm.date() < self.from_date:
-                    continue
+    def save_http_validators(self, response):
+        """
+        Guarda los validadores (ETag / Last-Modified, ver ConditionalGetMiddleware) de una respuesta
+        ya procesada, con la fecha de inicio de esta ejecución
+        """
+        validators = response.meta.get('http_validators')
+        if validators:
+            url, etag, last_modified = validators
+            self.spider.db_writer.enqueue('save_http_validators', url, etag, last_modified, self.from_date.isoformat())
 
-            # Algunas sitemaps no contiene la url completa, agregar base_url
-            if not is_full_url(sitemap_loc):
-                sitemap_loc = urljoin(domain, sitemap_loc)
 
-            # Verificar que la url es un archivo xml
-            file_extension = get_url_extension(sitemap_loc)
+    def _iter_records(self, response):
+        """
+        Recorre el sitemap en una sola pasada y genera (es_sitemap, registro (url, fecha, titulo)).
+        La fecha de cada entrada se normaliza una única vez.
+        """
+        for entry in iter_sitemap_entries(open_sitemap_body(response.body)):
+            if not entry.loc:
+                continue
+            if entry.is_sitemap:
+                yield True, SitemapRecord(entry.loc, self._parse_date(entry.lastmod), None)
+            else:
+                # La fecha de publicación de Google News tiene prioridad sobre lastmod
+                fecha = self._parse_date(entry.publication_date or entry.lastmod)
+                yield False, SitemapRecord(entry.loc, fecha, entry.title or "")
 
-            if file_extension.lower() != '.gz' and is_valid_sitemap_url(sitemap_loc, INVALID_URL_WORDS):
-                #print(f'Se encontró otro xml dentro del archivo actual: {sitemap_loc}') # varias salidas
-                if sitemap_loc:
-                    # Explorar recursivamente otros archivos xml
-                    yield scrapy.Request(sitemap_loc, callback=lambda response: self.parse_sitemap(response, domain) )
-            elif file_extension.lower() == '.gz'  and is_valid_sitemap_url(sitemap_loc, INVALID_URL_WORDS):
-                print(f"Se encontró archivo comprimido {sitemap_loc}")
-                yield scrapy.Request(sitemap_loc, callback=lambda response: self.parse_sitemap_gz(response, domain) )
 
+    def _parse_date(self, fecha):
+        return normalize_date(fecha) if fecha else None
 
-    def parse_sitemap_gz(self, response, domain=None):
-        compressed_file = response.body
-        decompressed_file = gzip.decompress(compressed_file).decode("utf-8")
-        selector = Selector(text=decompressed_file, type="xml")
-        yield from self.parse_sitemap(selector, domain)
-
-
-    def _has_recent_news(self, response):
-        if isinstance(response, Selector):
-            # Si es un selector, usar sus métodos directamente
-            selector_list = response.xpath('//ns:url', namespaces=SITEMAP_NAMESPACES)
-        elif isinstance(response, TextResponse):
-            # Si es una TextResponse, acceder a su selector
-            selector_list = response.selector.xpath('//ns:url', namespaces=SITEMAP_NAMESPACES)
-        else:
-            print(f"La respuesta no es un TextResponse ni un Selector. {type(response)}")
-            return
 
-        if len(selector_list) < 1:
-            return False
+    def _nested_sitemap_request(self, sitemap, domain=None):
+        """
+        Petición de un sitemap anidado dentro de un sitemap, o None si se omite.
+        """
+        sitemap_loc = sitemap.url
 
-        selector_list = self._sort_selector_by_date(selector_list)
-        #start_index = 0 if len(selector_list) == 1 else 1
-        start_index = 0
-        first_publication_date = self._get_publication_date(selector_list[start_index])
-        last_publication_date = self._get_publication_date(selector_list[-1])
+        # Omitir sitemaps antiguos
+        if sitemap.fecha and sitemap.fecha.date() < self.from_date:
+            return None
 
-        # Validar que ambas fechas existan
-        #if not first_publication_date or not last_publication_date:
-        #    return False
+        # Algunas sitemaps no contiene la url completa, agregar base_url
+        if not is_full_url(sitemap_loc):
+            sitemap_loc = urljoin(domain, sitemap_loc)
+
+        # Omitir sitemaps cuyo lastmod no ha cambiado desde que se procesaron
+        lastmod = sitemap.fecha.isoformat() if sitemap.fecha else None
+        if lastmod:
+            state = self.news_db.get_sitemap_state(sitemap_loc)
+            if self._covers_from_date(state) and state['lastmod'] == lastmod:
+                return None
+        meta = {**CONDITIONAL_GET_META, 'sitemap_lastmod': lastmod}
+
+        # Verificar que la url es un archivo xml
+        file_extension = get_url_extension(sitemap_loc)
+
+        if file_extension.lower() != '.gz' and is_valid_sitemap_url(sitemap_loc, INVALID_URL_WORDS):
+            #print(f'Se encontró otro xml dentro del archivo actual: {sitemap_loc}') # varias salidas
+            # Explorar recursivamente otros archivos xml
+            return scrapy.Request(sitemap_loc, meta=meta,
+                                  callback=self.spider.parse_sitemap, cb_kwargs={'domain': domain})
+        elif file_extension.lower() == '.gz'  and is_valid_sitemap_url(sitemap_loc, INVALID_URL_WORDS):
+            print(f"Se encontró archivo comprimido {sitemap_loc}")
+            return scrapy.Request(sitemap_loc, meta=meta,
+                                  callback=self.spider.parse_sitemap_gz, cb_kwargs={'domain': domain})
+        return None
 
-        # Validar que la primera y última fecha no sean menores que la fecha límite
-        if first_publication_date and last_publication_date:
-            #if not (first_publication_date >= self.from_date and last_publication_date >= self.from_date):
-            if first_publication_date < self.from_date and last_publication_date < self.from_date:
-                return False
 
-        # Verificar que las urls no hayan sido rastreadas anteriormente
-        first_url = selector_list[start_index].xpath('./ns:loc/text()', namespaces=SITEMAP_NAMESPACES).get()
-        last_url = selector_list[-1].xpath('./ns:loc/text()', namespaces=SITEMAP_NAMESPACES).get()
-        crawled_first_url = self.news_db.is_crawled_url(first_url)
-        crawled_last_url = self.news_db.is_crawled_url(last_url)
+    def parse_sitemap_gz(self, response, domain=None):
+        # La descompresión es incremental dentro de parse_sitemap
+        yield from self.parse_sitemap(response, domain)
 
-        if crawled_first_url and crawled_last_url:
-            return False
-        return True
 
-    def _extract_url_data(self, response, domain):
+    def _extract_url_data(self, url_records, domain):
         """
-        Extraer data de cada tag <url> en los mapas de sitio.
+        Extraer data de cada tag <url> de un lote de registros del mapa de sitio.
         """
-        selector_list = response.xpath('//ns:url', namespaces=SITEMAP_NAMESPACES)
-
+        # Encontrar urls no rastreadas (una sola comprobación para todo el lote)
+        pending_urls = set(self.news_db.filter_crawled_urls(record.url for record in url_records))
 
-        # Encontrar urls no rastreadas
-        crawled_urls = []
-        explore_selector_list = []
-        for url in selector_list:
-            loc = url.xpath('./ns:loc/text()', namespaces=SITEMAP_NAMESPACES).get()
+        fuente = get_domain(domain)
+        requests = []
+        for record in url_records:
             # Si ya fue rastreada la url continuar con las siguientes
-            if self.news_db.is_crawled_url(loc):
+            if record.url not in pending_urls:
                 continue
-            explore_selector_list.append(url)
-            crawled_urls.append(loc)
-            
-            # Agregar las urls no exploradas a la base de datos
-            if len(crawled_urls) > 5:
-                self.news_db.bulk_insert_crawled_urls(crawled_urls)
-                crawled_urls.clear()
-
-
-        # Extraer el contenido de las urls no exploradas
-        for url in explore_selector_list:
-            loc = url.xpath('./ns:loc/text()', namespaces=SITEMAP_NAMESPACES).get()
-            fecha_publicacion = self._get_publication_date(url, normalize=False)
-            fecha_publicacion_norm = normalize_date(fecha_publicacion) if fecha_publicacion else None
-
-            if fecha_publicacion and fecha_publicacion_norm.date() < self.from_date:
+            pending_urls.discard(record.url)
+
+            # Las omitidas (antiguas o relativas) no se registran: no quedan en proceso y una
+            # ejecución con una fecha de inicio anterior las vuelve a considerar
+            if record.fecha and record.fecha.date() < self.from_date:
                 continue
 
-            #if loc and is_full_url(loc) and fecha_publicacion and fecha_publicacion_norm.date() >= self.from_date:
-            if loc and is_full_url(loc):
-                titulo = url.xpath('./news:news/news:title/text()', namespaces=SITEMAP_NAMESPACES).get() or ""
-                fuente = get_domain(domain)
+            if is_full_url(record.url):
                 # Solicitud para obtener información de la página actual
-                yield scrapy.Request(
-                    url=loc,
-                    callback=self.parse_article,
+                requests.append(scrapy.Request(
+                    url=record.url,
+                    callback=self.spider.parse_article,
+                    errback=self.spider.handle_article_error,
                     meta={
                         'fuente': fuente,
-                        'url': loc,
-                        'titulo': titulo,
-                        'fecha_publicacion': fecha_publicacion_norm,
+                        'url': record.url,
+                        'titulo': record.titulo,
+                        'fecha_publicacion': record.fecha,
                     }
-                )
+                ))
+
+        # Agregar a la base de datos (en proceso) solo las urls que se van a descargar
+        if requests:
+            self.spider.register_crawled_urls([request.meta['url'] for request in requests])
+        yield from requests
 
     def parse_article(self, response):
         """
@@ -292,53 +327,14 @@ class SitemapParser:
 
 
 
-    def _get_publication_date(self, selector, normalize=True):
-        """
-        Obtiene la fecha de publicación de un selector.
-        """
-        fecha = selector.xpath('./news:news/news:publication_date/text()', namespaces=SITEMAP_NAMESPACES).get()
-        if not fecha:
-            fecha = selector.xpath('./ns:lastmod/text()', namespaces=SITEMAP_NAMESPACES).get()
-
-        if not fecha:
-            return None
-
-        return normalize_date(fecha).date() if normalize else fecha
-
-
-    def _get_source(self, selector, domain):
+    def _get_source(self, publication_name, domain):
         """
         Obtiene la fuente de la noticia.
         """
-        fuente = selector.xpath('./news:news/news:publication/news:name/text()', namespaces=SITEMAP_NAMESPACES).get()
+        fuente = publication_name
         if domain:
             domain_base = get_base_url(domain)
             source_name = self.news_db.get_source_name(domain_base)
             if source_name:
                 fuente = source_name
         return fuente or ""
-
-
-    def _sort_selector_by_date(self, selector_list):
-        selectors_with_dates = []
-        for sel in selector_list:
-            date_obj = self._get_publication_date(sel, normalize=True)
-            if date_obj: # Solo si la fecha es válida (no None)
-                selectors_with_dates.append((date_obj, sel))
-            else:
-                selectors_with_dates.append((datetime.min.date(), sel))
-
-        if not selectors_with_dates:
-            return []
-
-        dates_only = [item[0] for item in selectors_with_dates]
-        is_already_sorted = all(dates_only[i] >= dates_only[i+1] for i in range(len(dates_only) - 1))
-
-        if not is_already_sorted:
-            #print("La lista de selectores no está ordenada, procediendo a ordenar...")
-            selectors_with_dates.sort(key=lambda x: x[0], reverse=True)
-            sorted_selector_list = [item[1] for item in selectors_with_dates]
-            return sorted_selector_list
-        else:
-            #print("La lista de selectores ya está ordenada por fecha (decreciente).")
-            return [item[1] for item in selectors_with_dates]
\ No newline at end of file
@@ -0,0 +1,73 @@
+import gzip
+import io
+from collections import namedtuple
+from lxml import etree
+from news_scraper.constants import SITEMAP_NAMESPACES
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+_NS = '{%s}' % SITEMAP_NAMESPACES['ns']
+_NEWS = '{%s}' % SITEMAP_NAMESPACES['news']
+
+URL_TAG = f'{_NS}url'
+SITEMAP_TAG = f'{_NS}sitemap'
+
+# Registro ligero de cada tag <url> o <sitemap>
+SitemapEntry = namedtuple('SitemapEntry', [
+    'is_sitemap',        # True para <sitemap> (sitemap anidado), False para <url>
+    'loc',
+    'lastmod',
+    'publication_date',  # news:news/news:publication_date
+    'title',             # news:news/news:title
+    'publication_name',  # news:news/news:publication/news:name
+])
+
+
+def open_sitemap_body(body):
+    """
+    Retorna un objeto tipo fichero sobre el cuerpo del sitemap.
+    Si el cuerpo está comprimido en gzip se descomprime de forma incremental mientras se lee.
+    """
+    stream = io.BytesIO(body)
+    if body[:2] == GZIP_MAGIC:
+        return gzip.GzipFile(fileobj=stream, mode='rb')
+    return stream
+
+
+def _text(elem, path):
+    value = elem.findtext(path)
+    if value is None:
+        return None
+    value = value.strip()
+    return value or None
+
+
+def iter_sitemap_entries(fileobj):
+    """
+    Recorre un sitemap elemento a elemento con lxml.iterparse.
+    Cada <url>/<sitemap> se libera después de leerlo para que la memoria no crezca con el tamaño del documento.
+    """
+    context = etree.iterparse(fileobj, events=('end',), tag=(URL_TAG, SITEMAP_TAG),
+                              recover=True, resolve_entities=False, huge_tree=True)
+    try:
+        for _, elem in context:
+            yield SitemapEntry(
+                is_sitemap=elem.tag == SITEMAP_TAG,
+                loc=_text(elem, f'{_NS}loc'),
+                lastmod=_text(elem, f'{_NS}lastmod'),
+                publication_date=_text(elem, f'{_NEWS}news/{_NEWS}publication_date'),
+                title=_text(elem, f'{_NEWS}news/{_NEWS}title'),
+                publication_name=_text(elem, f'{_NEWS}news/{_NEWS}publication/{_NEWS}name'),
+            )
+
+            # Liberar el elemento y los hermanos anteriores ya procesados
+            elem.clear(keep_tail=True)
+            parent = elem.getparent()
+            if parent is not None:
+                while elem.getprevious() is not None:
+                    del parent[0]
+    except (etree.XMLSyntaxError, OSError, EOFError) as e:
+        # Documento truncado o gzip corrupto: se conservan las entradas leídas hasta el error
+        print(f"Error al leer el sitemap: {e}")
+    finally:
+        del context
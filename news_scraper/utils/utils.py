@@ -2,7 +2,8 @@ from urllib.parse import urljoin, urlparse
 import re
 import os
 import datetime
-from datetime import datetime, timedelta
+from datetime import datetime, date, timedelta
+from functools import lru_cache
 import dateutil
 from dateutil import parser as date_parser
 from zoneinfo import ZoneInfo
@@ -57,66 +58,102 @@ def extract_sitemap_urls(robots_text, invalid_url_words={}):
     return sitemap_urls
 
 
+MADRID_TZ = ZoneInfo("Europe/Madrid")
+
+# Expresiones precompiladas para fechas en formato español
+A_LAS_RE = re.compile(r'\ba las\b')
+TZ_ABBR_RE = re.compile(r'(cet|cest)')
+WEEKDAY_RE = re.compile(r'^(lunes|martes|miércoles|jueves|viernes|sábado|domingo),\s*')
+DE_RE = re.compile(r'\sdel?\s')
+HOUR_SUFFIX_RE = re.compile(r'(\d{1,2}:\d{2})(?:\s*h\.?|hrs?)')
+TIME_DASH_RE = re.compile(r'(\d{1,2}:\d{2})\s*-\s*')
+DAY_FIRST_RE = re.compile(r'^\d{1,2}/\d{1,2}/\d{2,4}')
+
+MONTH_TRANSLATIONS = {
+    'enero': 'january', 'ene': 'jan',
+    'febrero': 'february', 'feb': 'feb',
+    'marzo': 'march', 'mar': 'mar',
+    'abril': 'april', 'abr': 'apr',
+    'mayo': 'may', 'may': 'may',
+    'junio': 'june', 'jun': 'jun',
+    'julio': 'july', 'jul': 'jul',
+    'agosto': 'august', 'ago': 'aug',
+    'septiembre': 'september', 'setiembre': 'september', 'sep': 'sep', 'set': 'sep',
+    'octubre': 'october', 'oct': 'oct',
+    'noviembre': 'november', 'nov': 'nov',
+    'diciembre': 'december', 'dic': 'dec',
+}
+# Nombres completos antes que abreviaturas para que 'enero' no se traduzca como 'jan' + 'ro'
+MONTH_RE = re.compile('|'.join(sorted(MONTH_TRANSLATIONS, key=len, reverse=True)))
+
+
 def normalize_date(date_string, formato_entrada=None, dayfirst=None):
     if not date_string or not isinstance(date_string, str):
-        if isinstance(date_string, datetime) or isinstance(date_string, datetime.date):
+        if isinstance(date_string, (datetime, date)):
             return date_string
         print(f"Invalid input: '{date_string}', type: {type(date_string)}")
         return None
+    return _normalize_date_cached(date_string, dayfirst)
+
+
+@lru_cache(maxsize=8192)
+def _normalize_date_cached(date_string, dayfirst=None):
+    """
+    Parser por niveles, cacheado por la cadena original:
+    1. ISO-8601 con datetime.fromisoformat (sin expresiones regulares)
+    2. Reglas precompiladas para formatos en español
+    3. dateutil como último recurso
+    """
+    parsed_date = _parse_iso_date(date_string)
+    if parsed_date is None:
+        parsed_date = _parse_spanish_date(date_string, dayfirst)
+    if parsed_date is None:
+        return None
+    return parsed_date.replace(tzinfo=MADRID_TZ)
+
+
+def _parse_iso_date(date_string):
+    candidate = date_string.strip()
+    # Solo cadenas que empiezan por AAAA-MM-DD
+    if len(candidate) < 10 or candidate[4] != '-' or candidate[7] != '-' or not candidate[:4].isdigit():
+        return None
+    try:
+        return datetime.fromisoformat(candidate)
+    except ValueError:
+        return None
+
 
+def _parse_spanish_date(date_string, dayfirst=None):
     processed_str = date_string.lower()
 
     # Remover "a las"
-    processed_str = re.sub(r'\ba las\b', ' ', processed_str)
+    processed_str = A_LAS_RE.sub(' ', processed_str)
 
-    tz_match = re.search(r'(cet|cest)', processed_str)
-    tz_abbr = tz_match.group(0) if tz_match else None
-    if tz_abbr:
-        processed_str = processed_str.replace(tz_abbr, 'T')
+    tz_match = TZ_ABBR_RE.search(processed_str)
+    if tz_match:
+        processed_str = processed_str.replace(tz_match.group(0), 'T')
 
     # 1. Remover día de la semana
-    processed_str = re.sub(r'^(lunes|martes|miércoles|jueves|viernes|sábado|domingo),\s*', '', processed_str)
+    processed_str = WEEKDAY_RE.sub('', processed_str)
 
     # 2. Remover del/de
-    processed_str = re.sub(r'\sdel?\s', ' ', processed_str)
+    processed_str = DE_RE.sub(' ', processed_str)
 
     # 3. Remover componentes de tiempo (preservar separador ISO T)
     if 't' not in processed_str:
-        processed_str = re.sub(r'(\d{1,2}:\d{2})(?:\s*h\.?|hrs?)', r'\1', processed_str)
+        processed_str = HOUR_SUFFIX_RE.sub(r'\1', processed_str)
 
     # 4. Eliminar guiones
-    processed_str = re.sub(r'(\d{1,2}:\d{2})\s*-\s*', r'\1 ', processed_str)
+    processed_str = TIME_DASH_RE.sub(r'\1 ', processed_str)
 
     # 5. Convertir meses de español a ingles
-    month_translations = {
-        'enero': 'january', 'ene': 'jan',
-        'febrero': 'february', 'feb': 'feb',
-        'marzo': 'march', 'mar': 'mar',
-        'abril': 'april', 'abr': 'apr',
-        'mayo': 'may', 'may': 'may',
-        'junio': 'june', 'jun': 'jun',
-        'julio': 'july', 'jul': 'jul',
-        'agosto': 'august', 'ago': 'aug',
-        'septiembre': 'september', 'setiembre': 'september', 'sep': 'sep', 'set': 'sep',
-        'octubre': 'october', 'oct': 'oct',
-        'noviembre': 'november', 'nov': 'nov',
-        'diciembre': 'december', 'dic': 'dec',
-    }
-
-    for spanish, english in month_translations.items():
-        processed_str = processed_str.replace(spanish, english)
+    processed_str = MONTH_RE.sub(lambda match: MONTH_TRANSLATIONS[match.group(0)], processed_str)
 
     try:
-        if re.match(r'^\d{1,2}/\d{1,2}/\d{2,4}', processed_str): # format DD/MM/YYYY
-            if dayfirst is not None:
-                parsed_date = dateutil.parser.parse(processed_str, dayfirst=dayfirst)
-            else:
-                parsed_date = dateutil.parser.parse(processed_str, dayfirst=True)
-        else:
-            parsed_date = dateutil.parser.parse(processed_str)
-        parsed_date = parsed_date.replace(tzinfo=ZoneInfo("Europe/Madrid"))
-        return parsed_date
-    except (ValueError, TypeError) as e:
+        if DAY_FIRST_RE.match(processed_str): # format DD/MM/YYYY
+            return date_parser.parse(processed_str, dayfirst=dayfirst if dayfirst is not None else True)
+        return date_parser.parse(processed_str)
+    except (ValueError, TypeError, OverflowError) as e:
         print(f"Formato de fecha inválido: '{date_string}' - Error: {str(e)}")
         return None
 
@@ -5,7 +5,10 @@ from langchain_chroma import Chroma
 #from langchain.docstore.document import Document
 from langchain_core.documents import Document
 from news_search.vector_database import VectorDatabase
-from datetime import datetime
+from datetime import timedelta
+
+# Fragmentos por artículo que se leen de Chroma en la primera búsqueda (se duplican si no hay k artículos)
+CHUNKS_PER_ARTICLE = 2
 
 class ChromaVectorEngine(VectorDatabase):
     def __init__(self, embedding, persist_directory: str = "./chroma_db", sqlite_path: str = "mydb.sqlite"):
@@ -18,38 +21,53 @@ class ChromaVectorEngine(VectorDatabase):
             collection_metadata={"hnsw:space": "cosine"}
         )
 
-    def insert_embeddings_bulk(self, chunks_with_vectors: List[Tuple[List[float], Dict]]):
+    def insert_embeddings_bulk(self, chunks_with_vectors: List[Tuple[List[float], Dict]], ids: List[str] = None):
         documents = [
             Document(page_content=chunk["chunk_text"], metadata=chunk)
             for chunk in chunks_with_vectors
         ]
-        self.index.add_documents(documents)
+        # Con ids, los fragmentos ya guardados se reemplazan (upsert) en lugar de duplicarse
+        self.index.add_documents(documents, ids=ids)
         #self.index.persist()
 
 
     def retrieve_related_documents(self, query_vector, k=10, date_from=None, date_to=None, score_threshold=0.25):
-        candidate_chunks = self.index.similarity_search_with_relevance_scores(query_vector, k*5)
-
-        id_seen = set()
-        articles = []
-
-        for doc, score in candidate_chunks:
-            metadata = doc.metadata
-            article_id = metadata.get("url")
-            
-            if not article_id or article_id in id_seen or score < score_threshold:
-                continue
-
-            if date_from and date_to:
-                pub_date_str = metadata.get("fecha_publicacion")
-                pub_date = datetime.strptime(pub_date_str, "%Y-%m-%d").date()
-                if pub_date < date_from or pub_date > date_to:
-                    continue
+        """
+        Los k artículos (metadatos de su fragmento más parecido) más relacionados con la consulta.
+        El rango de fechas se filtra en Chroma; si los fragmentos leídos no alcanzan k artículos
+        distintos, se vuelve a buscar con el doble de fragmentos hasta agotar los que superan score_threshold
+        """
+        if date_from and date_to and date_to < date_from:
+            return []
+        filtro = self._date_filter(date_from, date_to)
+        fetch_k = k * CHUNKS_PER_ARTICLE
+        while True:
+            candidate_chunks = self.index.similarity_search_with_relevance_scores(query_vector, fetch_k, filter=filtro)
 
-            id_seen.add(article_id)
-            articles.append(metadata)
+            id_seen = set()
+            articles = []
+            agotados = len(candidate_chunks) < fetch_k
+            for doc, score in candidate_chunks:
+                if score < score_threshold:
+                    # Ordenados por puntuación: los siguientes tampoco la superan
+                    agotados = True
+                    break
+                metadata = doc.metadata
+                article_id = metadata.get("url")
+                if not article_id or article_id in id_seen:
+                    continue
+                id_seen.add(article_id)
+                articles.append(metadata)
+                if len(articles) >= k:
+                    return articles
 
-            if len(articles) >= k:
-                break
+            if agotados:
+                return articles
+            fetch_k *= 2
 
-        return articles
\ No newline at end of file
+    def _date_filter(self, date_from, date_to):
+        """ Filtro de Chroma por los días (cadenas %Y-%m-%d de fecha_publicacion) entre date_from y date_to incluidos """
+        if not (date_from and date_to):
+            return None
+        dias = (date_to - date_from).days + 1
+        return {"fecha_publicacion": {"$in": [(date_from + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(dias)]}}
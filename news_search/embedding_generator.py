@@ -11,6 +11,10 @@ class EmbeddingGenerator:
     def get_embedding_size(self):
         return self.embedding_size
 
+    def count_tokens(self, text):
+        # Tokens que procesa el modelo (con los especiales, truncado a su longitud máxima)
+        return len(self.model.tokenizer(text, truncation=True, max_length=self.model.max_seq_length)['input_ids'])
+
     def embed_query(self, text):
         return self.generate_embedding(text)
 
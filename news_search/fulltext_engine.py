@@ -0,0 +1,64 @@
+import sqlite3
+import threading
+import time as clock
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo
+from news_database.interface_db import NewsInterfaceDatabase
+
+# Zona horaria de las fechas de los metadatos de Chroma (EmbeddingPipeline guarda la fecha local del artículo)
+MADRID_TZ = ZoneInfo('Europe/Madrid')
+# Instrucciones de SQLite entre comprobaciones del plazo de una búsqueda (menos de un milisegundo)
+PROGRESS_STEPS = 10000
+
+
+class FulltextTimeout(Exception):
+    """ La búsqueda léxica superó su plazo y se interrumpió """
+
+
+class FulltextEngine:
+    """
+    Búsqueda léxica (BM25 sobre el índice FTS5 busqueda_articulos de la base de datos de noticias)
+    con los mismos metadatos por artículo que ChromaVectorEngine
+    """
+    def __init__(self, db_path):
+        self.db_path = db_path
+        # Una conexión por hilo: SearchManager consulta desde los hilos de su pool
+        self.local = threading.local()
+
+    def _db(self):
+        if getattr(self.local, 'db', None) is None:
+            self.local.db = NewsInterfaceDatabase(self.db_path)
+        return self.local.db
+
+    def retrieve_related_documents(self, query, k=10, date_from=None, date_to=None, timeout=None):
+        """
+        Los k artículos más relevantes con alguna de las palabras (sin stopwords) o frases de la consulta,
+        publicados entre date_from y date_to (incluidas). BM25 se calcula para todos los artículos encontrados.
+        Con timeout, la consulta se interrumpe en SQLite al cabo de timeout segundos (FulltextTimeout)
+        """
+        # Días completos en la hora de España (search_fulltext los compara en segundos UTC)
+        start_date = datetime.combine(date_from, time.min, tzinfo=MADRID_TZ) if date_from else None
+        end_date = datetime.combine(date_to + timedelta(days=1), time.min, tzinfo=MADRID_TZ) if date_to else None
+        db = self._db()
+        if timeout is not None:
+            deadline = clock.monotonic() + timeout
+            db.conn.set_progress_handler(lambda: clock.monotonic() > deadline, PROGRESS_STEPS)
+        try:
+            # Sin límite de candidatos: con OR se encuentran muchos más artículos que con todas las palabras y
+            # ordenar solo los más recientes dejaría fuera a los más relevantes
+            rows = db.search_fulltext(query, start_date, end_date, limit=k, any_term=True, candidates=None)
+        except sqlite3.OperationalError as e:
+            if timeout is not None and clock.monotonic() > deadline:
+                raise FulltextTimeout(f"búsqueda léxica interrumpida tras {timeout}s") from e
+            raise
+        finally:
+            if timeout is not None:
+                db.conn.set_progress_handler(None, 0)
+        return [{
+            "titulo": titulo,
+            "url": url,
+            "fuente": fuente,
+            # Fecha en la hora de España, igual que la de los metadatos de Chroma
+            "fecha_publicacion": (datetime.fromtimestamp(fecha, MADRID_TZ).strftime("%Y-%m-%d")
+                                  if fecha is not None else None)
+        } for titulo, url, fuente, fecha in rows]
@@ -2,7 +2,7 @@ from abc import ABC, abstractmethod
 
 class VectorDatabase(ABC):
     @abstractmethod
-    def insert_embeddings_bulk(self, list_of_vectors_and_metadata):
+    def insert_embeddings_bulk(self, list_of_vectors_and_metadata, ids=None):
         pass
 
     @abstractmethod
@@ -0,0 +1,249 @@
+"""
+Regresión de los planes de ejecución (EXPLAIN QUERY PLAN) de las consultas frecuentes y de las
+migraciones del esquema.
+
+La base de datos se crea con create_tables (incluidas las migraciones) y, con datos sintéticos,
+se ejecuta ANALYZE. Una consulta falla si:
+- recorre completa una tabla grande sin índice (SCAN sin USING), salvo el número acotado de artículos,
+- ordena en memoria (USE TEMP B-TREE), salvo las que ordenan solo su resultado (varias categorías),
+- no usa el índice esperado.
+"""
+import random
+import re
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from news_database.core_db import SCHEMA_VERSION, URL_COMPLETADA, analyze
+from news_database.interface_db import NewsInterfaceDatabase, ARTICLES_PAGE_SIZE, COUNT_LIMIT
+from news_database.news_db import NewsDatabase
+from news_database.utils import to_epoch
+
+TOTAL_ARTICULOS = 5000
+
+# Tablas que crecen con cada ejecución del crawler (con el alias que usa fetch_articles)
+TABLAS_GRANDES = {'urls_exploradas', 'u', 'articulos', 'a', 'palabra_clave_articulos', 'pca', 'palabras_clave_categoria', 'pcc',
+                  'articulo_categoria', 'ac'}
+BUSQUEDA_FECHA = r'SEARCH a USING COVERING INDEX idx_articulos_fecha \(fecha_publicacion>\?'
+RECORRIDO_FECHA = r'SCAN a USING COVERING INDEX idx_articulos_fecha'
+CATEGORIA = r'SEARCH ac USING COVERING INDEX idx_articulo_categoria_fecha \(categoria_id=\?\)'
+PALABRA_CLAVE = r'SEARCH pca USING COVERING INDEX idx_palabra_clave_articulos_palabra \(palabra_id=\?\)'
+CATEGORIA_FECHA = r'SEARCH ac USING COVERING INDEX idx_articulo_categoria_fecha \(categoria_id=\? AND fecha>\? AND fecha<\?\)'
+
+# Esquema de las tablas de artículos anterior a las migraciones (user_version 0)
+ESQUEMA_BASE = """
+    CREATE TABLE categoria (
+        categoria_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nombre TEXT UNIQUE
+    );
+    CREATE TABLE palabras_clave (
+        palabra_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        palabra TEXT UNIQUE,
+        stem TEXT UNIQUE
+    );
+    CREATE TABLE palabras_clave_categoria (
+        palabra_id INTEGER,
+        categoria_id INTEGER,
+        PRIMARY KEY (palabra_id, categoria_id),
+        FOREIGN KEY (palabra_id) REFERENCES palabras_clave(palabra_id) ON DELETE CASCADE,
+        FOREIGN KEY (categoria_id) REFERENCES categoria(categoria_id) ON DELETE CASCADE
+    );
+    CREATE TABLE palabra_clave_articulos (
+        url TEXT,
+        palabra_id INTEGER,
+        PRIMARY KEY (url, palabra_id),
+        FOREIGN KEY (url) REFERENCES articulos(url) ON DELETE CASCADE,
+        FOREIGN KEY (palabra_id) REFERENCES palabras_clave(palabra_id) ON DELETE CASCADE
+    );
+    CREATE TABLE urls_exploradas (
+        url TEXT PRIMARY KEY,
+        crawled_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE fuentes (
+        fuente_id TEXT PRIMARY KEY,
+        nombre TEXT,
+        url_home TEXT
+    );
+    CREATE TABLE articulos (
+        url TEXT PRIMARY KEY,
+        fuente TEXT,
+        titulo TEXT,
+        fecha_publicacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (fuente) REFERENCES fuentes(fuente_id) ON DELETE CASCADE,
+        FOREIGN KEY (url) REFERENCES urls_exploradas(url) ON DELETE CASCADE
+    );
+"""
+
+
+def fill_database(db, rng, total_articles):
+    cursor = db.conn.cursor()
+    cursor.executemany('INSERT INTO fuentes VALUES (?, ?, ?)',
+                       [(f'fuente{i}.es', f'Fuente {i}', f'https://fuente{i}.es/') for i in range(30)])
+    cursor.executemany('INSERT INTO palabras_clave (palabra, stem) VALUES (?, ?)',
+                       [(f'palabra{i}', f'palabr{i}') for i in range(300)])
+    cursor.executemany('INSERT INTO categoria (nombre) VALUES (?)', [(f'categoria{i}',) for i in range(20)])
+    cursor.executemany('INSERT INTO palabras_clave_categoria VALUES (?, ?)',
+                       [(i + 1, i % 20 + 1) for i in range(300)])
+    db.conn.commit()
+    fecha = datetime(2025, 1, 1)
+    articulos = [{
+        'url': f'https://fuente{i % 30}.es/noticia-{i}.html',
+        'fuente': f'fuente{i % 30}.es',
+        'titulo': f'Noticia {i}',
+        'fecha_publicacion': fecha + timedelta(minutes=80 * i),
+    } for i in range(total_articles)]
+    db.bulk_insert_crawled_urls([a['url'] for a in articulos], estado=URL_COMPLETADA)
+    db.bulk_insert_articles(articulos)
+    db.bulk_insert_palabra_clave_articulos(
+        [(a['url'], palabra_id) for a in articulos for palabra_id in rng.sample(range(1, 301), 3)])
+    # Estadísticas del planificador con datos, como tras una migración
+    analyze(cursor)
+    db.conn.commit()
+
+
+@pytest.fixture(scope='module')
+def db(tmp_path_factory):
+    db_path = str(tmp_path_factory.mktemp('plans') / 'plans.db')
+    news_db = NewsDatabase(db_path)
+    news_db.create_tables()
+    fill_database(news_db, random.Random(1), TOTAL_ARTICULOS)
+    news_db.close_db()
+
+    db = NewsInterfaceDatabase(db_path)
+    yield db
+    db.close_db()
+
+
+def query_plan(db, query, params):
+    cursor = db.conn.execute('EXPLAIN QUERY PLAN ' + query, params)
+    return [row[3] for row in cursor.fetchall()]
+
+
+def assert_plan(plan, esperados, ordena=False, recorre=False):
+    for detalle in plan:
+        tabla = re.match(r'SCAN (\w+)$', detalle)
+        assert recorre or not (tabla and tabla.group(1) in TABLAS_GRANDES), f'recorrido completo: {plan}'
+        assert ordena or not detalle.startswith('USE TEMP B-TREE'), f'ordenación en memoria: {plan}'
+    for patron in esperados:
+        assert any(re.search(patron, detalle) for detalle in plan), f'{patron} no aparece en el plan: {plan}'
+
+
+# (filtros, patrón que debe aparecer en el plan, ordenación en memoria permitida)
+@pytest.mark.parametrize('filtros, esperado, ordena', [
+    ({}, RECORRIDO_FECHA, False),
+    ({'start_date': '2025-03-01', 'end_date': '2025-03-08'}, BUSQUEDA_FECHA, False),
+    ({'categories': ['categoria1']}, CATEGORIA, False),
+    ({'categories': ['categoria1'], 'start_date': '2025-03-01', 'end_date': '2025-03-08'}, CATEGORIA_FECHA, False),
+    ({'categories': ['categoria1', 'categoria2'], 'start_date': '2025-03-01', 'end_date': '2025-03-08'},
+     CATEGORIA_FECHA, True),
+    ({'keywords': ['palabra1', 'palabra2'], 'start_date': '2025-03-01'}, BUSQUEDA_FECHA, False),
+    ({'categories': ['categoria1'], 'keywords': ['palabra1'], 'start_date': '2025-03-01', 'end_date': '2025-04-01'},
+     CATEGORIA_FECHA, False),
+], ids=['todos', 'fechas', 'categoria', 'categoria-fechas', 'categorias-fechas', 'palabras-fecha',
+        'categoria-palabras-fechas'])
+def test_fetch_articles_plan(db, filtros, esperado, ordena):
+    assert_plan(query_plan(db, *db.articles_query(**filtros)), [esperado], ordena)
+
+
+# Páginas siguientes de fetch_articles_page: recorren el índice desde el cursor, sin ordenar
+@pytest.mark.parametrize('filtros, esperados', [
+    ({}, [r'SEARCH a USING COVERING INDEX idx_articulos_fecha \(fecha_publicacion<\?\)']),
+    ({'start_date': '2025-03-01', 'end_date': '2025-04-01'}, [BUSQUEDA_FECHA]),
+    ({'categories': ['categoria1'], 'start_date': '2025-03-01', 'end_date': '2025-04-01'}, [CATEGORIA_FECHA]),
+    ({'categories': ['categoria1', 'categoria2'], 'start_date': '2025-03-01', 'end_date': '2025-04-01'},
+     [BUSQUEDA_FECHA, r'SEARCH ac USING PRIMARY KEY \(url_id=\? AND categoria_id=\?\)']),
+], ids=['todos', 'fechas', 'categoria-fechas', 'categorias-fechas'])
+def test_fetch_articles_page_plan(db, filtros, esperados):
+    cursor = (to_epoch('2025-03-05 10:00:00'), 500)
+    query, params = db.articles_query(**filtros, after=cursor, limit=ARTICLES_PAGE_SIZE + 1)
+    assert_plan(query_plan(db, query, params), esperados)
+
+
+# count_articles: sin ordenar; sin filtros recorre la tabla, acotado por COUNT_LIMIT
+@pytest.mark.parametrize('filtros, esperado, recorre', [
+    ({}, r'SCAN a', True),
+    ({'start_date': '2025-03-01', 'end_date': '2025-04-01'}, BUSQUEDA_FECHA, False),
+    ({'categories': ['categoria1']}, CATEGORIA, False),
+    ({'categories': ['categoria1'], 'start_date': '2025-03-01', 'end_date': '2025-04-01'}, CATEGORIA_FECHA, False),
+    ({'categories': ['categoria1', 'categoria2'], 'start_date': '2025-03-01', 'end_date': '2025-04-01'},
+     CATEGORIA_FECHA, False),
+    ({'keywords': ['palabra1', 'palabra2'], 'start_date': '2025-03-01'}, PALABRA_CLAVE, False),
+    ({'categories': ['categoria1'], 'keywords': ['palabra1'], 'start_date': '2025-03-01', 'end_date': '2025-04-01'},
+     CATEGORIA_FECHA, False),
+], ids=['todos', 'fechas', 'categoria', 'categoria-fechas', 'categorias-fechas', 'palabras-fecha',
+        'categoria-palabras-fechas'])
+def test_count_articles_plan(db, filtros, esperado, recorre):
+    query, params = db.articles_query(**filtros, limit=COUNT_LIMIT + 1, count=True)
+    assert_plan(query_plan(db, query, params), [esperado], recorre=recorre)
+
+
+def test_search_fulltext_plan(db):
+    # Los artículos encontrados en el índice FTS5 (solo se ordenan los candidatos)
+    query, params = db.search_fulltext_query('palabra1 "noticia"', '2025-03-01', '2025-04-01')
+    assert_plan(query_plan(db, query, params),
+                [r'SCAN busqueda_articulos VIRTUAL TABLE INDEX \d+:M', r'SEARCH a USING INTEGER PRIMARY KEY'], ordena=True)
+
+
+def test_fetch_articles_page_matches_fetch_articles(db):
+    filtros = {'categories': ['categoria1', 'categoria2'], 'start_date': '2025-03-01', 'end_date': '2025-06-01'}
+    articulos = db.fetch_articles(**filtros)
+    assert len(articulos) > 50
+    paginas, cursor = [], None
+    while True:
+        pagina, cursor = db.fetch_articles_page(**filtros, after=cursor, limit=50)
+        paginas.extend(pagina)
+        if cursor is None:
+            break
+    assert paginas == articulos
+    assert db.count_articles(**filtros) == (len(articulos), True)
+    assert db.count_articles(**filtros, limit=10) == (10, False)
+
+
+@pytest.mark.parametrize('query, esperado', [
+    ('SELECT url_id FROM palabra_clave_articulos WHERE palabra_id = ?',
+     r'SEARCH palabra_clave_articulos USING COVERING INDEX idx_palabra_clave_articulos_palabra'),
+    ('SELECT palabra_id FROM palabras_clave_categoria WHERE categoria_id = ?',
+     r'SEARCH palabras_clave_categoria USING COVERING INDEX idx_palabras_clave_categoria_categoria'),
+], ids=['articulos-de-palabra', 'palabras-de-categoria'])
+def test_keyword_category_plan(db, query, esperado):
+    assert_plan(query_plan(db, query, [1]), [esperado])
+
+
+def test_migrate_base_schema(tmp_path):
+    db_path = str(tmp_path / 'base.db')
+    conn = sqlite3.connect(db_path)
+    conn.executescript(ESQUEMA_BASE)
+    conn.execute("INSERT INTO fuentes VALUES ('fuente.es', 'Fuente', 'https://fuente.es/')")
+    conn.execute("INSERT INTO categoria (nombre) VALUES ('economia')")
+    conn.execute("INSERT INTO palabras_clave (palabra, stem) VALUES ('empleo', 'emple')")
+    conn.execute("INSERT INTO palabras_clave_categoria VALUES (1, 1)")
+    conn.executemany("INSERT INTO urls_exploradas (url) VALUES (?)",
+                     [('https://fuente.es/a.html',), ('https://fuente.es/b.html',)])
+    conn.executemany("INSERT INTO articulos VALUES (?, 'fuente.es', ?, ?)",
+                     [('https://fuente.es/a.html', 'Noticia A', '2025-01-02 10:00:00'),
+                      ('https://fuente.es/b.html', 'Noticia B', '2025-01-03 10:00:00')])
+    conn.execute("INSERT INTO palabra_clave_articulos VALUES ('https://fuente.es/a.html', 1)")
+    conn.commit()
+    conn.close()
+
+    db = NewsInterfaceDatabase(db_path)
+    db.create_tables()
+    try:
+        assert db.conn.execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION
+        assert db.conn.execute('PRAGMA foreign_key_check').fetchall() == []
+        assert [(titulo, url) for titulo, url, *_ in db.fetch_articles()] == [
+            ('Noticia B', 'https://fuente.es/b.html'), ('Noticia A', 'https://fuente.es/a.html')]
+        assert [url for _, url, *_ in db.fetch_articles(categories=['economia'])] == ['https://fuente.es/a.html']
+        assert [url for _, url, *_ in db.fetch_articles(keywords=['empleo'], start_date='2025-01-01')] == [
+            'https://fuente.es/a.html']
+        # Fechas de publicación como segundos UTC
+        assert db.conn.execute('SELECT fecha_publicacion FROM articulos ORDER BY url_id').fetchall() == [
+            (to_epoch('2025-01-02 10:00:00'),), (to_epoch('2025-01-03 10:00:00'),)]
+        # Las urls registradas antes de la columna estado se consideran completadas
+        assert db.conn.execute('SELECT url, estado FROM urls_exploradas ORDER BY url_id').fetchall() == [
+            ('https://fuente.es/a.html', URL_COMPLETADA), ('https://fuente.es/b.html', URL_COMPLETADA)]
+        # Una segunda ejecución no vuelve a aplicar las migraciones
+        assert db.migrate() == SCHEMA_VERSION
+    finally:
+        db.close_db()